@@ -1,10 +1,12 @@
-from io import BytesIO
 from threading import Event
+import os
 
 from bitcoinutils.setup import setup
+from loguru import logger
 import httpx
 
 from app.callbacks import (
+    book_ticker_event,
     depth_event,
     kline_event,
     user_deposit_event,
@@ -13,6 +15,7 @@ from app.callbacks import (
 )
 from app.connection_manager import ConnectionManager
 
+from .bootstrap import download_state
 from .config import settings
 from .zex import Zex
 
@@ -25,50 +28,35 @@ stop_event = Event()
 
 
 def initialize_zex():
-    if settings.zex.state_source == "":
-        return Zex(
-            kline_callback=kline_event(manager),
-            depth_callback=depth_event(manager),
-            order_callback=user_order_event(manager),
-            deposit_callback=user_deposit_event(manager),
-            withdraw_callback=user_withdraw_event(manager),
-            state_dest=settings.zex.state_dest,
-            light_node=settings.zex.light_node,
-        )
-    try:
-        response = httpx.get(settings.zex.state_source)
-        if response.status_code != 200 or len(response.content) == 0:
-            return Zex(
-                kline_callback=kline_event(manager),
-                depth_callback=depth_event(manager),
-                order_callback=user_order_event(manager),
-                deposit_callback=user_deposit_event(manager),
-                withdraw_callback=user_withdraw_event(manager),
-                state_dest=settings.zex.state_dest,
-                light_node=settings.zex.light_node,
+    callbacks = {
+        "kline_callback": kline_event(manager),
+        "depth_callback": depth_event(manager),
+        "order_callback": user_order_event(manager),
+        "deposit_callback": user_deposit_event(manager),
+        "withdraw_callback": user_withdraw_event(manager),
+        "book_ticker_callback": book_ticker_event(manager),
+        "state_dest": settings.zex.state_dest,
+        "light_node": settings.zex.light_node,
+    }
+    source = settings.zex.state_source
+    state_path = None
+    if source.startswith(("http://", "https://")):
+        try:
+            state_path = download_state(source, settings.zex.state_dest)
+        except httpx.ConnectError:
+            logger.warning(
+                "state source {source} is unreachable, starting from an empty state",
+                source=source,
             )
-    except httpx.ConnectError:
-        return Zex(
-            kline_callback=kline_event(manager),
-            depth_callback=depth_event(manager),
-            order_callback=user_order_event(manager),
-            deposit_callback=user_deposit_event(manager),
-            withdraw_callback=user_withdraw_event(manager),
-            state_dest=settings.zex.state_dest,
-            light_node=settings.zex.light_node,
-        )
-
-    data = BytesIO(response.content)
-    return Zex.load_state(
-        data=data,
-        kline_callback=kline_event(manager),
-        depth_callback=depth_event(manager),
-        order_callback=user_order_event(manager),
-        deposit_callback=user_deposit_event(manager),
-        withdraw_callback=user_withdraw_event(manager),
-        state_dest=settings.zex.state_dest,
-        light_node=settings.zex.light_node,
-    )
+    elif source != "" and os.path.isfile(source):
+        # a snapshot saved by this node
+        state_path = source
+
+    if state_path is None:
+        return Zex(**callbacks)
+    # memory-mapped while it is loaded
+    with open(state_path, "rb") as f:
+        return Zex.load_state(data=f, **callbacks)
 
 
 zex = initialize_zex()
@@ -12,12 +12,14 @@ from app import zex
 from app.api.cache import timed_lru_cache
 from app.config import settings
 from app.models.response import (
+    BookTickerResponse,
     ExchangeInfoResponse,
     StatisticsFullResponse,
     StatisticsMiniResponse,
     Symbol,
     Token,
 )
+from app.zex import DEPTH_LIMIT_MAX
 
 from . import NAMES, USDT_MAINNET
 
@@ -75,6 +77,11 @@ def normalize_symbol(symbol):
 
 @router.get("/depth")
 async def depth(symbol: str, limit: int = 500):
+    """The best `limit` levels of each side, at most `DEPTH_LIMIT_MAX`."""
+    if not 0 < limit <= DEPTH_LIMIT_MAX:
+        raise HTTPException(
+            400, {"error": f"limit must be between 1 and {DEPTH_LIMIT_MAX}"}
+        )
     pair = normalize_symbol(symbol)
 
     return zex.get_order_book(pair, limit)
@@ -110,14 +117,15 @@ def _exchange_info_response(symbols: tuple[str]):
         if name not in symbols:
             continue
         base_asset, quote_asset = name.split("-")
+        market = zex.state_manager.markets[name]
         s = Symbol(
             symbol=name,
             status="TRADING",
             baseAsset=base_asset,
-            baseAssetPrecision=0,
+            baseAssetPrecision=market.lot.decimals,
             quoteAsset=quote_asset,
-            quotePrecision=0,
-            quoteAssetPrecision=0,
+            quotePrecision=market.tick.decimals,
+            quoteAssetPrecision=market.tick.decimals,
             orderTypes=["LIMIT"],
             filters=[],
         )
@@ -343,6 +351,17 @@ def get_price(symbol: str | None = None, symbols: str | None = None):
     ]
 
 
+def _book_ticker_response(symbol: str) -> BookTickerResponse:
+    ticker = zex.get_book_ticker(symbol)
+    return BookTickerResponse(
+        symbol=symbol,
+        bidPrice=ticker["b"],
+        bidQty=ticker["B"],
+        askPrice=ticker["a"],
+        askQty=ticker["A"],
+    )
+
+
 @router.get("/ticker/bookTicker")
 def get_book_ticker(symbol: str | None = None, symbols: str | None = None):
     if symbol and symbols:
@@ -364,7 +383,9 @@ def get_book_ticker(symbol: str | None = None, symbols: str | None = None):
             continue
         raise HTTPException(400, {"error": f"invalid symbol {s}"})
 
-    raise NotImplementedError()
+    if symbol:
+        return _book_ticker_response(symbol)
+    return [_book_ticker_response(s) for s in symbols]
 
 
 @router.get("/ticker")
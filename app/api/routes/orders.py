@@ -16,8 +16,9 @@ def pair_orders(pair: str, side: Literal["buy"] | Literal["sell"]):
 
     return [
         {
-            "price": price,
-            "tx": tx.hex(),
+            "price": market.tick.to_decimal(order.price),
+            "amount": market.lot.to_decimal(order.remaining),
+            "tx": order.tx.hex(),
         }
-        for price, tx in orders
+        for order in orders.iter_orders()
     ]
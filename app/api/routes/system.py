@@ -9,6 +9,7 @@ import time
 
 from eigensdk.crypto.bls import attestation
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
 from loguru import logger
 from redis.exceptions import ConnectionError
 from zellular import Zellular
@@ -16,8 +17,12 @@ import httpx
 import redis
 
 from app import stop_event, zex
+from app.bootstrap import digest_headers, state_digest
 from app.config import settings
-from app.verify import TransactionVerifier
+from app.precheck import Rejections, stale_nonce
+from app.sharding import ShardedMatcher
+from app.verified_cache import VerifiedCache
+from app.verify import TransactionVerifier, VerifyTicket, decode_batch
 
 
 class MockZellular:
@@ -190,6 +195,9 @@ zseq_deque = deque()
 
 router = APIRouter()
 
+# transactions rejected before verifying their signatures, see app.precheck
+rejections = {"submitted": Rejections(), "sequenced": Rejections()}
+
 
 @router.get("/ping")
 async def ping():
@@ -210,6 +218,28 @@ def get_deposit_status(chain: str, tx_hash: str, vout: int = 0):
     return {"status": "complete"}
 
 
+@router.get("/status/rejected")
+def get_rejected():
+    """Transactions rejected before verifying their signatures, by reason."""
+    return {path: counts.counts() for path, counts in rejections.items()}
+
+
+@router.get("/state")
+def get_state():
+    """The last full state saved by this node, for other nodes to start from."""
+    try:
+        digest = state_digest(zex.state_dest)
+    except FileNotFoundError:
+        raise HTTPException(404, {"error": "no saved state"})
+    # served with range requests, the ETag lets a download resume only while
+    # the same state is served
+    return FileResponse(
+        zex.state_dest,
+        media_type="application/octet-stream",
+        headers=digest_headers(digest),
+    )
+
+
 @router.post("/register")
 def register(txs: list[str]):
     with zseq_lock:
@@ -245,9 +275,14 @@ def new_withdraw(txs: list[str]):
     return {"success": True}
 
 
-async def transmit_tx():
+async def transmit_tx(verified: VerifiedCache | None = None):
     zellular = create_zellular_instance()
-    with TransactionVerifier(num_processes=4) as tx_verifier:
+    with TransactionVerifier(
+        num_processes=4,
+        cache=verified,
+        submitted=True,
+        rejections=rejections["submitted"],
+    ) as tx_verifier:
         try:
             while not stop_event.is_set():
                 if len(zseq_deque) == 0:
@@ -260,7 +295,12 @@ async def transmit_tx():
                         for _ in range(len(zseq_deque))
                     ]
 
-                verified_txs = tx_verifier.verify(txs)
+                # orders with a nonce already used would only be dropped
+                fresh_txs = [tx for tx in txs if not stale_nonce(tx, zex.nonces)]
+                if len(fresh_txs) < len(txs):
+                    rejections["submitted"].add({"nonce": len(txs) - len(fresh_txs)})
+
+                verified_txs = tx_verifier.verify(fresh_txs)
                 txs = [x.decode("latin-1") for x in verified_txs if x is not None]
 
                 zellular.send(txs)
@@ -292,10 +332,25 @@ def pull_batches(
 def verify_batches(
     zellular_queue: mp.Queue,
     queue: mp.Queue,
+    trusted_index: int,
+    verified: VerifiedCache | None = None,
+    rejected: Rejections | None = None,
 ):
-    with TransactionVerifier(num_processes=4) as tx_verifier:
+    with TransactionVerifier(
+        num_processes=4, cache=verified, rejections=rejected
+    ) as tx_verifier:
+        # batches handed to the verifier, oldest first, the next ones are
+        # handed over while the workers verify the previous ones
+        pending: deque[tuple[list[bytes], int, VerifyTicket]] = deque()
         try:
             while True:
+                if pending and (
+                    len(pending) == tx_verifier.slots or zellular_queue.empty()
+                ):
+                    txs, index, ticket = pending.popleft()
+                    queue.put((tx_verifier.finish(txs, ticket), index))
+                    continue
+
                 item = zellular_queue.get()
                 if item is None:
                     break
@@ -303,16 +358,76 @@ def verify_batches(
 
                 txs: list[str] = json.loads(batch)
                 finalized_txs = [x.encode("latin-1") for x in txs]
-                verified_txs = tx_verifier.verify(finalized_txs)
-                queue.put((verified_txs, index))
+                # trusted history is only decoded, see process_loop
+                ticket = tx_verifier.submit(finalized_txs, verify=index > trusted_index)
+                pending.append((finalized_txs, index, ticket))
+            for txs, index, ticket in pending:
+                queue.put((tx_verifier.finish(txs, ticket), index))
         finally:
             queue.put(None)
 
 
-async def process_loop():
+def trusted_digest_matches(expected: str) -> bool:
+    """Whether the state digest is the one expected after the trusted history."""
+    if zex.digest.value == int(expected, 16):
+        return True
+    logger.critical(
+        "state digest {digest:064x} after the trusted history up to {index} is "
+        "not the configured {expected}, stopping",
+        digest=zex.digest.value,
+        index=zex.last_tx_index,
+        expected=expected,
+    )
+    return False
+
+
+async def process_loop(verified: VerifiedCache | None = None):
     zellular = create_zellular_instance()
     verbose = settings.zex.verbose
 
+    replayed = zex.replay_journal()
+    if replayed:
+        logger.info(
+            "replayed {replayed} journaled batches up to {index}",
+            replayed=replayed,
+            index=zex.last_tx_index,
+        )
+
+    # finalized history up to the trusted index is applied without verifying
+    # signatures, when it is finalized already and the digest expected at
+    # its end is known, which is checked before verifying the next batches
+    trusted_index = settings.zex.trusted_replay_index
+    trusted_digest = settings.zex.trusted_replay_digest
+    if trusted_index <= zex.last_tx_index:
+        # the trusted history may have been journaled before its digest was
+        # found to differ
+        if (
+            trusted_digest
+            and trusted_index == zex.last_tx_index
+            and not trusted_digest_matches(trusted_digest)
+        ):
+            stop_event.set()
+            if zex.journal is not None:
+                zex.journal.close()
+            return
+        trusted_index = 0
+    elif not trusted_digest:
+        logger.warning(
+            "trusted_replay_digest is not set, verifying the history up to {index}",
+            index=trusted_index,
+        )
+        trusted_index = 0
+    elif trusted_index > zellular.get_last_finalized()["index"]:
+        logger.warning(
+            "the trusted history up to {index} is not finalized yet, verifying it",
+            index=trusted_index,
+        )
+        trusted_index = 0
+    else:
+        logger.info(
+            "catching up without verification up to {index}", index=trusted_index
+        )
+
     zellular_queue = mp.Queue(100)
     queue = mp.Queue(100)
 
@@ -322,12 +437,22 @@ async def process_loop():
     )
     tx_verifier_process = mp.Process(
         target=verify_batches,
-        args=(zellular_queue, queue),
+        args=(
+            zellular_queue,
+            queue,
+            trusted_index,
+            verified,
+            rejections["sequenced"],
+        ),
     )
 
     tx_fetcher_process.start()
     tx_verifier_process.start()
 
+    if settings.zex.match_workers > 1:
+        zex.shards = ShardedMatcher(zex, settings.zex.match_workers)
+        zex.shards.start()
+
     while True:
         if stop_event.is_set():
             tx_fetcher_process.kill()
@@ -344,12 +469,20 @@ async def process_loop():
             logger.warning("got None from queue")
             break
 
-        verified_txs, index = item
+        batch, index = item
         if verbose:
             logger.critical(f"index {index} received from redis")
         try:
             now = time.time()
-            zex.process(verified_txs, index)
+            zex.catching_up = index <= trusted_index
+            zex.process(decode_batch(batch), index)
+            if (
+                trusted_index
+                and index == trusted_index
+                and not trusted_digest_matches(trusted_digest)
+            ):
+                stop_event.set()
+                continue
 
             # TODO: the for loop takes all the CPU time. the sleep gives time to other tasks to run. find a better solution
             await asyncio.sleep(0)
@@ -358,3 +491,10 @@ async def process_loop():
             logger.exception(e)
         except ValueError as e:
             logger.exception(e)
+
+    if zex.shards is not None:
+        zex.shards.stop()
+        zex.shards = None
+    zex.finish_state_save()
+    if zex.journal is not None:
+        zex.journal.close()
@@ -1,5 +1,4 @@
 from decimal import Decimal
-from struct import calcsize, unpack
 import hashlib
 
 from bitcoinutils.keys import P2trAddress, PublicKey
@@ -10,7 +9,9 @@ from loguru import logger
 from web3 import Web3
 
 from app import zex
+from app.codec import unpack_order
 from app.config import settings
+from app.fixed_point import from_units
 from app.models.response import (
     Addresses,
     NonceResponse,
@@ -24,7 +25,7 @@ from app.models.response import (
     Withdraw,
     WithdrawNonce,
 )
-from app.models.transaction import Deposit, WithdrawTransaction
+from app.models.transaction import Deposit
 from app.zex import BUY
 
 from . import NAMES, NETWORK_NAME
@@ -44,7 +45,7 @@ def _user_assets(user: bytes) -> list[UserAssetResponse]:
         result.append(
             UserAssetResponse(
                 asset=asset,
-                free=str(balance),
+                free=str(from_units(balance)),
                 locked="0",
                 freeze="0",
                 withdrawing="0",
@@ -62,15 +63,7 @@ def user_balances(id: int) -> list[UserAssetResponse]:
 
 
 def _parse_transaction(tx: bytes) -> tuple[int, Decimal, Decimal, int, bytes]:
-    operation, base_token_len, quote_token_len = unpack(">x B B B", tx[:4])
-
-    order_format = f">{base_token_len}s {quote_token_len}s d d I I 33s"
-    order_format_size = calcsize(order_format)
-    base_token, quote_token, amount, price, t, nonce, public = unpack(
-        order_format, tx[4 : 4 + order_format_size]
-    )
-    base_token = base_token.decode("ascii")
-    quote_token = quote_token.decode("ascii")
+    _, operation, _, _, amount, price, _, nonce, public = unpack_order(tx)
 
     return operation, Decimal(str(amount)), Decimal(str(price)), nonce, public
 
@@ -84,6 +77,7 @@ def user_trades(id: int) -> list[TradeResponse]:
     resp = {}
     for time, amount, pair, name, tx in trades:
         base_asset, quote_asset = pair.split("-")
+        amount = zex.state_manager.markets[pair].lot.to_decimal(amount)
 
         _, _, price, nonce, _ = _parse_transaction(tx)
 
@@ -112,11 +106,8 @@ def user_orders(id: int) -> list[OrderResponse]:
     resp = []
     order: bytes
     for order in orders:
-        side, base_token_len, quote_token_len = unpack(">x B B B", order[:4])
-        order_format = f">{base_token_len}s {quote_token_len}s d d I I"
-        order_format_size = calcsize(order_format)
-        base_token, quote_token, amount, price, t, nonce = unpack(
-            order_format, order[4 : 4 + order_format_size]
+        _, side, base_token, quote_token, amount, price, t, nonce, _ = unpack_order(
+            order
         )
         base_token = base_token.decode("ascii")
         quote_token = quote_token.decode("ascii")
@@ -157,22 +148,14 @@ def user_id(public: str):
 
 
 @router.get("/user/transfers")
-def user_transfers(id: int) -> list[TransferResponse]:
+def user_transfers(
+    id: int, offset: int = 0, limit: int | None = None
+) -> list[TransferResponse]:
     if id not in zex.id_to_public_lookup:
         raise HTTPException(404, {"error": "user not found"})
     user = zex.id_to_public_lookup[id]
     if user not in zex.state_manager.user_deposits:
         return []
-    all_deposits = zex.state_manager.user_deposits.get(user, []).copy()
-    all_withdraws = [
-        x
-        for state in zex.state_manager.chain_states.values()
-        for x in state.user_withdraws.get(user, [])
-    ]
-
-    sorted_transfers: list[WithdrawTransaction | Deposit] = sorted(
-        all_deposits + all_withdraws, key=lambda transfer: transfer.time
-    )
     return [
         TransferResponse(
             chain=t.chain,
@@ -181,7 +164,7 @@ def user_transfers(id: int) -> list[TransferResponse]:
             amount=t.amount if isinstance(t, Deposit) else -t.amount,
             time=t.time,
         )
-        for t in sorted_transfers
+        for t in zex.state_manager.user_transfers(user, offset, limit)
     ]
 
 
@@ -437,6 +420,16 @@ def get_withdraw_nonce_on_chain(chain: str):
     }
 
 
+def get_state_digest(last_tx_index: int | None = None):
+    """The state digest after a batch, the last one by default, see app.state_digest."""
+    if last_tx_index is None:
+        last_tx_index = zex.last_tx_index
+    digest = zex.digest.at(last_tx_index)
+    if digest is None:
+        raise HTTPException(404, {"error": "digest not available"})
+    return {"last_tx_index": last_tx_index, "digest": f"{digest:064x}"}
+
+
 def get_chain_withdraws(
     chain: str, offset: int, limit: int | None = None
 ) -> list[Withdraw]:
@@ -484,7 +477,7 @@ def get_user_withdraws(
     if user not in zex.state_manager.chain_states[chain].user_withdraws:
         return []
 
-    withdraws = zex.state_manager.chain_states[chain].user_withdraws.get(user, [])
+    withdraws = zex.state_manager.chain_states[chain].withdraws_of(user)
     if nonce and nonce >= len(withdraws):
         logger.debug(f"invalid nonce: maximum nonce is {len(withdraws) - 1}")
         raise HTTPException(400, {"error": "invalid nonce"})
@@ -512,7 +505,7 @@ def get_user_withdraws(
         )
     else:
         result = []
-        for withdraw in zex.state_manager.chain_states[chain].user_withdraws[user]:
+        for withdraw in withdraws:
             token_info = settings.zex.verified_tokens.get(withdraw.token_name)
             if token_info:
                 token_contract = token_info[withdraw.chain].contract_address
@@ -539,7 +532,9 @@ if zex.light_node:
     light_router.get("/user/withdraws")(get_user_withdraws)
     light_router.get("/withdraw/nonce/last")(get_withdraw_nonce_on_chain)
     light_router.get("/withdraws")(get_chain_withdraws)
+    light_router.get("/state/digest")(get_state_digest)
 else:
     router.get("/user/withdraws")(get_user_withdraws)
     router.get("/withdraw/nonce/last")(get_withdraw_nonce_on_chain)
     router.get("/withdraws")(get_chain_withdraws)
+    router.get("/state/digest")(get_state_digest)
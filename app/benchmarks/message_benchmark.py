@@ -0,0 +1,46 @@
+from struct import pack
+import timeit
+
+import numpy as np
+
+from app.codec import ORDER_HEADER, order_struct
+from app.messages import order_msg
+
+# Order transaction in the current layout
+order_tx = (
+    pack(">B B B B", 1, ord("b"), 5, 5)
+    + b"zWBTCzUSDT"
+    + pack(">d d I I", 0.00012, 25000.25, 1700000000, 7)
+    + b"\x02" * 33
+    + b"\x00" * 64
+)
+
+
+# Method formatting the message with an f-string and numpy
+def order_msg_with_numpy(tx):
+    version, side, base_token_len, quote_token_len = ORDER_HEADER.unpack_from(tx)
+    base_token, quote_token, amount, price, t, nonce, public = order_struct(
+        base_token_len, quote_token_len
+    ).unpack_from(tx, ORDER_HEADER.size)
+    msg = f"""v: {version}
+name: {"buy" if side == ord("b") else "sell"}
+base token: {base_token.decode("ascii")}
+quote token: {quote_token.decode("ascii")}
+amount: {np.format_float_positional(amount, trim="0")}
+price: {np.format_float_positional(price, trim="0")}
+t: {t}
+nonce: {nonce}
+public: {public.hex()}
+"""
+    return "".join(("\x19Ethereum Signed Message:\n", str(len(msg)), msg)).encode()
+
+
+assert order_msg(order_tx) == order_msg_with_numpy(order_tx)
+
+# Benchmarking
+iterations = 200000
+time_numpy = timeit.timeit(lambda: order_msg_with_numpy(order_tx), number=iterations)
+time_builder = timeit.timeit(lambda: order_msg(order_tx), number=iterations)
+
+print(f"Time with f-string and numpy: {time_numpy:.6f} seconds")
+print(f"Time with app.messages: {time_builder:.6f} seconds")
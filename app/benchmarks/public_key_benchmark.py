@@ -0,0 +1,40 @@
+import timeit
+
+from eth_hash.auto import keccak
+from secp256k1 import PrivateKey, PublicKey
+
+from app.verify import cached_public_key
+
+# A signer with a key and a signature, as in an order of a market maker
+private_key = PrivateKey()
+public = private_key.pubkey.serialize()
+msg_hash = keccak(b"order message")
+sig = private_key.ecdsa_serialize_compact(private_key.ecdsa_sign(msg_hash, raw=True))
+
+
+# Method parsing the public key of every transaction
+def verify_with_parsing():
+    pubkey = PublicKey(public, raw=True)
+    return pubkey.ecdsa_verify(
+        msg_hash, pubkey.ecdsa_deserialize_compact(sig), raw=True
+    )
+
+
+# Method reusing the parsed key of a repeat signer
+def verify_with_cached_key():
+    pubkey = cached_public_key(public)
+    return pubkey.ecdsa_verify(
+        msg_hash, pubkey.ecdsa_deserialize_compact(sig), raw=True
+    )
+
+
+# Benchmarking
+iterations = 100000
+time_parsing = timeit.timeit(verify_with_parsing, number=iterations)
+time_cached = timeit.timeit(verify_with_cached_key, number=iterations)
+
+print(f"Time parsing the key: {time_parsing:.6f} seconds")
+print(f"Time with the cached key: {time_cached:.6f} seconds")
+print(
+    f"Saving per transaction: {(time_parsing - time_cached) / iterations * 1e6:.2f} us"
+)
@@ -1,6 +1,8 @@
-from struct import unpack
+from struct import calcsize, pack, unpack
 import timeit
 
+from app.codec import unpack_order
+
 # Example data
 tx = (
     b"\x01bBST\x00\x00\x00\x01BST\x00\x00\x00\x02?\xb9\x99\x99\x99\x99\x99\x9a@\x93J=p\xa3\xd7\nf\xa8\x13\x1f\x00"
@@ -35,3 +37,35 @@ time_int_from_bytes = timeit.timeit(
 
 print(f"Time with unpack: {time_unpack:.6f} seconds")
 print(f"Time with int.from_bytes: {time_int_from_bytes:.6f} seconds")
+
+
+# Order transaction in the current layout
+order_tx = (
+    pack(">B B B B", 1, ord("b"), 5, 5)
+    + b"zWBTCzUSDT"
+    + pack(">d d I I", 0.5, 25000.25, 1700000000, 7)
+    + b"\x02" * 33
+    + b"\x00" * 64
+)
+
+
+# Method building the format string of the order on every call
+def parse_order_with_format_string(tx):
+    side, base_token_len, quote_token_len = unpack(">x B B B", tx[:4])
+    order_format = f">{base_token_len}s {quote_token_len}s d d I I 33s"
+    order_format_size = calcsize(order_format)
+    return (side,) + unpack(order_format, tx[4 : 4 + order_format_size])
+
+
+# Method using the cached struct.Struct of app.codec
+def parse_order_with_codec(tx):
+    return unpack_order(tx)
+
+
+time_format_string = timeit.timeit(
+    lambda: parse_order_with_format_string(order_tx), number=iterations
+)
+time_codec = timeit.timeit(lambda: parse_order_with_codec(order_tx), number=iterations)
+
+print(f"Time with order format string: {time_format_string:.6f} seconds")
+print(f"Time with cached order Struct: {time_codec:.6f} seconds")
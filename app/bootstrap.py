@@ -0,0 +1,181 @@
+"""
+Download of the saved state a node starts from.
+
+The state at `state_source` is downloaded chunk by chunk with range
+requests into a file next to `state_dest`, so it is never held in memory
+and is memory-mapped when loaded. A dropped connection, or a restart,
+resumes the download where it stopped as long as the server still has
+the same state, which `If-Range` with the state's ETag checks. When the
+server sends the state's sha-256 in `Repr-Digest`, as `/state` does, the
+download is checked against it.
+"""
+
+from base64 import b64decode, b64encode
+from time import sleep
+import hashlib
+import os
+
+from loguru import logger
+import httpx
+
+CHUNK_SIZE = 8 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+# (inode, mtime, size) -> sha-256 of the saved states served by this node
+_digests: dict[tuple[int, int, int], bytes] = {}
+
+
+def download_path(state_dest) -> str:
+    return f"{state_dest}.download"
+
+
+def download_state(
+    url: str, state_dest, retries: int = 5, transport: httpx.BaseTransport | None = None
+) -> str | None:
+    """
+    Download the state at `url`, returns the path of the downloaded file,
+    or None when the server has no state.
+
+    A server that cannot be reached at all raises `httpx.ConnectError`
+    right away. Once the download started, failures are retried and only
+    raised after `retries` failures in a row.
+    """
+    path = download_path(state_dest)
+    etag_path = f"{path}.etag"
+    etag = None
+    if os.path.exists(path) and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            etag = f.read()
+    else:
+        open(path, "wb").close()
+    offset = os.path.getsize(path)
+    sha256 = _file_sha256(path)
+
+    failures = 0
+    mismatches = 0
+    started = False
+    with (
+        httpx.Client(timeout=30, transport=transport) as client,
+        open(path, "r+b") as f,
+    ):
+        while True:
+            headers = {"Range": f"bytes={offset}-{offset + CHUNK_SIZE - 1}"}
+            if etag is not None:
+                headers["If-Range"] = etag
+            try:
+                with client.stream("GET", url, headers=headers) as response:
+                    started = True
+                    if response.status_code == 404:
+                        return None
+                    if response.status_code == 416:
+                        # the file is whole, from a download that was not loaded
+                        total = offset
+                    elif response.status_code == 200:
+                        # no range support, or the server has another state
+                        offset = 0
+                        sha256 = hashlib.sha256()
+                        f.seek(0)
+                        f.truncate()
+                        etag = _save_etag(etag_path, response)
+                        offset = _write_body(response, f, sha256)
+                        total = offset
+                    elif response.status_code == 206:
+                        if etag is None:
+                            etag = _save_etag(etag_path, response)
+                        total = int(response.headers["content-range"].split("/")[1])
+                        f.seek(offset)
+                        offset = _write_body(response, f, sha256, offset)
+                    else:
+                        response.raise_for_status()
+                    digest = response.headers.get("repr-digest")
+            except httpx.TransportError as e:
+                if not started:
+                    if offset == 0:
+                        os.remove(path)
+                    raise
+                failures += 1
+                if failures > retries:
+                    raise
+                logger.warning(
+                    "state download failed at byte {offset}, retrying: {error}",
+                    offset=offset,
+                    error=e,
+                )
+                sleep(min(2**failures, 30))
+                continue
+            failures = 0
+            if offset < total:
+                continue
+            if total == 0:
+                return None
+
+            f.flush()
+            if digest is not None and _parse_digest(digest) != sha256.digest():
+                # start over, the whole state is downloaded again
+                mismatches += 1
+                if mismatches > retries:
+                    raise ValueError("downloaded state does not match its digest")
+                logger.warning("downloaded state does not match its digest")
+                etag, offset, sha256 = None, 0, hashlib.sha256()
+                f.seek(0)
+                f.truncate()
+                continue
+            return path
+
+
+def _write_body(response: httpx.Response, f, sha256, offset: int = 0) -> int:
+    for chunk in response.iter_bytes(READ_SIZE):
+        f.write(chunk)
+        sha256.update(chunk)
+        offset += len(chunk)
+    return offset
+
+
+def _save_etag(etag_path: str, response: httpx.Response) -> str | None:
+    etag = response.headers.get("etag")
+    if etag is None or etag.startswith("W/"):
+        # a weak ETag does not guarantee the same bytes, nothing is resumed
+        if os.path.exists(etag_path):
+            os.remove(etag_path)
+        return None
+    with open(etag_path, "w") as f:
+        f.write(etag)
+    return etag
+
+
+def _file_sha256(path: str):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_SIZE):
+            sha256.update(chunk)
+    return sha256
+
+
+def _parse_digest(header: str) -> bytes | None:
+    for item in header.split(","):
+        algorithm, _, value = item.strip().partition("=")
+        if algorithm.lower() == "sha-256":
+            return b64decode(value.strip(":"))
+    return None
+
+
+def state_digest(path) -> bytes:
+    """The sha-256 of the saved state at `path`, computed once per state."""
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        digest = _digests.get(key)
+        if digest is None:
+            sha256 = hashlib.sha256()
+            while chunk := f.read(READ_SIZE):
+                sha256.update(chunk)
+            digest = sha256.digest()
+            _digests.clear()
+            _digests[key] = digest
+    return digest
+
+
+def digest_headers(digest: bytes) -> dict[str, str]:
+    return {
+        "etag": f'"{digest.hex()}"',
+        "repr-digest": f"sha-256=:{b64encode(digest).decode()}:",
+    }
@@ -88,80 +88,112 @@ def depth_event(manager: ConnectionManager):
     return f
 
 
+def book_ticker_event(manager: ConnectionManager):
+    async def f(ticker_symbol: str, book_ticker: dict):
+        subs = manager.subscriptions.copy()
+        for channel, clients in subs.items():
+            parts = channel.split("@")
+            symbol, details = parts[0], parts[1]
+            if details != "bookTicker" or symbol != ticker_symbol:
+                continue
+
+            # Copy to avoid modification during iteration
+            for ws in clients.copy():
+                if ws not in manager.active_connections:
+                    manager.remove(ws)
+                    continue
+                try:
+                    await ws.send_json({"stream": channel, "data": book_ticker})
+                except Exception as e:
+                    manager.remove(ws)
+                    logger.exception(e)
+
+    return f
+
+
+def _execution_report(
+    nonce: int,
+    symbol: str,
+    side: str,
+    amount: Decimal,
+    price: Decimal,
+    execution_type: ExecutionType,
+    order_status: str,
+    last_filled: Decimal,
+    cumulative_filled: Decimal,
+    last_executed_price: Decimal,
+    transaction_time: int,
+    is_on_orderbook: bool,
+    is_maker: bool,
+    cumulative_quote_asset_quantity: Decimal,
+    last_quote_asset_quantity: Decimal,
+    quote_order_quantity: Decimal,
+    reject_reason: str = "NONE",
+) -> dict:
+    return {
+        "e": "executionReport",  # Event type
+        "E": int(time.time() * 1000),  # Event time
+        "s": symbol,  # Symbol
+        "c": nonce,  # Client order ID
+        "S": side,  # Side
+        "o": "",  # Order type
+        "f": "GTC",  # Time in force
+        "q": str(amount),  # Order quantity
+        "p": str(price),  # Order price
+        "P": "0.",  # Stop price
+        "F": "0.",  # Iceberg quantity
+        "g": -1,  # OrderListId
+        "C": "",  # Original client order ID; This is the ID of the order being canceled
+        "x": execution_type.value,  # Current execution type
+        "X": order_status,  # Current order status
+        "r": reject_reason,  # Order reject reason; will be an error code.
+        "i": nonce,  # Order ID
+        "l": str(last_filled),  # Last executed quantity
+        "z": str(cumulative_filled),  # Cumulative filled quantity
+        "L": str(last_executed_price),  # Last executed price
+        "n": "0",  # Commission amount
+        "N": None,  # Commission asset
+        "T": transaction_time,  # Transaction time
+        "t": -1,  # Trade ID
+        "I": 8641984,  # Ignore
+        "w": is_on_orderbook,  # Is the order on the book?
+        "m": is_maker,  # Is this trade the maker side?
+        "M": False,  # Ignore
+        "O": 0,  # Order creation time
+        "Z": str(
+            cumulative_quote_asset_quantity
+        ),  # Cumulative quote asset transacted quantity
+        "Y": str(
+            last_quote_asset_quantity
+        ),  # Last quote asset transacted quantity (i.e. lastPrice * lastQty)
+        "Q": str(quote_order_quantity),  # Quote Order Quantity
+        "W": 0,  # Working Time; This is only visible if the order has been placed on the book.
+        "V": "NONE",  # SelfTradePreventionMode
+    }
+
+
 def user_order_event(manager: ConnectionManager):
-    async def f(
-        public: str,
-        nonce: int,
-        symbol: str,
-        side: str,
-        amount: Decimal,
-        price: Decimal,
-        execution_type: ExecutionType,
-        order_status: str,
-        last_filled: Decimal,
-        cumulative_filled: Decimal,
-        last_executed_price: Decimal,
-        transaction_time: int,
-        is_on_orderbook: bool,
-        is_maker: bool,
-        cumulative_quote_asset_quantity: Decimal,
-        last_quote_asset_quantity: Decimal,
-        quote_order_quantity: Decimal,
-        reject_reason: str = "NONE",
-    ):
+    async def f(user_events: dict[str, list[dict]]):
+        """Send the order events of a batch, keyed by user public in hex."""
+        reports: dict[str, list[dict]] = {}
         subs = manager.subscriptions.copy()
         for channel, clients in subs.items():
             parts = channel.split("@")
             user_public, details = parts[0], parts[1]
-            if "executionReport" not in details or user_public != public:
+            if "executionReport" not in details or user_public not in user_events:
                 continue
 
+            if user_public not in reports:
+                reports[user_public] = [
+                    _execution_report(**event) for event in user_events[user_public]
+                ]
             for ws in clients.copy():
                 if ws not in manager.active_connections:
                     manager.remove(ws)
                     continue
                 try:
-                    data = {
-                        "e": "executionReport",  # Event type
-                        "E": int(time.time() * 1000),  # Event time
-                        "s": symbol,  # Symbol
-                        "c": nonce,  # Client order ID
-                        "S": side,  # Side
-                        "o": "",  # Order type
-                        "f": "GTC",  # Time in force
-                        "q": str(amount),  # Order quantity
-                        "p": str(price),  # Order price
-                        "P": "0.",  # Stop price
-                        "F": "0.",  # Iceberg quantity
-                        "g": -1,  # OrderListId
-                        "C": "",  # Original client order ID; This is the ID of the order being canceled
-                        "x": execution_type.value,  # Current execution type
-                        "X": order_status,  # Current order status
-                        "r": reject_reason,  # Order reject reason; will be an error code.
-                        "i": nonce,  # Order ID
-                        "l": str(last_filled),  # Last executed quantity
-                        "z": str(cumulative_filled),  # Cumulative filled quantity
-                        "L": str(last_executed_price),  # Last executed price
-                        "n": "0",  # Commission amount
-                        "N": None,  # Commission asset
-                        "T": transaction_time,  # Transaction time
-                        "t": -1,  # Trade ID
-                        "I": 8641984,  # Ignore
-                        "w": is_on_orderbook,  # Is the order on the book?
-                        "m": is_maker,  # Is this trade the maker side?
-                        "M": False,  # Ignore
-                        "O": 0,  # Order creation time
-                        "Z": str(
-                            cumulative_quote_asset_quantity
-                        ),  # Cumulative quote asset transacted quantity
-                        "Y": str(
-                            last_quote_asset_quantity
-                        ),  # Last quote asset transacted quantity (i.e. lastPrice * lastQty)
-                        "Q": str(quote_order_quantity),  # Quote Order Quantity
-                        "W": 0,  # Working Time; This is only visible if the order has been placed on the book.
-                        "V": "NONE",  # SelfTradePreventionMode
-                    }
-                    await ws.send_json({"stream": channel, "data": data})
+                    for data in reports[user_public]:
+                        await ws.send_json({"stream": channel, "data": data})
                 except Exception as e:
                     manager.remove(ws)
                     logger.exception(e)
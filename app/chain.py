@@ -1,108 +1,121 @@
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from decimal import Decimal
 
+from app.deposit_set import DepositSet, deposit_key
 from app.models.transaction import WithdrawTransaction
 from app.proto import zex_pb2
+from app.snapshot import Table
+from app.state_delta import StateChanges, select
 
 
 @dataclass
 class ChainState:
     """Manages state for a specific blockchain."""
 
-    deposits: set[tuple[str, int]]
+    deposits: DepositSet
     balances: dict[str, Decimal]  # contract_address -> balance
     withdraw_nonce: int
     user_withdraw_nonces: dict[bytes, int]  # public_key -> nonce
-    user_withdraws: dict[bytes, list[WithdrawTransaction]]  # public_key -> withdraws
-    withdraws: list[WithdrawTransaction]
     contract_decimals: dict[str, int]  # contract_address -> decimal
+    # raw txs of loaded withdraws, parsed when `withdraws` or `user_withdraws`
+    # is first used
+    _saved_withdraws: list[bytes] = field(default_factory=list, init=False)
+    _withdraws: list[WithdrawTransaction] = field(default_factory=list, init=False)
+    # public_key -> positions in `withdraws` of the user's withdraws
+    _user_withdraws: dict[bytes, array] = field(default_factory=dict, init=False)
 
     @classmethod
     def create_empty(cls):
         return cls(
-            deposits=set(),
+            deposits=DepositSet(),
             balances={},
             withdraw_nonce=0,
             user_withdraw_nonces={},
-            user_withdraws={},
-            withdraws=[],
             contract_decimals={},
         )
 
-    def to_protobuf(self, chain: str, pb_state: zex_pb2.ZexState):
-        """Serialize chain state to protobuf."""
-        # Serialize deposits
-        pb_deposits = pb_state.deposits[chain]
-        for tx_hash, vout in self.deposits:
-            entry = pb_deposits.deposits.add()
-            entry.tx_hash = tx_hash
-            entry.vout = vout
-
-        # Serialize withdraws
-        pb_withdraws = pb_state.withdraws_on_chain[chain]
-        pb_withdraws.raw_txs.extend([w.raw_tx for w in self.withdraws])
-
-        # Serialize user withdraws
-        pb_user_withdraws = pb_state.user_withdraws_on_chain[chain]
-        for public, withdraw_list in self.user_withdraws.items():
-            entry = pb_user_withdraws.withdraws.add()
-            entry.public_key = public
-            entry.raw_txs.extend([w.raw_tx for w in withdraw_list])
-
-        # Serialize user withdraw nonces
-        pb_withdraw_nonces = pb_state.user_withdraw_nonce_on_chain[chain]
-        for public, nonce in self.user_withdraw_nonces.items():
-            entry = pb_withdraw_nonces.nonces.add()
-            entry.public_key = public
-            entry.nonce = nonce
-
-        # Serialize withdraw nonce
-        pb_state.withdraw_nonce_on_chain[chain] = self.withdraw_nonce
-
-        # Serialize contract decimals
-        pb_state.contract_decimal_on_chain[chain].contract_decimal.update(
-            self.contract_decimals
-        )
-
-    @classmethod
-    def from_protobuf(cls, chain: str, pb_state: zex_pb2.ZexState) -> "ChainState":
-        """Deserialize chain state from protobuf."""
-        # Deserialize deposits
-        deposits = {
-            (item.tx_hash, item.vout) for item in pb_state.deposits[chain].deposits
-        }
-
-        # Deserialize withdraws
-        withdraws = [
-            WithdrawTransaction.from_tx(raw_tx)
-            for raw_tx in pb_state.withdraws_on_chain[chain].raw_txs
-        ]
-
-        # Deserialize user withdraws
-        user_withdraws = {
-            entry.public_key: [
-                WithdrawTransaction.from_tx(raw_tx) for raw_tx in entry.raw_txs
-            ]
-            for entry in pb_state.user_withdraws_on_chain[chain].withdraws
-        }
-
-        # Deserialize user withdraw nonces
-        user_withdraw_nonces = {
-            entry.public_key: entry.nonce
-            for entry in pb_state.user_withdraw_nonce_on_chain[chain].nonces
-        }
-
-        # Deserialize contract decimals
-        contract_decimals = dict(
-            pb_state.contract_decimal_on_chain[chain].contract_decimal
-        )
-
-        return cls(
-            deposits=deposits,
-            balances={},  # This will be populated from assets
-            withdraw_nonce=pb_state.withdraw_nonce_on_chain[chain],
-            user_withdraw_nonces=user_withdraw_nonces,
-            user_withdraws=user_withdraws,
-            withdraws=withdraws,
-            contract_decimals=contract_decimals,
-        )
+    @property
+    def withdraws(self) -> list[WithdrawTransaction]:
+        if self._saved_withdraws:
+            self._parse_saved_withdraws()
+        return self._withdraws
+
+    @property
+    def user_withdraws(self) -> dict[bytes, array]:
+        """public_key -> positions in `withdraws` of the user's withdraws"""
+        if self._saved_withdraws:
+            self._parse_saved_withdraws()
+        return self._user_withdraws
+
+    def withdraws_of(self, public: bytes) -> list[WithdrawTransaction]:
+        """The withdraws of a user, by their withdraw nonce."""
+        withdraws = self.withdraws
+        return [withdraws[i] for i in self.user_withdraws.get(public, ())]
+
+    def add_withdraw(self, withdraw: WithdrawTransaction) -> int:
+        """Record a processed withdraw, returns its position in `withdraws`."""
+        withdraws = self.withdraws
+        position = len(withdraws)
+        withdraws.append(withdraw)
+        if withdraw.public not in self._user_withdraws:
+            self._user_withdraws[withdraw.public] = array("Q")
+        self._user_withdraws[withdraw.public].append(position)
+        return position
+
+    def _parse_saved_withdraws(self):
+        saved, self._saved_withdraws = self._saved_withdraws, []
+        for raw_tx in saved:
+            self.add_withdraw(WithdrawTransaction.from_tx(raw_tx))
+
+    def to_protobuf(
+        self,
+        chain: str,
+        pb_chain: zex_pb2.ChainHistory,
+        users: Table,
+        changes: StateChanges | None = None,
+    ):
+        """Serialize chain state to protobuf, only `changes` for a delta."""
+        if changes is None:
+            pb_chain.deposit_keys = self.deposits.keys()
+            withdraws, changed_users = self._withdraws, None
+        else:
+            pb_chain.deposit_keys = b"".join(
+                sorted(
+                    deposit_key(tx_hash, vout)
+                    for tx_hash, vout in changes.deposits.get(chain, ())
+                )
+            )
+            withdraws = changes.withdraws.get(chain, ())
+            changed_users = changes.users
+
+        # withdraws per user are these grouped by user, rebuilt when first used
+        pb_chain.withdraws.extend([w.raw_tx for w in withdraws])
+        if changes is None:
+            pb_chain.withdraws.extend(self._saved_withdraws)
+
+        for public, nonce in select(self.user_withdraw_nonces, changed_users):
+            pb_chain.withdraw_nonce_users.append(users.index(public))
+            pb_chain.withdraw_nonces.append(nonce)
+
+        pb_chain.withdraw_nonce = self.withdraw_nonce
+        pb_chain.contract_decimals.update(self.contract_decimals)
+
+    def merge_protobuf(self, pb_chain: zex_pb2.ChainHistory, users: list[bytes]):
+        """Add a saved chain history, or a delta of it, to this chain state."""
+        self.deposits.update_keys(pb_chain.deposit_keys)
+        # states saved before deposit keys
+        for deposit in zip(
+            pb_chain.deposit_tx_hashes, pb_chain.deposit_vouts, strict=True
+        ):
+            self.deposits.add(deposit)
+
+        self._saved_withdraws.extend(pb_chain.withdraws)
+
+        for user, nonce in zip(
+            pb_chain.withdraw_nonce_users, pb_chain.withdraw_nonces, strict=True
+        ):
+            self.user_withdraw_nonces[users[user]] = nonce
+
+        self.withdraw_nonce = pb_chain.withdraw_nonce
+        self.contract_decimals.update(pb_chain.contract_decimals)
@@ -0,0 +1,75 @@
+"""
+Binary layouts of transactions.
+
+Layouts containing variable length token names are compiled into a
+`struct.Struct` once per combination of token lengths and reused, and
+fields are read with `unpack_from` at their offset instead of slicing the
+transaction first.
+"""
+
+from functools import cache
+from struct import Struct
+
+# version, side, base token length, quote token length
+ORDER_HEADER = Struct(">B B B B")
+# version, operation, token length
+WITHDRAW_HEADER = Struct(">B B B")
+# version, operation, chain, number of deposits
+DEPOSIT_HEADER = Struct(">B B 3s H")
+# tx hash, token contract, amount, decimal, time, user id, vout
+DEPOSIT_ENTRY = Struct(">66s 42s 32s B I Q B")
+# nonce, FROST signature, ECDSA signature at the end of a deposit transaction
+DEPOSIT_SIGNATURES = Struct(">42s 32s 132s")
+
+
+@cache
+def order_tokens_struct(base_token_len: int, quote_token_len: int) -> Struct:
+    return Struct(f">{base_token_len}s {quote_token_len}s")
+
+
+@cache
+def order_struct(base_token_len: int, quote_token_len: int) -> Struct:
+    """Base token, quote token, amount, price, t, nonce and public of an order."""
+    return Struct(f">{base_token_len}s {quote_token_len}s d d I I 33s")
+
+
+@cache
+def withdraw_struct(token_len: int) -> Struct:
+    """Chain, token, amount, destination, t, nonce and public of a withdraw."""
+    return Struct(f">3s {token_len}s d 20s I I 33s")
+
+
+def unpack_order_tokens(tx: bytes, offset: int = 0) -> tuple[bytes, bytes]:
+    """Read the token names of the order at `offset` of `tx`."""
+    _, _, base_token_len, quote_token_len = ORDER_HEADER.unpack_from(tx, offset)
+    return order_tokens_struct(base_token_len, quote_token_len).unpack_from(
+        tx, offset + ORDER_HEADER.size
+    )
+
+
+def unpack_order(tx: bytes, offset: int = 0) -> tuple:
+    """
+    Read the order at `offset` of `tx`.
+
+    Returns version, side, base token, quote token, amount, price, t, nonce
+    and public.
+    """
+    version, side, base_token_len, quote_token_len = ORDER_HEADER.unpack_from(
+        tx, offset
+    )
+    return (version, side) + order_struct(base_token_len, quote_token_len).unpack_from(
+        tx, offset + ORDER_HEADER.size
+    )
+
+
+def unpack_withdraw(tx: bytes) -> tuple:
+    """
+    Read a withdraw transaction.
+
+    Returns version, operation, chain, token, amount, destination, t, nonce
+    and public.
+    """
+    version, operation, token_len = WITHDRAW_HEADER.unpack_from(tx)
+    return (version, operation) + withdraw_struct(token_len).unpack_from(
+        tx, WITHDRAW_HEADER.size
+    )
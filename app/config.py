@@ -2,7 +2,7 @@ from decimal import Decimal
 from pathlib import Path
 from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from pydantic_settings import (
     BaseSettings,
     PydanticBaseSettingsSource,
@@ -10,6 +10,8 @@ from pydantic_settings import (
     YamlConfigSettingsSource,
 )
 
+from app.fixed_point import BALANCE_DECIMALS, StepSize
+
 type Chain = str
 type TokenName = str
 
@@ -31,6 +33,22 @@ class Token(BaseModel):
     decimal: int
 
 
+class MarketConfig(BaseModel):
+    tick_size: Decimal = Decimal("0.00000001")
+    lot_size: Decimal = Decimal("0.00000001")
+
+    @model_validator(mode="after")
+    def check_step_sizes(self) -> "MarketConfig":
+        # the quote amount of a lot at one tick must be whole balance units
+        tick, lot = StepSize(self.tick_size), StepSize(self.lot_size)
+        if tick.decimals + lot.decimals > BALANCE_DECIMALS:
+            raise ValueError(
+                f"tick size {self.tick_size} and lot size {self.lot_size} have "
+                f"more than {BALANCE_DECIMALS} decimals together"
+            )
+        return self
+
+
 class ZexSettings(BaseModel):
     host: str = "0.0.0.0"
     port: int = 15782
@@ -39,7 +57,31 @@ class ZexSettings(BaseModel):
     state_source: str
     state_dest: Path
     state_save_frequency: int
+    # every Nth saved state is a full checkpoint, the others are deltas
+    state_checkpoint_frequency: int = 10
+    # "zstd" needs the zstandard package
+    state_compression: Literal["none", "zlib", "zstd"] = "none"
+    # directory of the journal of processed batches, replayed after a
+    # restart, empty to disable
+    journal_dir: str = ""
+    # seconds between fsyncs of the journal
+    journal_sync_interval: float = 0.1
+    journal_segment_size: int = 64 * 1024 * 1024
+    # directory of the files holding the keys of older deposits, see
+    # app.deposit_set, the system's temporary directory when empty
+    deposit_keys_dir: str = ""
+    # batches up to this index are finalized history the operator trusts,
+    # e.g. up to a known checkpoint, they are applied without verifying
+    # their signatures and without publishing anything to clients
+    trusted_replay_index: int = 0
+    # the state digest after the batch at trusted_replay_index, as served
+    # by /state/digest, the node stops if its own differs; history is
+    # verified when it is not set
+    trusted_replay_digest: str = ""
     tx_transmit_delay: float
+    # number of valid transactions remembered so that the ones submitted to
+    # this node are not verified again when they are sequenced, 0 to disable
+    verify_cache_size: int = 262_144
     mainnet: bool
     use_redis: bool
     verbose: bool
@@ -57,6 +99,12 @@ class ZexSettings(BaseModel):
 
     verified_tokens: dict[TokenName, dict[Chain, Token]]
 
+    default_market: MarketConfig = MarketConfig()
+    markets: dict[str, MarketConfig] = {}
+    # number of processes matching orders, pairs are sharded between them;
+    # with 0 or 1 orders are matched in the sequencer process
+    match_workers: int = 0
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
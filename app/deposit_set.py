@@ -0,0 +1,135 @@
+"""
+Replay protection for deposits.
+
+Every deposit processed on a chain is remembered by a 16 byte key, the
+blake2b hash of its tx hash and vout, instead of a `(tx_hash, vout)`
+tuple that costs a couple hundred bytes as Python objects. New keys go
+to a small set, which is written as a sorted run of keys to a temporary
+file once it holds `HOT_SIZE` of them, see `deposit_keys_dir` in the
+settings. Runs are memory mapped and bisected in place, so older keys
+stay on disk and in the page cache instead of the Python heap. A new run
+is merged with the previous runs that are not larger, so runs at least
+double in size down the list: a key is rewritten O(log n) times and a
+lookup bisects O(log n) runs. A full snapshot stores all keys, sorted and
+concatenated, deltas only the keys they added.
+"""
+
+from collections.abc import Iterable
+from hashlib import blake2b
+from heapq import merge
+from itertools import islice
+import mmap
+import tempfile
+
+from app.config import settings
+
+KEY_SIZE = 16
+# new keys kept in a set before they are written as a run
+HOT_SIZE = 4096
+# keys written at once when merging runs
+MERGE_CHUNK = 65536
+
+
+def deposit_key(tx_hash: str, vout: int) -> bytes:
+    return blake2b(f"{tx_hash}:{vout}".encode(), digest_size=KEY_SIZE).digest()
+
+
+class _Run:
+    """Sorted keys in a memory mapped temporary file."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._file = tempfile.TemporaryFile(dir=settings.zex.deposit_keys_dir or None)
+        for chunk in chunks:
+            self._file.write(chunk)
+        self._file.flush()
+        self.keys = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.keys) // KEY_SIZE
+
+    def __iter__(self):
+        keys = self.keys
+        return (keys[i : i + KEY_SIZE] for i in range(0, len(keys), KEY_SIZE))
+
+    def __contains__(self, key: bytes) -> bool:
+        keys = self.keys
+        low, high = 0, len(keys) // KEY_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * KEY_SIZE
+            found = keys[offset : offset + KEY_SIZE]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return True
+        return False
+
+
+def _merge(runs: list[Iterable[bytes]]) -> _Run:
+    """One run of the sorted keys of `runs`, which have no key in common."""
+    keys = merge(*runs)
+    return _Run(iter(lambda: b"".join(islice(keys, MERGE_CHUNK)), b""))
+
+
+class DepositSet:
+    """The deposits processed on a chain, by `(tx_hash, vout)`."""
+
+    def __init__(self, keys: bytes = b""):
+        # runs of older keys, largest first
+        self._runs: list[_Run] = [_Run([keys])] if keys else []
+        self._hot: set[bytes] = set()
+
+    def __contains__(self, deposit: tuple[str, int]) -> bool:
+        return self.has_key(deposit_key(*deposit))
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs) + len(self._hot)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DepositSet):
+            return NotImplemented
+        return self.keys() == other.keys()
+
+    def has_key(self, key: bytes) -> bool:
+        return key in self._hot or any(key in run for run in self._runs)
+
+    def add(self, deposit: tuple[str, int]):
+        self.add_key(deposit_key(*deposit))
+
+    def add_key(self, key: bytes):
+        if self.has_key(key):
+            return
+        self._hot.add(key)
+        if len(self._hot) >= HOT_SIZE:
+            self._write_hot()
+
+    def update_keys(self, keys: bytes):
+        """Add sorted and concatenated keys, as returned by `keys`."""
+        if not self._runs and not self._hot:
+            if keys:
+                self._runs.append(_Run([keys]))
+            return
+        for i in range(0, len(keys), KEY_SIZE):
+            self.add_key(bytes(keys[i : i + KEY_SIZE]))
+
+    def keys(self) -> bytes:
+        """All keys, sorted and concatenated."""
+        self._write_hot()
+        if len(self._runs) > 1:
+            self._runs = [_merge(self._runs)]
+        return self._runs[0].keys[:] if self._runs else b""
+
+    def _write_hot(self):
+        if not self._hot:
+            return
+        hot = sorted(self._hot)
+        self._hot.clear()
+        runs: list[Iterable[bytes]] = [hot]
+        size = len(hot)
+        while self._runs and len(self._runs[-1]) <= size:
+            run = self._runs.pop()
+            runs.append(run)
+            size += len(run)
+        self._runs.append(_merge(runs))
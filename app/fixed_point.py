@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+# Balances of every token are stored as ints in units of 10**-BALANCE_DECIMALS
+BALANCE_DECIMALS = 18
+BALANCE_SCALE = 10**BALANCE_DECIMALS
+
+
+def scaled_to_decimal(value: int, decimals: int) -> Decimal:
+    """Return `value * 10**-decimals` exactly, without trailing zeros."""
+    if decimals <= 0:
+        return Decimal(value * 10**-decimals)
+    sign = "-" if value < 0 else ""
+    whole, fraction = divmod(abs(value), 10**decimals)
+    if not fraction:
+        return Decimal(f"{sign}{whole}")
+    return Decimal(f"{sign}{whole}.{fraction:0{decimals}d}".rstrip("0"))
+
+
+def to_units(amount: Decimal) -> int:
+    """Convert a token amount to balance units, it must be representable exactly."""
+    numerator, denominator = amount.as_integer_ratio()
+    units, remainder = divmod(numerator * BALANCE_SCALE, denominator)
+    if remainder:
+        raise ValueError(f"{amount} has more than {BALANCE_DECIMALS} decimals")
+    return units
+
+
+def floor_units(amount: Decimal) -> int:
+    """Convert a token amount to balance units, rounded down."""
+    numerator, denominator = amount.as_integer_ratio()
+    return numerator * BALANCE_SCALE // denominator
+
+
+def from_units(units: int) -> Decimal:
+    """Convert balance units back to a token amount."""
+    return scaled_to_decimal(units, BALANCE_DECIMALS)
+
+
+class StepSize:
+    """
+    A market's tick size or lot size.
+
+    Prices are kept as a number of ticks and quantities as a number of lots,
+    so the matching engine only does integer arithmetic.
+    """
+
+    __slots__ = ("size", "coefficient", "decimals", "_scale")
+
+    def __init__(self, size: Decimal):
+        if size <= 0:
+            raise ValueError(f"step size must be positive, got {size}")
+        sign, digits, exponent = size.normalize().as_tuple()
+        self.size = size
+        self.coefficient = int("".join(map(str, digits)))
+        self.decimals = -exponent
+        if self.decimals < 0:
+            self.coefficient *= 10**-self.decimals
+            self.decimals = 0
+        self._scale = 10**self.decimals
+
+    def to_steps(self, value: Decimal) -> int | None:
+        """Return the number of steps in `value`, or None if it is off the grid."""
+        try:
+            numerator, denominator = value.as_integer_ratio()
+        except (ValueError, OverflowError):
+            return None
+        steps, remainder = divmod(
+            numerator * self._scale, denominator * self.coefficient
+        )
+        if remainder:
+            return None
+        return steps
+
+    def floor_steps(self, value: Decimal) -> int:
+        """Return the number of whole steps in `value`, rounded down."""
+        numerator, denominator = value.as_integer_ratio()
+        return numerator * self._scale // (denominator * self.coefficient)
+
+    def to_decimal(self, steps: int) -> Decimal:
+        return scaled_to_decimal(steps * self.coefficient, self.decimals)
+
+    def to_units(self, decimals: int) -> int:
+        """Return the size of one step in units of 10**-decimals."""
+        if self.decimals > decimals:
+            raise ValueError(f"step size {self.size} is finer than 1e-{decimals}")
+        return self.coefficient * 10 ** (decimals - self.decimals)
@@ -0,0 +1,152 @@
+"""
+Write-ahead journal of the batches applied to the state.
+
+Every batch handed to `Zex.process` is appended to the journal before it
+is applied. After a crash the node loads its latest saved state and
+replays the batches journaled after it at full speed, instead of pulling
+them from the sequencer again.
+
+The journal is a directory of segment files, each named after the index
+of its first batch. A batch is one record:
+
+    payload length (4 bytes) | crc32 of payload (4 bytes) | index (8 bytes) | payload
+
+where the payload is the batch's verified transactions, each prefixed
+with its length. Records are written straight to the file, so a crashed
+process loses nothing, and synced to disk at most every `sync_interval`
+seconds. A record torn by a crash fails its length or checksum check and
+is dropped when the journal is opened again; the batches lost that way
+are pulled from the sequencer as before.
+"""
+
+from collections.abc import Iterator
+from struct import Struct
+from time import monotonic
+import os
+import zlib
+
+RECORD = Struct(">IIQ")
+TX_LENGTH = Struct(">I")
+SEGMENT_SUFFIX = ".journal"
+
+
+def segment_name(first_index: int) -> str:
+    return f"{first_index:020d}{SEGMENT_SUFFIX}"
+
+
+class BatchJournal:
+    def __init__(self, directory, sync_interval: float, segment_size: int):
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+
+        # first batch index of each segment, oldest first
+        self.segments = sorted(
+            int(name.removesuffix(SEGMENT_SUFFIX))
+            for name in os.listdir(directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+        self.last_index = 0
+        self._file = None
+        self._synced_at = monotonic()
+        if self.segments:
+            self._recover_last_segment()
+
+    def _path(self, first_index: int) -> str:
+        return os.path.join(self.directory, segment_name(first_index))
+
+    def _recover_last_segment(self):
+        """Find the last journaled batch, and cut a torn record after it."""
+        path = self._path(self.segments[-1])
+        valid_length = 0
+        with open(path, "rb") as f:
+            for index, _, end in _read_records(f):
+                self.last_index = index
+                valid_length = end
+        if valid_length < os.path.getsize(path):
+            os.truncate(path, valid_length)
+        if self.last_index == 0 and len(self.segments) > 1:
+            # an empty last segment, the last batch is in the previous one
+            os.remove(path)
+            self.segments.pop()
+            self._recover_last_segment()
+
+    def append(self, index: int, txs: list[bytes]):
+        """Journal a batch, batches already journaled are skipped."""
+        if index <= self.last_index:
+            return
+        payload = b"".join([TX_LENGTH.pack(len(tx)) + tx for tx in txs])
+        if self._file is None or self._file.tell() >= self.segment_size:
+            self._open_segment(index)
+        self._file.write(
+            RECORD.pack(len(payload), zlib.crc32(payload), index) + payload
+        )
+        self.last_index = index
+        if monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def _open_segment(self, first_index: int):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self.segments.append(first_index)
+            path = self._path(first_index)
+        elif self.segments:
+            # continue the last segment left by a previous run
+            path = self._path(self.segments[-1])
+        else:
+            self.segments.append(first_index)
+            path = self._path(first_index)
+        self._file = open(path, "ab", buffering=0)
+
+    def sync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._synced_at = monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def batches(self, after: int = 0) -> Iterator[tuple[int, list[bytes]]]:
+        """The journaled batches with an index after `after`, in order."""
+        for i, first_index in enumerate(self.segments):
+            next_first = self.segments[i + 1] if i + 1 < len(self.segments) else None
+            if next_first is not None and next_first <= after + 1:
+                continue
+            with open(self._path(first_index), "rb") as f:
+                for index, payload, _ in _read_records(f):
+                    if index > after:
+                        yield index, _split_txs(payload)
+
+    def discard_through(self, index: int):
+        """Remove the segments holding only batches up to `index`, the saved ones."""
+        while len(self.segments) > 1 and self.segments[1] <= index + 1:
+            os.remove(self._path(self.segments.pop(0)))
+
+
+def _read_records(f) -> Iterator[tuple[int, bytes, int]]:
+    """Yield (index, payload, end offset) of the records, up to a torn one."""
+    while True:
+        header = f.read(RECORD.size)
+        if len(header) < RECORD.size:
+            return
+        length, crc, index = RECORD.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield index, payload, f.tell()
+
+
+def _split_txs(payload: bytes) -> list[bytes]:
+    txs = []
+    offset = 0
+    while offset < len(payload):
+        (length,) = TX_LENGTH.unpack_from(payload, offset)
+        offset += TX_LENGTH.size
+        txs.append(payload[offset : offset + length])
+        offset += length
+    return txs
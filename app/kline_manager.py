@@ -2,6 +2,8 @@ from time import time as unix_time
 
 import pandas as pd
 
+from app.proto import zex_pb2
+
 
 def get_current_1m_open_time():
     now = int(unix_time())
@@ -12,18 +14,36 @@ def get_current_1m_open_time():
 class KlineManager:
     def __init__(self, pair: str):
         self.pair = pair
-        self.kline = pd.DataFrame(
-            columns=[
-                "OpenTime",
-                "CloseTime",
-                "Open",
-                "High",
-                "Low",
-                "Close",
-                "Volume",
-                "NumberOfTrades",
-            ]
-        ).set_index("OpenTime")
+        # candles are only built when first used, from the saved ones if
+        # the market was loaded, see `load_protobuf`
+        self._kline: pd.DataFrame | None = None
+        self._saved_klines: zex_pb2.Klines | None = None
+
+    @property
+    def kline(self) -> pd.DataFrame:
+        if self._kline is None:
+            if self._saved_klines is None:
+                self._kline = pd.DataFrame(
+                    columns=[
+                        "OpenTime",
+                        "CloseTime",
+                        "Open",
+                        "High",
+                        "Low",
+                        "Close",
+                        "Volume",
+                        "NumberOfTrades",
+                    ]
+                ).set_index("OpenTime")
+            else:
+                self._kline = self._from_protobuf(self._saved_klines)
+                self._saved_klines = None
+        return self._kline
+
+    @kline.setter
+    def kline(self, kline: pd.DataFrame):
+        self._kline = kline
+        self._saved_klines = None
 
     def get_last_price(self):
         if len(self.kline) == 0:
@@ -215,14 +235,15 @@ class KlineManager:
 
     def update_kline(self, price: float, trade_amount: float):
         current_candle_index = get_current_1m_open_time()
-        if len(self.kline.index) != 0 and current_candle_index == self.kline.index[-1]:
-            self.kline.iat[-1, 2] = max(price, self.kline.iat[-1, 2])  # High
-            self.kline.iat[-1, 3] = min(price, self.kline.iat[-1, 3])  # Low
-            self.kline.iat[-1, 4] = price  # Close
-            self.kline.iat[-1, 5] += trade_amount  # Volume
-            self.kline.iat[-1, 6] += 1  # NumberOfTrades
+        kline = self.kline
+        if len(kline.index) != 0 and current_candle_index == kline.index[-1]:
+            kline.iat[-1, 2] = max(price, kline.iat[-1, 2])  # High
+            kline.iat[-1, 3] = min(price, kline.iat[-1, 3])  # Low
+            kline.iat[-1, 4] = price  # Close
+            kline.iat[-1, 5] += trade_amount  # Volume
+            kline.iat[-1, 6] += 1  # NumberOfTrades
         else:
-            self.kline.loc[current_candle_index] = [
+            kline.loc[current_candle_index] = [
                 current_candle_index + 59999,  # CloseTime
                 price,  # Open
                 price,  # High
@@ -231,3 +252,46 @@ class KlineManager:
                 trade_amount,  # Volume
                 1,  # Volume, NumberOfTrades
             ]
+
+    def merge_candles(self, candles: pd.DataFrame):
+        """Overwrite or append candles computed by another copy of the market."""
+        for open_time, row in candles.iterrows():
+            self.kline.loc[open_time] = row.tolist()
+
+    def to_protobuf(self, pb_klines: zex_pb2.Klines):
+        """Serialize the candles column by column."""
+        if self._saved_klines is not None:
+            pb_klines.CopyFrom(self._saved_klines)
+            return
+        kline = self.kline
+        pb_klines.open_time.extend(kline.index.astype("int64").tolist())
+        pb_klines.close_time.extend(kline["CloseTime"].astype("int64").tolist())
+        pb_klines.open.extend(kline["Open"].tolist())
+        pb_klines.high.extend(kline["High"].tolist())
+        pb_klines.low.extend(kline["Low"].tolist())
+        pb_klines.close.extend(kline["Close"].tolist())
+        pb_klines.volume.extend(kline["Volume"].tolist())
+        pb_klines.number_of_trades.extend(
+            kline["NumberOfTrades"].astype("int64").tolist()
+        )
+
+    def load_protobuf(self, pb_klines: zex_pb2.Klines):
+        """Restore the candles serialized by `to_protobuf`, when first used."""
+        self._kline = None
+        self._saved_klines = pb_klines if pb_klines.open_time else None
+
+    @staticmethod
+    def _from_protobuf(pb_klines: zex_pb2.Klines) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "CloseTime": list(pb_klines.close_time),
+                "Open": list(pb_klines.open),
+                "High": list(pb_klines.high),
+                "Low": list(pb_klines.low),
+                "Close": list(pb_klines.close),
+                "Volume": list(pb_klines.volume),
+                "NumberOfTrades": list(pb_klines.number_of_trades),
+            },
+            index=pd.Index(list(pb_klines.open_time), dtype="int64", name="OpenTime"),
+            dtype="float64",
+        )
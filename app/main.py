@@ -14,6 +14,7 @@ from app import manager, stop_event
 from app.api.main import api_router
 from app.api.routes.system import process_loop, transmit_tx
 from app.config import settings
+from app.verified_cache import VerifiedCache
 from app.verify import TransactionVerifier
 
 
@@ -85,13 +86,19 @@ class JSONMessageManager:
 # Run the broadcaster in the background
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    # shared by the verifiers of submitted and of sequenced transactions
+    verified = (
+        VerifiedCache(settings.zex.verify_cache_size)
+        if settings.zex.verify_cache_size
+        else None
+    )
     t1 = Thread(
         target=asyncio.run,
-        args=(transmit_tx(),),
+        args=(transmit_tx(verified),),
     )
     t2 = Thread(
         target=asyncio.run,
-        args=(process_loop(),),
+        args=(process_loop(verified),),
     )
 
     t1.start()
@@ -102,6 +109,9 @@ async def lifespan(_: FastAPI):
     stop_event.set()
     t1.join(1)
     t2.join(1)
+    if verified is not None:
+        verified.close()
+        verified.unlink()
 
 
 app = FastAPI(
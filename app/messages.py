@@ -0,0 +1,214 @@
+"""
+Messages users sign for their transactions.
+
+The message of a transaction is rebuilt from its bytes to verify its
+signature, so it is built once per transaction on the submit path and
+again when it is sequenced. Messages are built as bytes with `%`
+formatting, floats are formatted from their `repr` instead of
+`numpy.format_float_positional`, which gives the same text, see
+`format_float`, and the text of the latest amounts and prices is kept as
+the same few repeat in most orders. Nothing is logged. The messages are
+the same bytes clients sign, any change to them invalidates signatures.
+"""
+
+from functools import lru_cache
+from struct import error as struct_error
+
+from .codec import ORDER_HEADER, WITHDRAW_HEADER, order_struct, withdraw_struct
+
+BUY, SELL = b"bs"
+
+PREFIX = b"\x19Ethereum Signed Message:\n"
+ORDER_MSG = (
+    b"v: %d\n"
+    b"name: %b\n"
+    b"base token: %b\n"
+    b"quote token: %b\n"
+    b"amount: %b\n"
+    b"price: %b\n"
+    b"t: %d\n"
+    b"nonce: %d\n"
+    b"public: %b\n"
+)
+WITHDRAW_MSG = (
+    b"v: %d\n"
+    b"name: withdraw\n"
+    b"token chain: %b\n"
+    b"token name: %b\n"
+    b"amount: %b\n"
+    b"to: 0x%b\n"
+    b"t: %d\n"
+    b"nonce: %d\n"
+    b"public: %b\n"
+)
+CANCEL_MSG = b"v: %d\nname: cancel\nslice: %b\npublic: %b\n"
+REGISTER_MSG = b"Welcome to ZEX."
+FLOAT_CACHE_SIZE = 4096
+
+
+class MessageFormatError(Exception):
+    """Custom exception for message formatting errors."""
+
+    pass
+
+
+def format_float(value: float) -> str:
+    """
+    The shortest text that reads back as `value`, without exponent, the same
+    as `numpy.format_float_positional(value, trim="0")`.
+    """
+    text = repr(value)
+    if "e" not in text:
+        return text
+    mantissa, exponent = text.split("e")
+    sign = ""
+    if mantissa[0] == "-":
+        sign, mantissa = "-", mantissa[1:]
+    integer, _, fraction = mantissa.partition(".")
+    digits = integer + fraction
+    # position of the decimal point in the digits
+    point = len(integer) + int(exponent)
+    if point <= 0:
+        return f"{sign}0.{'0' * -point}{digits}"
+    if point >= len(digits):
+        return f"{sign}{digits}{'0' * (point - len(digits))}.0"
+    return f"{sign}{digits[:point]}.{digits[point:]}"
+
+
+@lru_cache(maxsize=FLOAT_CACHE_SIZE)
+def _cached_float_text(value: float) -> bytes:
+    return format_float(value).encode()
+
+
+def _float_text(value: float) -> bytes:
+    # 0.0 and -0.0 are the same key of the cache
+    if not value:
+        return format_float(value).encode()
+    return _cached_float_text(value)
+
+
+def _signed(msg: bytes) -> bytes:
+    return b"%b%d%b" % (PREFIX, len(msg), msg)
+
+
+def order_msg(tx: bytes) -> bytes:
+    """
+    Format order message for verification.
+
+    Args:
+        tx: Transaction bytes containing order data
+
+    Returns:
+        Formatted message bytes
+
+    Raises:
+        MessageFormatError: If message formatting fails
+    """
+    try:
+        version, side, base_token_len, quote_token_len = ORDER_HEADER.unpack_from(tx)
+    except struct_error as e:
+        raise MessageFormatError(f"Failed to unpack header: {e}")
+    if base_token_len == 0 or quote_token_len == 0:
+        raise MessageFormatError("Invalid token length")
+
+    order_layout = order_struct(base_token_len, quote_token_len)
+    if len(tx) < ORDER_HEADER.size + order_layout.size:
+        raise MessageFormatError("Transaction too short for order data")
+    base_token, quote_token, amount, price, t, nonce, public = order_layout.unpack_from(
+        tx, ORDER_HEADER.size
+    )
+    if not (base_token.isascii() and quote_token.isascii()):
+        raise MessageFormatError("Invalid token encoding")
+    if side not in (BUY, SELL):
+        raise MessageFormatError(f"Invalid order side: {side}")
+
+    return _signed(
+        ORDER_MSG
+        % (
+            version,
+            b"buy" if side == BUY else b"sell",
+            base_token,
+            quote_token,
+            _float_text(amount),
+            _float_text(price),
+            t,
+            nonce,
+            public.hex().encode(),
+        )
+    )
+
+
+def withdraw_msg(tx: bytes) -> bytes:
+    """
+    Format withdrawal message for verification.
+
+    Args:
+        tx: Transaction bytes containing withdrawal data
+
+    Returns:
+        Formatted message bytes
+
+    Raises:
+        MessageFormatError: If message formatting fails
+    """
+    try:
+        version, _, token_len = WITHDRAW_HEADER.unpack_from(tx)
+    except struct_error as e:
+        raise MessageFormatError(f"Failed to unpack header: {e}")
+    if token_len == 0:
+        raise MessageFormatError("Invalid token length")
+
+    withdraw_layout = withdraw_struct(token_len)
+    if len(tx) < WITHDRAW_HEADER.size + withdraw_layout.size:
+        raise MessageFormatError("Transaction too short for withdrawal data")
+    token_chain, token_name, amount, destination, t, nonce, public = (
+        withdraw_layout.unpack_from(tx, WITHDRAW_HEADER.size)
+    )
+    if not (token_chain.isascii() and token_name.isascii()):
+        raise MessageFormatError("Invalid token encoding")
+
+    # the amount of withdraws is formatted by str, unlike orders
+    return _signed(
+        WITHDRAW_MSG
+        % (
+            version,
+            token_chain,
+            token_name,
+            repr(amount).encode(),
+            destination.hex().encode(),
+            t,
+            nonce,
+            public.hex().encode(),
+        )
+    )
+
+
+def cancel_msg(tx: bytes) -> bytes:
+    """
+    Format cancellation message for verification.
+
+    Args:
+        tx: Transaction bytes containing cancellation data
+
+    Returns:
+        Formatted message bytes
+
+    Raises:
+        MessageFormatError: If message formatting fails
+    """
+    # version, operation, the order and the public key before the signature
+    if len(tx) < 99:
+        raise MessageFormatError("Transaction too short for cancellation data")
+    return _signed(
+        CANCEL_MSG % (tx[0], tx[2:-97].hex().encode(), tx[-97:-64].hex().encode())
+    )
+
+
+def register_msg() -> bytes:
+    """
+    Format registration message for verification.
+
+    Returns:
+        Formatted message bytes
+    """
+    return _signed(REGISTER_MSG)
@@ -1,16 +1,36 @@
 from decimal import Decimal
-from struct import calcsize, unpack
+from functools import lru_cache
+from struct import Struct
+from typing import NamedTuple
 
 from eth_typing import ChecksumAddress
 from eth_utils.address import to_checksum_address
+from loguru import logger
 from pydantic import BaseModel
 
+from app.codec import (
+    DEPOSIT_ENTRY,
+    DEPOSIT_HEADER,
+    ORDER_HEADER,
+    unpack_order_tokens,
+    unpack_withdraw,
+)
 from app.config import settings
+from app.fixed_point import StepSize
+from app.order_book import Order
 
+BTC_DEPOSIT, DEPOSIT, WITHDRAW, BUY, SELL, CANCEL, REGISTER = b"xdwbscr"
 
-def chunkify(lst, n_chunks):
-    for i in range(0, len(lst), n_chunks):
-        yield lst[i : i + n_chunks]
+# status of a transaction in a verified batch, see `tx_record`
+INVALID, VALID, DECODED_ORDER = range(3)
+# status, then for a decoded order its side, the end of its token names in
+# the transaction, its nonce, and its price and amount in steps of its market
+TX_RECORD = Struct("<B B H I q q")
+INVALID_RECORD = (INVALID, 0, 0, 0, 0, 0)
+VALID_RECORD = (VALID, 0, 0, 0, 0, 0)
+STEPS_MAX = (1 << 63) - 1
+# pairs of the token names of orders, most markets see most orders
+PAIR_CACHE_SIZE = 1024
 
 
 def get_token_name(chain, address):
@@ -45,22 +65,18 @@ class DepositTransaction(BaseModel):
 
     @classmethod
     def from_tx(cls, tx: bytes) -> "DepositTransaction":
-        header_format = ">B B 3s H"
-        header_size = calcsize(header_format)
-        version, operation, chain, count = unpack(header_format, tx[:header_size])
+        version, operation, chain, count = DEPOSIT_HEADER.unpack_from(tx)
         chain = chain.upper().decode()
 
-        deposit_format = ">66s 42s 32s B I Q B"
-        deposit_size = calcsize(deposit_format)
-        raw_deposits = list(
-            chunkify(tx[header_size : header_size + deposit_size * count], deposit_size)
-        )
-
         deposits = []
 
-        for chunk in raw_deposits:
-            tx_hash, token_contract, amount, decimal, t, user_id, vout = unpack(
-                deposit_format, chunk[:deposit_size]
+        for offset in range(
+            DEPOSIT_HEADER.size,
+            DEPOSIT_HEADER.size + DEPOSIT_ENTRY.size * count,
+            DEPOSIT_ENTRY.size,
+        ):
+            tx_hash, token_contract, amount, decimal, t, user_id, vout = (
+                DEPOSIT_ENTRY.unpack_from(tx, offset)
             )
             amount = int.from_bytes(amount, byteorder="big")
             tx_hash = tx_hash.decode()
@@ -106,12 +122,17 @@ class WithdrawTransaction(BaseModel):
 
     @classmethod
     def from_tx(cls, tx: bytes) -> "WithdrawTransaction":
-        version, operation, token_len = unpack(">B B B", tx[:3])
-
-        withdraw_format = f">3s {token_len}s d 20s I I 33s"
-        chain, token_name, amount, destination, t, nonce, public = unpack(
-            withdraw_format, tx[3 : 3 + calcsize(withdraw_format)]
-        )
+        (
+            version,
+            operation,
+            chain,
+            token_name,
+            amount,
+            destination,
+            t,
+            nonce,
+            public,
+        ) = unpack_withdraw(tx)
         chain = chain.decode("ascii")
         token_name = token_name.decode("ascii")
 
@@ -131,3 +152,121 @@ class WithdrawTransaction(BaseModel):
 
     def hex(self):
         return self.raw_tx.hex()
+
+
+class DecodedTx(NamedTuple):
+    """
+    A transaction decoded once, by the verifier processes, for the engine.
+
+    `payload` is the `Order`, `DepositTransaction` or `WithdrawTransaction`
+    of the transaction, or the registered public key.
+    """
+
+    name: int
+    tx: bytes
+    pair: str = ""
+    base_token: str = ""
+    quote_token: str = ""
+    payload: Order | DepositTransaction | WithdrawTransaction | bytes | None = None
+
+
+_market_steps: dict[str, tuple[StepSize, StepSize]] = {}
+
+
+def get_market_steps(pair: str) -> tuple[StepSize, StepSize]:
+    """Return the configured tick and lot size of a market."""
+    steps = _market_steps.get(pair)
+    if steps is None:
+        config = settings.zex.markets.get(pair, settings.zex.default_market)
+        steps = (StepSize(config.tick_size), StepSize(config.lot_size))
+        _market_steps[pair] = steps
+    return steps
+
+
+def _order_tokens(tx: bytes, offset: int = 0) -> tuple[str, str]:
+    base_token, quote_token = unpack_order_tokens(tx, offset)
+    return base_token.decode("ascii"), quote_token.decode("ascii")
+
+
+def decode_tx(tx: bytes) -> DecodedTx | None:
+    """Decode a transaction, returns None for an unsupported version."""
+    version, name = tx[0:2]
+    if version != 1:
+        logger.error("invalid version", version=version)
+        return None
+
+    if name == DEPOSIT or name == BTC_DEPOSIT:
+        return DecodedTx(name, tx, payload=DepositTransaction.from_tx(tx))
+    if name == WITHDRAW:
+        return DecodedTx(name, tx, payload=WithdrawTransaction.from_tx(tx))
+    if name in (BUY, SELL):
+        base_token, quote_token = _order_tokens(tx)
+        pair = f"{base_token}-{quote_token}"
+        tick, lot = get_market_steps(pair)
+        order = Order.from_tx(tx, tick, lot)
+        return DecodedTx(name, tx, pair, base_token, quote_token, order)
+    if name == CANCEL:
+        # a cancel embeds the order's slice after its own version byte
+        base_token, quote_token = _order_tokens(tx, 1)
+        return DecodedTx(
+            name, tx, f"{base_token}-{quote_token}", base_token, quote_token
+        )
+    if name == REGISTER:
+        return DecodedTx(name, tx, payload=tx[2:35])
+    raise ValueError(f"invalid transaction name {name}")
+
+
+@lru_cache(maxsize=PAIR_CACHE_SIZE)
+def order_pair(tokens: bytes) -> tuple[str, str, str]:
+    """
+    The pair, base token and quote token of the token names of an order,
+    its transaction from the token name lengths to the end of the names.
+    """
+    base_token_len = tokens[0]
+    base_token = tokens[2 : 2 + base_token_len].decode("ascii")
+    quote_token = tokens[2 + base_token_len :].decode("ascii")
+    return f"{base_token}-{quote_token}", base_token, quote_token
+
+
+def tx_record(tx: bytes) -> tuple[int, int, int, int, int, int]:
+    """
+    The record of a valid transaction, see `TX_RECORD`.
+
+    Orders are decoded into it, by the verifier workers, the few other
+    transactions are decoded by `decode_record`.
+    """
+    if tx[:2] not in (b"\x01b", b"\x01s"):
+        return VALID_RECORD
+    try:
+        base_token, quote_token = _order_tokens(tx)
+        order = Order.from_tx(tx, *get_market_steps(f"{base_token}-{quote_token}"))
+    except Exception as e:
+        logger.exception(f"Error decoding transaction: {e}")
+        return INVALID_RECORD
+    if not (0 < order.price <= STEPS_MAX and 0 < order.amount <= STEPS_MAX):
+        # invalid, or too many steps for a record, left to the engine
+        return VALID_RECORD
+    tokens_end = ORDER_HEADER.size + tx[2] + tx[3]
+    return DECODED_ORDER, order.side, tokens_end, order.nonce, order.price, order.amount
+
+
+def decode_record(
+    tx: bytes,
+    status: int,
+    side: int,
+    tokens_end: int,
+    nonce: int,
+    price: int,
+    amount: int,
+) -> DecodedTx | None:
+    """
+    Decode a transaction from its record, see `tx_record`, an order is
+    built without unpacking its transaction again.
+    """
+    if status == INVALID:
+        return None
+    if status == VALID:
+        return decode_tx(tx)
+    pair, base_token, quote_token = order_pair(tx[2:tokens_end])
+    order = Order(tx, side, pair, price, amount, nonce, tx[-97:-64])
+    return DecodedTx(side, tx, pair, base_token, quote_token, order)
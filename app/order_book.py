@@ -0,0 +1,304 @@
+from bisect import bisect_left, insort
+from decimal import Decimal
+from itertools import islice
+from typing import NamedTuple
+
+from app.codec import unpack_order
+from app.fixed_point import StepSize
+
+
+class Order:
+    """
+    A decoded order transaction.
+
+    Created once when the transaction is decoded, then held by the book,
+    `Zex.amounts` and `Zex.orders` so that matching never parses tx bytes
+    again. Prices are in ticks and amounts in lots of the order's market.
+    While resting, the order is linked into its price level's queue.
+    """
+
+    __slots__ = (
+        "tx",
+        "side",
+        "pair",
+        "price",
+        "amount",
+        "remaining",
+        "nonce",
+        "public",
+        "user_id",
+        "level",
+        "prev",
+        "next",
+    )
+
+    def __init__(
+        self,
+        tx: bytes,
+        side: int,
+        pair: str,
+        price: int,
+        amount: int,
+        nonce: int,
+        public: bytes,
+        user_id: int = 0,
+    ):
+        self.tx = tx
+        self.side = side
+        self.pair = pair
+        self.price = price
+        self.amount = amount
+        self.remaining = amount
+        self.nonce = nonce
+        self.public = public
+        self.user_id = user_id
+        self.level: PriceLevel | None = None
+        self.prev: Order | None = None
+        self.next: Order | None = None
+
+    @classmethod
+    def from_tx(cls, tx: bytes, tick: StepSize, lot: StepSize) -> "Order":
+        _, side, base_token, quote_token, amount, price, _, nonce, public = (
+            unpack_order(tx)
+        )
+        pair = f"{base_token.decode('ascii')}-{quote_token.decode('ascii')}"
+        # prices and amounts off the market's grid decode to 0, which is invalid
+        price = tick.to_steps(Decimal(str(price))) or 0
+        amount = lot.to_steps(Decimal(str(amount))) or 0
+        return cls(tx, side, pair, price, amount, nonce, public)
+
+
+class DepthSide(NamedTuple):
+    """
+    One side of a published book, its best levels in ascending price order:
+    bids end with their best level and asks start with theirs.
+
+    Levels are read from the book, then the level changes of every batch
+    are folded into a copy of them when it is published, so a published
+    side is never modified and reads only slice it. When the side was not
+    read whole, levels past the worst one it holds are not known.
+    """
+
+    is_bid: bool
+    prices: list[int]
+    quantities: list[int]
+    complete: bool  # whether it holds every level of the side
+
+    @classmethod
+    def read(cls, book_side: "OrderBookSide", count: int) -> "DepthSide":
+        """Read up to `count` best levels of `book_side`."""
+        levels = book_side.top_levels(count)
+        complete = len(levels) < count
+        if book_side.is_bid:
+            levels = levels[::-1]
+        return cls(
+            book_side.is_bid,
+            [price for price, _ in levels],
+            [quantity for _, quantity in levels],
+            complete,
+        )
+
+    def with_changes(self, changes: dict[int, int], count: int) -> "DepthSide":
+        """
+        A copy with the level changes of a batch, price -> new quantity, 0
+        for a removed level, holding up to `count` levels.
+        """
+        prices, quantities = self.prices.copy(), self.quantities.copy()
+        for price, quantity in changes.items():
+            i = bisect_left(prices, price)
+            if i < len(prices) and prices[i] == price:
+                if quantity:
+                    quantities[i] = quantity
+                else:
+                    del prices[i], quantities[i]
+            elif quantity and (
+                self.complete or (0 < i if self.is_bid else i < len(prices))
+            ):
+                prices.insert(i, price)
+                quantities.insert(i, quantity)
+        complete = self.complete
+        excess = len(prices) - count
+        if excess > 0:
+            if self.is_bid:
+                del prices[:excess], quantities[:excess]
+            else:
+                del prices[count:], quantities[count:]
+            complete = False
+        return DepthSide(self.is_bid, prices, quantities, complete)
+
+    def top(self, limit: int) -> list[tuple[int, int]]:
+        """Return up to `limit` best levels as (price, quantity) pairs."""
+        if limit <= 0:
+            return []
+        if self.is_bid:
+            return list(
+                zip(
+                    self.prices[: -limit - 1 : -1],
+                    self.quantities[: -limit - 1 : -1],
+                    strict=True,
+                )
+            )
+        return list(zip(self.prices[:limit], self.quantities[:limit], strict=True))
+
+
+class DepthSnapshot(NamedTuple):
+    """
+    The best levels of a book as published after a batch.
+
+    Snapshots are immutable, so readers use them without taking the book's
+    lock while the engine keeps matching.
+    """
+
+    version: int  # final update id of the market when published
+    bids: DepthSide
+    asks: DepthSide
+
+
+class BookTicker(NamedTuple):
+    """Best bid and ask of a book, prices and quantities are 0 for an empty side."""
+
+    bid_price: int
+    bid_quantity: int
+    ask_price: int
+    ask_quantity: int
+
+
+class PriceLevel:
+    """
+    All resting orders at a single price, in time priority.
+
+    Orders form a doubly linked list so that appending, taking the oldest
+    order and unlinking any order by reference are all constant time.
+    """
+
+    __slots__ = ("price", "quantity", "count", "head", "tail")
+
+    def __init__(self, price: int):
+        self.price = price
+        self.quantity = 0  # aggregate remaining amount of the level
+        self.count = 0
+        self.head: Order | None = None
+        self.tail: Order | None = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        order = self.head
+        while order is not None:
+            yield order
+            order = order.next
+
+    def append(self, order: Order):
+        order.level = self
+        order.prev = self.tail
+        if self.tail is None:
+            self.head = order
+        else:
+            self.tail.next = order
+        self.tail = order
+        self.count += 1
+
+    def unlink(self, order: Order):
+        if order.prev is None:
+            self.head = order.next
+        else:
+            order.prev.next = order.next
+        if order.next is None:
+            self.tail = order.prev
+        else:
+            order.next.prev = order.prev
+        order.level = order.prev = order.next = None
+        self.count -= 1
+
+
+class OrderBookSide:
+    """
+    One side of a price-level order book.
+
+    Levels are kept in a dict keyed by price, and their priority keys in a
+    sorted list with the best level at the end, so the top of the book is
+    read and popped without shifting the rest of the list. Bids use the
+    price as key and asks the negated price.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.levels: dict[int, PriceLevel] = {}
+        self._keys: list[int] = []
+        self._order_count = 0
+
+    def __len__(self):
+        return self._order_count
+
+    def __bool__(self):
+        return bool(self._keys)
+
+    def _key(self, price: int) -> int:
+        return price if self.is_bid else -price
+
+    def best_level(self) -> PriceLevel | None:
+        if not self._keys:
+            return None
+        key = self._keys[-1]
+        return self.levels[key if self.is_bid else -key]
+
+    def best_price(self) -> int | None:
+        if not self._keys:
+            return None
+        key = self._keys[-1]
+        return key if self.is_bid else -key
+
+    def add(self, order: Order) -> PriceLevel:
+        """Append an order to the back of its price level's queue."""
+        price = order.price
+        level = self.levels.get(price)
+        if level is None:
+            level = PriceLevel(price)
+            self.levels[price] = level
+            insort(self._keys, self._key(price))
+        level.append(order)
+        level.quantity += order.remaining
+        self._order_count += 1
+        return level
+
+    def remove(self, order: Order):
+        """Unlink an order from its level, dropping the level once empty."""
+        level = order.level
+        level.unlink(order)
+        self._order_count -= 1
+        if level.count == 0:
+            self.remove_level(level.price)
+
+    def remove_level(self, price: int):
+        del self.levels[price]
+        key = self._key(price)
+        if self._keys[-1] == key:
+            self._keys.pop()
+        else:
+            del self._keys[bisect_left(self._keys, key)]
+
+    def iter_levels(self):
+        """Iterate levels from the best price outwards."""
+        for key in reversed(self._keys):
+            yield self.levels[key if self.is_bid else -key]
+
+    def iter_orders(self):
+        """Iterate resting orders in matching priority."""
+        for level in self.iter_levels():
+            yield from level
+
+    def depth(self, limit: int) -> list[list[int]]:
+        """Return up to `limit` best levels as [price, quantity] pairs."""
+        result = []
+        for level in self.iter_levels():
+            if len(result) >= limit:
+                break
+            result.append([level.price, level.quantity])
+        return result
+
+    def top_levels(self, limit: int) -> tuple[tuple[int, int], ...]:
+        """Return up to `limit` best levels as (price, quantity) pairs."""
+        return tuple(
+            (level.price, level.quantity) for level in islice(self.iter_levels(), limit)
+        )
@@ -0,0 +1,156 @@
+"""
+Checks of transactions before their signatures are verified.
+
+Verifying a signature costs a keccak and an ECDSA verification, or a FROST
+and an ECDSA verification for deposits, so transactions that can not be
+valid are rejected on their structure first: too short for their layout,
+an unsupported version or operation, or token names that are not ascii.
+These transactions fail verification or decoding anyway, so rejecting
+them early changes nothing about which transactions are applied.
+
+Transactions submitted to this node are also checked against what the
+engine would refuse, orders of a pair of the same token, amounts and
+prices that are not positive and finite, and orders with a nonce the
+user already used. They are not forwarded to the sequencer at all. Once
+sequenced, such transactions must still be applied like the others, e.g.
+an order with a zero price uses up its nonce, so they are not rejected
+by the verifier of sequenced batches.
+
+Rejections are counted by reason, see `Rejections`.
+"""
+
+from collections.abc import Mapping
+from struct import error as struct_error
+import math
+import multiprocessing
+
+from .codec import (
+    DEPOSIT_ENTRY,
+    DEPOSIT_HEADER,
+    DEPOSIT_SIGNATURES,
+    ORDER_HEADER,
+    WITHDRAW_HEADER,
+    order_struct,
+    unpack_order,
+    withdraw_struct,
+)
+
+DEPOSIT, WITHDRAW, BUY, SELL, CANCEL, REGISTER = b"dwbscr"
+
+REASONS = (
+    "length",
+    "version",
+    "operation",
+    "token",
+    "pair",
+    "amount",
+    "price",
+    "nonce",
+)
+SIGNATURE_SIZE = 64
+# version, operation, public key and signature
+REGISTER_SIZE = 2 + 33 + SIGNATURE_SIZE
+# version, operation, at least one byte of the order, public key and signature
+CANCEL_SIZE = 2 + 1 + 33 + SIGNATURE_SIZE
+
+
+def precheck(tx: bytes, submitted: bool = False) -> str | None:
+    """
+    The reason to reject `tx` without verifying it, None if it may be valid.
+
+    With `submitted`, also what the engine would refuse, see the module.
+    """
+    if len(tx) < 2:
+        return "length"
+    if tx[0] != 1:
+        return "version"
+    name = tx[1]
+    if name == BUY or name == SELL:
+        return _check_order(tx, submitted)
+    if name == CANCEL:
+        return None if len(tx) >= CANCEL_SIZE else "length"
+    if name == WITHDRAW:
+        return _check_withdraw(tx, submitted)
+    if name == REGISTER:
+        return None if len(tx) >= REGISTER_SIZE else "length"
+    if name == DEPOSIT:
+        return _check_deposit(tx)
+    return "operation"
+
+
+def stale_nonce(tx: bytes, nonces: Mapping[bytes, int]) -> bool:
+    """Whether `tx` is an order with a nonce its user already used."""
+    if len(tx) < 2 or tx[1] not in (BUY, SELL):
+        return False
+    try:
+        *_, nonce, public = unpack_order(tx)
+    except struct_error:
+        return False
+    expected = nonces.get(public)
+    return expected is not None and nonce < expected
+
+
+def _check_order(tx: bytes, submitted: bool) -> str | None:
+    if len(tx) < ORDER_HEADER.size:
+        return "length"
+    _, _, base_token_len, quote_token_len = ORDER_HEADER.unpack_from(tx)
+    if base_token_len == 0 or quote_token_len == 0:
+        return "token"
+    layout = order_struct(base_token_len, quote_token_len)
+    if len(tx) < ORDER_HEADER.size + layout.size + SIGNATURE_SIZE:
+        return "length"
+    base_token, quote_token, amount, price, *_ = layout.unpack_from(
+        tx, ORDER_HEADER.size
+    )
+    if not (base_token.isascii() and quote_token.isascii()):
+        return "token"
+    if not submitted:
+        return None
+    if base_token == quote_token:
+        return "pair"
+    if not 0 < amount < math.inf:
+        return "amount"
+    if not 0 < price < math.inf:
+        return "price"
+    return None
+
+
+def _check_withdraw(tx: bytes, submitted: bool) -> str | None:
+    if len(tx) < WITHDRAW_HEADER.size:
+        return "length"
+    _, _, token_len = WITHDRAW_HEADER.unpack_from(tx)
+    if token_len == 0:
+        return "token"
+    layout = withdraw_struct(token_len)
+    if len(tx) < WITHDRAW_HEADER.size + layout.size + SIGNATURE_SIZE:
+        return "length"
+    chain, token, amount, *_ = layout.unpack_from(tx, WITHDRAW_HEADER.size)
+    if not (chain.isascii() and token.isascii()):
+        return "token"
+    if submitted and not 0 < amount < math.inf:
+        return "amount"
+    return None
+
+
+def _check_deposit(tx: bytes) -> str | None:
+    if len(tx) < DEPOSIT_HEADER.size:
+        return "length"
+    *_, count = DEPOSIT_HEADER.unpack_from(tx)
+    size = DEPOSIT_HEADER.size + count * DEPOSIT_ENTRY.size + DEPOSIT_SIGNATURES.size
+    return None if len(tx) >= size else "length"
+
+
+class Rejections:
+    """Transactions rejected by `precheck`, by reason, shared between processes."""
+
+    def __init__(self):
+        self._counts = multiprocessing.Array("Q", len(REASONS))
+
+    def add(self, reasons: Mapping[str, int]):
+        with self._counts.get_lock():
+            for reason, count in reasons.items():
+                self._counts[REASONS.index(reason)] += count
+
+    def counts(self) -> dict[str, int]:
+        with self._counts.get_lock():
+            return dict(zip(REASONS, self._counts, strict=True))
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tzex.proto\"\x83\x0b\n\x08ZexState\x12\'\n\x07markets\x18\x01 \x03(\x0b\x32\x16.ZexState.MarketsEntry\x12)\n\x08\x62\x61lances\x18\x02 \x03(\x0b\x32\x17.ZexState.BalancesEntry\x12\x1d\n\x07\x61mounts\x18\x03 \x03(\x0b\x32\x0c.AmountEntry\x12\x1b\n\x06trades\x18\x04 \x03(\x0b\x32\x0b.TradeEntry\x12\x1b\n\x06orders\x18\x05 \x03(\x0b\x32\x0b.OrderEntry\x12;\n\x12withdraws_on_chain\x18\x06 \x03(\x0b\x32\x1f.ZexState.WithdrawsOnChainEntry\x12\x44\n\x17user_withdraws_on_chain\x18\x07 \x03(\x0b\x32#.ZexState.UserWithdrawsOnChainEntry\x12M\n\x1cuser_withdraw_nonce_on_chain\x18\x08 \x03(\x0b\x32\'.ZexState.UserWithdrawNonceOnChainEntry\x12\x44\n\x17withdraw_nonce_on_chain\x18\t \x03(\x0b\x32#.ZexState.WithdrawNonceOnChainEntry\x12)\n\x08\x64\x65posits\x18\n \x03(\x0b\x32\x17.ZexState.DepositsEntry\x12\x1b\n\x06nonces\x18\x0b \x03(\x0b\x32\x0b.NonceEntry\x12\x15\n\rlast_tx_index\x18\x0c \x01(\x04\x12(\n\ruser_deposits\x18\r \x03(\x0b\x32\x11.UserDepositEntry\x12+\n\x13public_to_id_lookup\x18\x0e \x03(\x0b\x32\x0e.IDLookupEntry\x12<\n\x13id_to_public_lookup\x18\x0f \x03(\x0b\x32\x1f.ZexState.IdToPublicLookupEntry\x12H\n\x19\x63ontract_decimal_on_chain\x18\x10 \x03(\x0b\x32%.ZexState.ContractDecimalOnChainEntry\x1a\x37\n\x0cMarketsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x16\n\x05value\x18\x02 \x01(\x0b\x32\x07.Market:\x02\x38\x01\x1a\x39\n\rBalancesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x17\n\x05value\x18\x02 \x01(\x0b\x32\x08.Balance:\x02\x38\x01\x1aJ\n\x15WithdrawsOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12 \n\x05value\x18\x02 \x01(\x0b\x32\x11.WithdrawsOnChain:\x02\x38\x01\x1aK\n\x19UserWithdrawsOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1d\n\x05value\x18\x02 \x01(\x0b\x32\x0e.UserWithdraws:\x02\x38\x01\x1aV\n\x1dUserWithdrawNonceOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12$\n\x05value\x18\x02 \x01(\x0b\x32\x15.WithdrawNonceOnChain:\x02\x38\x01\x1a;\n\x19WithdrawNonceOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x04:\x02\x38\x01\x1a\x41\n\rDepositsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1f\n\x05value\x18\x02 \x01(\x0b\x32\x10.DepositsOnChain:\x02\x38\x01\x1a\x37\n\x15IdToPublicLookupEntry\x12\x0b\n\x03key\x18\x01 \x01(\x04\x12\r\n\x05value\x18\x02 \x01(\x0c:\x02\x38\x01\x1aV\n\x1b\x43ontractDecimalOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12&\n\x05value\x18\x02 \x01(\x0b\x32\x17.ContractDecimalOnChain:\x02\x38\x01\"\x89\x02\n\x06Market\x12\x12\n\nbase_token\x18\x01 \x01(\t\x12\x13\n\x0bquote_token\x18\x02 \x01(\t\x12\x1a\n\nbuy_orders\x18\x03 \x03(\x0b\x32\x06.Order\x12\x1b\n\x0bsell_orders\x18\x04 \x03(\x0b\x32\x06.Order\x12(\n\x0f\x62ids_order_book\x18\x05 \x03(\x0b\x32\x0f.OrderBookEntry\x12(\n\x0f\x61sks_order_book\x18\x06 \x03(\x0b\x32\x0f.OrderBookEntry\x12\x10\n\x08\x66irst_id\x18\x07 \x01(\x04\x12\x10\n\x08\x66inal_id\x18\x08 \x01(\x04\x12\x16\n\x0elast_update_id\x18\t \x01(\x04\x12\r\n\x05kline\x18\n \x01(\x0c\"\"\n\x05Order\x12\r\n\x05price\x18\x01 \x01(\t\x12\n\n\x02tx\x18\x02 \x01(\x0c\"/\n\x0eOrderBookEntry\x12\r\n\x05price\x18\x01 \x01(\t\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\"*\n\x07\x42\x61lance\x12\x1f\n\x08\x62\x61lances\x18\x01 \x03(\x0b\x32\r.BalanceEntry\"2\n\x0c\x42\x61lanceEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\")\n\x0b\x41mountEntry\x12\n\n\x02tx\x18\x01 \x01(\x0c\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\"8\n\nTradeEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x16\n\x06trades\x18\x02 \x03(\x0b\x32\x06.Trade\"S\n\x05Trade\x12\t\n\x01t\x18\x01 \x01(\r\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\x12\x0c\n\x04pair\x18\x03 \x01(\t\x12\x12\n\norder_type\x18\x04 \x01(\r\x12\r\n\x05order\x18\x05 \x01(\x0c\"0\n\nOrderEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0e\n\x06orders\x18\x02 \x03(\x0c\"8\n\x11UserWithdrawEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0f\n\x07raw_txs\x18\x02 \x03(\x0c\"6\n\rUserWithdraws\x12%\n\twithdraws\x18\x01 \x03(\x0b\x32\x12.UserWithdrawEntry\"#\n\x10WithdrawsOnChain\x12\x0f\n\x07raw_txs\x18\x01 \x03(\x0c\"7\n\x12WithdrawNonceEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\r\n\x05nonce\x18\x02 \x01(\x04\";\n\x14WithdrawNonceOnChain\x12#\n\x06nonces\x18\x01 \x03(\x0b\x32\x13.WithdrawNonceEntry\"-\n\x0c\x44\x65positEntry\x12\x0f\n\x07tx_hash\x18\x01 \x01(\t\x12\x0c\n\x04vout\x18\x02 \x01(\r\"2\n\x0f\x44\x65positsOnChain\x12\x1f\n\x08\x64\x65posits\x18\x01 \x03(\x0b\x32\r.DepositEntry\"B\n\x10UserDepositEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x1a\n\x08\x64\x65posits\x18\x02 \x03(\x0b\x32\x08.Deposit\"\x8f\x01\n\x07\x44\x65posit\x12\x0f\n\x07tx_hash\x18\x01 \x01(\t\x12\r\n\x05\x63hain\x18\x02 \x01(\t\x12\x16\n\x0etoken_contract\x18\x03 \x01(\t\x12\x0e\n\x06\x61mount\x18\x04 \x01(\t\x12\x0f\n\x07\x64\x65\x63imal\x18\x05 \x01(\r\x12\x0c\n\x04time\x18\x06 \x01(\x04\x12\x0f\n\x07user_id\x18\x07 \x01(\x04\x12\x0c\n\x04vout\x18\x08 \x01(\r\"/\n\nNonceEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\r\n\x05nonce\x18\x02 \x01(\r\"4\n\rIDLookupEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0f\n\x07user_id\x18\x02 \x01(\x04\"\xa3\x01\n\x18\x43ontractToIDOnChainEntry\x12\r\n\x05\x63hain\x18\x01 \x01(\t\x12\x43\n\x0e\x63ontract_to_id\x18\x02 \x03(\x0b\x32+.ContractToIDOnChainEntry.ContractToIdEntry\x1a\x33\n\x11\x43ontractToIdEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x04:\x02\x38\x01\"\xa3\x01\n\x18IDToContractOnChainEntry\x12\r\n\x05\x63hain\x18\x01 \x01(\t\x12\x43\n\x0eid_to_contract\x18\x02 \x03(\x0b\x32+.IDToContractOnChainEntry.IdToContractEntry\x1a\x33\n\x11IdToContractEntry\x12\x0b\n\x03key\x18\x01 \x01(\x04\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x98\x01\n\x16\x43ontractDecimalOnChain\x12\x46\n\x10\x63ontract_decimal\x18\x01 \x03(\x0b\x32,.ContractDecimalOnChain.ContractDecimalEntry\x1a\x36\n\x14\x43ontractDecimalEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\r:\x02\x38\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tzex.proto\"\x83\x0b\n\x08ZexState\x12\'\n\x07markets\x18\x01 \x03(\x0b\x32\x16.ZexState.MarketsEntry\x12)\n\x08\x62\x61lances\x18\x02 \x03(\x0b\x32\x17.ZexState.BalancesEntry\x12\x1d\n\x07\x61mounts\x18\x03 \x03(\x0b\x32\x0c.AmountEntry\x12\x1b\n\x06trades\x18\x04 \x03(\x0b\x32\x0b.TradeEntry\x12\x1b\n\x06orders\x18\x05 \x03(\x0b\x32\x0b.OrderEntry\x12;\n\x12withdraws_on_chain\x18\x06 \x03(\x0b\x32\x1f.ZexState.WithdrawsOnChainEntry\x12\x44\n\x17user_withdraws_on_chain\x18\x07 \x03(\x0b\x32#.ZexState.UserWithdrawsOnChainEntry\x12M\n\x1cuser_withdraw_nonce_on_chain\x18\x08 \x03(\x0b\x32\'.ZexState.UserWithdrawNonceOnChainEntry\x12\x44\n\x17withdraw_nonce_on_chain\x18\t \x03(\x0b\x32#.ZexState.WithdrawNonceOnChainEntry\x12)\n\x08\x64\x65posits\x18\n \x03(\x0b\x32\x17.ZexState.DepositsEntry\x12\x1b\n\x06nonces\x18\x0b \x03(\x0b\x32\x0b.NonceEntry\x12\x15\n\rlast_tx_index\x18\x0c \x01(\x04\x12(\n\ruser_deposits\x18\r \x03(\x0b\x32\x11.UserDepositEntry\x12+\n\x13public_to_id_lookup\x18\x0e \x03(\x0b\x32\x0e.IDLookupEntry\x12<\n\x13id_to_public_lookup\x18\x0f \x03(\x0b\x32\x1f.ZexState.IdToPublicLookupEntry\x12H\n\x19\x63ontract_decimal_on_chain\x18\x10 \x03(\x0b\x32%.ZexState.ContractDecimalOnChainEntry\x1a\x37\n\x0cMarketsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x16\n\x05value\x18\x02 \x01(\x0b\x32\x07.Market:\x02\x38\x01\x1a\x39\n\rBalancesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x17\n\x05value\x18\x02 \x01(\x0b\x32\x08.Balance:\x02\x38\x01\x1aJ\n\x15WithdrawsOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12 \n\x05value\x18\x02 \x01(\x0b\x32\x11.WithdrawsOnChain:\x02\x38\x01\x1aK\n\x19UserWithdrawsOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1d\n\x05value\x18\x02 \x01(\x0b\x32\x0e.UserWithdraws:\x02\x38\x01\x1aV\n\x1dUserWithdrawNonceOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12$\n\x05value\x18\x02 \x01(\x0b\x32\x15.WithdrawNonceOnChain:\x02\x38\x01\x1a;\n\x19WithdrawNonceOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x04:\x02\x38\x01\x1a\x41\n\rDepositsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1f\n\x05value\x18\x02 \x01(\x0b\x32\x10.DepositsOnChain:\x02\x38\x01\x1a\x37\n\x15IdToPublicLookupEntry\x12\x0b\n\x03key\x18\x01 \x01(\x04\x12\r\n\x05value\x18\x02 \x01(\x0c:\x02\x38\x01\x1aV\n\x1b\x43ontractDecimalOnChainEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12&\n\x05value\x18\x02 \x01(\x0b\x32\x17.ContractDecimalOnChain:\x02\x38\x01\"\x89\x02\n\x06Market\x12\x12\n\nbase_token\x18\x01 \x01(\t\x12\x13\n\x0bquote_token\x18\x02 \x01(\t\x12\x1a\n\nbuy_orders\x18\x03 \x03(\x0b\x32\x06.Order\x12\x1b\n\x0bsell_orders\x18\x04 \x03(\x0b\x32\x06.Order\x12(\n\x0f\x62ids_order_book\x18\x05 \x03(\x0b\x32\x0f.OrderBookEntry\x12(\n\x0f\x61sks_order_book\x18\x06 \x03(\x0b\x32\x0f.OrderBookEntry\x12\x10\n\x08\x66irst_id\x18\x07 \x01(\x04\x12\x10\n\x08\x66inal_id\x18\x08 \x01(\x04\x12\x16\n\x0elast_update_id\x18\t \x01(\x04\x12\r\n\x05kline\x18\n \x01(\x0c\"\"\n\x05Order\x12\r\n\x05price\x18\x01 \x01(\t\x12\n\n\x02tx\x18\x02 \x01(\x0c\"/\n\x0eOrderBookEntry\x12\r\n\x05price\x18\x01 \x01(\t\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\"*\n\x07\x42\x61lance\x12\x1f\n\x08\x62\x61lances\x18\x01 \x03(\x0b\x32\r.BalanceEntry\"2\n\x0c\x42\x61lanceEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\")\n\x0b\x41mountEntry\x12\n\n\x02tx\x18\x01 \x01(\x0c\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\"8\n\nTradeEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x16\n\x06trades\x18\x02 \x03(\x0b\x32\x06.Trade\"S\n\x05Trade\x12\t\n\x01t\x18\x01 \x01(\r\x12\x0e\n\x06\x61mount\x18\x02 \x01(\t\x12\x0c\n\x04pair\x18\x03 \x01(\t\x12\x12\n\norder_type\x18\x04 \x01(\r\x12\r\n\x05order\x18\x05 \x01(\x0c\"0\n\nOrderEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0e\n\x06orders\x18\x02 \x03(\x0c\"8\n\x11UserWithdrawEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0f\n\x07raw_txs\x18\x02 \x03(\x0c\"6\n\rUserWithdraws\x12%\n\twithdraws\x18\x01 \x03(\x0b\x32\x12.UserWithdrawEntry\"#\n\x10WithdrawsOnChain\x12\x0f\n\x07raw_txs\x18\x01 \x03(\x0c\"7\n\x12WithdrawNonceEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\r\n\x05nonce\x18\x02 \x01(\x04\";\n\x14WithdrawNonceOnChain\x12#\n\x06nonces\x18\x01 \x03(\x0b\x32\x13.WithdrawNonceEntry\"-\n\x0c\x44\x65positEntry\x12\x0f\n\x07tx_hash\x18\x01 \x01(\t\x12\x0c\n\x04vout\x18\x02 \x01(\r\"2\n\x0f\x44\x65positsOnChain\x12\x1f\n\x08\x64\x65posits\x18\x01 \x03(\x0b\x32\r.DepositEntry\"B\n\x10UserDepositEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x1a\n\x08\x64\x65posits\x18\x02 \x03(\x0b\x32\x08.Deposit\"\x8f\x01\n\x07\x44\x65posit\x12\x0f\n\x07tx_hash\x18\x01 \x01(\t\x12\r\n\x05\x63hain\x18\x02 \x01(\t\x12\x16\n\x0etoken_contract\x18\x03 \x01(\t\x12\x0e\n\x06\x61mount\x18\x04 \x01(\t\x12\x0f\n\x07\x64\x65\x63imal\x18\x05 \x01(\r\x12\x0c\n\x04time\x18\x06 \x01(\x04\x12\x0f\n\x07user_id\x18\x07 \x01(\x04\x12\x0c\n\x04vout\x18\x08 \x01(\r\"/\n\nNonceEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\r\n\x05nonce\x18\x02 \x01(\r\"4\n\rIDLookupEntry\x12\x12\n\npublic_key\x18\x01 \x01(\x0c\x12\x0f\n\x07user_id\x18\x02 \x01(\x04\"\xa3\x01\n\x18\x43ontractToIDOnChainEntry\x12\r\n\x05\x63hain\x18\x01 \x01(\t\x12\x43\n\x0e\x63ontract_to_id\x18\x02 \x03(\x0b\x32+.ContractToIDOnChainEntry.ContractToIdEntry\x1a\x33\n\x11\x43ontractToIdEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x04:\x02\x38\x01\"\xa3\x01\n\x18IDToContractOnChainEntry\x12\r\n\x05\x63hain\x18\x01 \x01(\t\x12\x43\n\x0eid_to_contract\x18\x02 \x03(\x0b\x32+.IDToContractOnChainEntry.IdToContractEntry\x1a\x33\n\x11IdToContractEntry\x12\x0b\n\x03key\x18\x01 \x01(\x04\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x98\x01\n\x16\x43ontractDecimalOnChain\x12\x46\n\x10\x63ontract_decimal\x18\x01 \x03(\x0b\x32,.ContractDecimalOnChain.ContractDecimalEntry\x1a\x36\n\x14\x43ontractDecimalEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\r:\x02\x38\x01\"\xe2\x03\n\x05State\x12\x15\n\rlast_tx_index\x18\x01 \x01(\x04\x12\r\n\x05users\x18\x02 \x03(\x0c\x12\x10\n\x08user_ids\x18\x03 \x03(\x04\x12\x10\n\x08\x61\x63\x63ounts\x18\x04 \x03(\r\x12\x0e\n\x06nonces\x18\x05 \x03(\r\x12&\n\x08\x62\x61lances\x18\x06 \x03(\x0b\x32\x14.State.BalancesEntry\x12$\n\x07markets\x18\x07 \x03(\x0b\x32\x13.State.MarketsEntry\x12\r\n\x05pairs\x18\x08 \x03(\t\x12\x1b\n\x06trades\x18\t \x03(\x0b\x32\x0b.UserTrades\x12$\n\ruser_deposits\x18\n \x03(\x0b\x32\r.UserDeposits\x12\"\n\x06\x63hains\x18\x0b \x03(\x0b\x32\x12.State.ChainsEntry\x1a?\n\rBalancesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1d\n\x05value\x18\x02 \x01(\x0b\x32\x0e.TokenBalances:\x02\x38\x01\x1a<\n\x0cMarketsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1b\n\x05value\x18\x02 \x01(\x0b\x32\x0c.MarketState:\x02\x38\x01\x1a<\n\x0b\x43hainsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1c\n\x05value\x18\x02 \x01(\x0b\x32\r.ChainHistory:\x02\x38\x01\"/\n\rTokenBalances\x12\r\n\x05users\x18\x01 \x03(\r\x12\x0f\n\x07\x61mounts\x18\x02 \x01(\x0c\"\xe3\x01\n\x0bMarketState\x12\x12\n\nbase_token\x18\x01 \x01(\t\x12\x13\n\x0bquote_token\x18\x02 \x01(\t\x12\x12\n\nbuy_orders\x18\x03 \x03(\x0c\x12\x15\n\rbuy_remaining\x18\x04 \x03(\x04\x12\x13\n\x0bsell_orders\x18\x05 \x03(\x0c\x12\x16\n\x0esell_remaining\x18\x06 \x03(\x04\x12\x10\n\x08\x66irst_id\x18\x07 \x01(\x04\x12\x10\n\x08\x66inal_id\x18\x08 \x01(\x04\x12\x16\n\x0elast_update_id\x18\t \x01(\x04\x12\x17\n\x06klines\x18\n \x01(\x0b\x32\x07.Klines\"\x91\x01\n\x06Klines\x12\x11\n\topen_time\x18\x01 \x03(\x04\x12\x12\n\nclose_time\x18\x02 \x03(\x04\x12\x0c\n\x04open\x18\x03 \x03(\x01\x12\x0c\n\x04high\x18\x04 \x03(\x01\x12\x0b\n\x03low\x18\x05 \x03(\x01\x12\r\n\x05\x63lose\x18\x06 \x03(\x01\x12\x0e\n\x06volume\x18\x07 \x03(\x01\x12\x18\n\x10number_of_trades\x18\x08 \x03(\x04\"j\n\nUserTrades\x12\x0c\n\x04user\x18\x01 \x01(\r\x12\t\n\x01t\x18\x02 \x03(\r\x12\x0f\n\x07\x61mounts\x18\x03 \x03(\x04\x12\r\n\x05pairs\x18\x04 \x03(\r\x12\x13\n\x0border_types\x18\x05 \x03(\r\x12\x0e\n\x06orders\x18\x06 \x03(\x0c\">\n\x0cUserDeposits\x12\x0c\n\x04user\x18\x01 \x01(\r\x12 \n\x08\x64\x65posits\x18\x02 \x03(\x0b\x32\x0e.DepositRecord\"\x95\x01\n\rDepositRecord\x12\x0f\n\x07tx_hash\x18\x01 \x01(\t\x12\r\n\x05\x63hain\x18\x02 \x01(\t\x12\x16\n\x0etoken_contract\x18\x03 \x01(\t\x12\x0e\n\x06\x61mount\x18\x04 \x01(\x0c\x12\x0f\n\x07\x64\x65\x63imal\x18\x05 \x01(\r\x12\x0c\n\x04time\x18\x06 \x01(\x04\x12\x0f\n\x07user_id\x18\x07 \x01(\x04\x12\x0c\n\x04vout\x18\x08 \x01(\r\"\xb1\x02\n\x0c\x43hainHistory\x12\x19\n\x11\x64\x65posit_tx_hashes\x18\x01 \x03(\t\x12\x15\n\rdeposit_vouts\x18\x02 \x03(\r\x12\x11\n\twithdraws\x18\x03 \x03(\x0c\x12\x1c\n\x14withdraw_nonce_users\x18\x04 \x03(\r\x12\x17\n\x0fwithdraw_nonces\x18\x05 \x03(\x04\x12\x16\n\x0ewithdraw_nonce\x18\x06 \x01(\x04\x12>\n\x11\x63ontract_decimals\x18\x07 \x03(\x0b\x32#.ChainHistory.ContractDecimalsEntry\x12\x14\n\x0c\x64\x65posit_keys\x18\x08 \x01(\x0c\x1a\x37\n\x15\x43ontractDecimalsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\r:\x02\x38\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -55,6 +55,14 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_IDTOCONTRACTONCHAINENTRY_IDTOCONTRACTENTRY']._serialized_options = b'8\001'
   _globals['_CONTRACTDECIMALONCHAIN_CONTRACTDECIMALENTRY']._loaded_options = None
   _globals['_CONTRACTDECIMALONCHAIN_CONTRACTDECIMALENTRY']._serialized_options = b'8\001'
+  _globals['_STATE_BALANCESENTRY']._loaded_options = None
+  _globals['_STATE_BALANCESENTRY']._serialized_options = b'8\001'
+  _globals['_STATE_MARKETSENTRY']._loaded_options = None
+  _globals['_STATE_MARKETSENTRY']._serialized_options = b'8\001'
+  _globals['_STATE_CHAINSENTRY']._loaded_options = None
+  _globals['_STATE_CHAINSENTRY']._serialized_options = b'8\001'
+  _globals['_CHAINHISTORY_CONTRACTDECIMALSENTRY']._loaded_options = None
+  _globals['_CHAINHISTORY_CONTRACTDECIMALSENTRY']._serialized_options = b'8\001'
   _globals['_ZEXSTATE']._serialized_start=14
   _globals['_ZEXSTATE']._serialized_end=1425
   _globals['_ZEXSTATE_MARKETSENTRY']._serialized_start=797
@@ -127,4 +135,28 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_CONTRACTDECIMALONCHAIN']._serialized_end=3282
   _globals['_CONTRACTDECIMALONCHAIN_CONTRACTDECIMALENTRY']._serialized_start=3228
   _globals['_CONTRACTDECIMALONCHAIN_CONTRACTDECIMALENTRY']._serialized_end=3282
+  _globals['_STATE']._serialized_start=3285
+  _globals['_STATE']._serialized_end=3767
+  _globals['_STATE_BALANCESENTRY']._serialized_start=3580
+  _globals['_STATE_BALANCESENTRY']._serialized_end=3643
+  _globals['_STATE_MARKETSENTRY']._serialized_start=3645
+  _globals['_STATE_MARKETSENTRY']._serialized_end=3705
+  _globals['_STATE_CHAINSENTRY']._serialized_start=3707
+  _globals['_STATE_CHAINSENTRY']._serialized_end=3767
+  _globals['_TOKENBALANCES']._serialized_start=3769
+  _globals['_TOKENBALANCES']._serialized_end=3816
+  _globals['_MARKETSTATE']._serialized_start=3819
+  _globals['_MARKETSTATE']._serialized_end=4046
+  _globals['_KLINES']._serialized_start=4049
+  _globals['_KLINES']._serialized_end=4194
+  _globals['_USERTRADES']._serialized_start=4196
+  _globals['_USERTRADES']._serialized_end=4302
+  _globals['_USERDEPOSITS']._serialized_start=4304
+  _globals['_USERDEPOSITS']._serialized_end=4366
+  _globals['_DEPOSITRECORD']._serialized_start=4369
+  _globals['_DEPOSITRECORD']._serialized_end=4518
+  _globals['_CHAINHISTORY']._serialized_start=4521
+  _globals['_CHAINHISTORY']._serialized_end=4826
+  _globals['_CHAINHISTORY_CONTRACTDECIMALSENTRY']._serialized_start=4771
+  _globals['_CHAINHISTORY_CONTRACTDECIMALSENTRY']._serialized_end=4826
 # @@protoc_insertion_point(module_scope)
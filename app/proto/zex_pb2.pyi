@@ -330,3 +330,174 @@ class ContractDecimalOnChain(_message.Message):
     CONTRACT_DECIMAL_FIELD_NUMBER: _ClassVar[int]
     contract_decimal: _containers.ScalarMap[str, int]
     def __init__(self, contract_decimal: _Optional[_Mapping[str, int]] = ...) -> None: ...
+
+class State(_message.Message):
+    __slots__ = ("last_tx_index", "users", "user_ids", "accounts", "nonces", "balances", "markets", "pairs", "trades", "user_deposits", "chains")
+    class BalancesEntry(_message.Message):
+        __slots__ = ("key", "value")
+        KEY_FIELD_NUMBER: _ClassVar[int]
+        VALUE_FIELD_NUMBER: _ClassVar[int]
+        key: str
+        value: TokenBalances
+        def __init__(self, key: _Optional[str] = ..., value: _Optional[_Union[TokenBalances, _Mapping]] = ...) -> None: ...
+    class MarketsEntry(_message.Message):
+        __slots__ = ("key", "value")
+        KEY_FIELD_NUMBER: _ClassVar[int]
+        VALUE_FIELD_NUMBER: _ClassVar[int]
+        key: str
+        value: MarketState
+        def __init__(self, key: _Optional[str] = ..., value: _Optional[_Union[MarketState, _Mapping]] = ...) -> None: ...
+    class ChainsEntry(_message.Message):
+        __slots__ = ("key", "value")
+        KEY_FIELD_NUMBER: _ClassVar[int]
+        VALUE_FIELD_NUMBER: _ClassVar[int]
+        key: str
+        value: ChainHistory
+        def __init__(self, key: _Optional[str] = ..., value: _Optional[_Union[ChainHistory, _Mapping]] = ...) -> None: ...
+    LAST_TX_INDEX_FIELD_NUMBER: _ClassVar[int]
+    USERS_FIELD_NUMBER: _ClassVar[int]
+    USER_IDS_FIELD_NUMBER: _ClassVar[int]
+    ACCOUNTS_FIELD_NUMBER: _ClassVar[int]
+    NONCES_FIELD_NUMBER: _ClassVar[int]
+    BALANCES_FIELD_NUMBER: _ClassVar[int]
+    MARKETS_FIELD_NUMBER: _ClassVar[int]
+    PAIRS_FIELD_NUMBER: _ClassVar[int]
+    TRADES_FIELD_NUMBER: _ClassVar[int]
+    USER_DEPOSITS_FIELD_NUMBER: _ClassVar[int]
+    CHAINS_FIELD_NUMBER: _ClassVar[int]
+    last_tx_index: int
+    users: _containers.RepeatedScalarFieldContainer[bytes]
+    user_ids: _containers.RepeatedScalarFieldContainer[int]
+    accounts: _containers.RepeatedScalarFieldContainer[int]
+    nonces: _containers.RepeatedScalarFieldContainer[int]
+    balances: _containers.MessageMap[str, TokenBalances]
+    markets: _containers.MessageMap[str, MarketState]
+    pairs: _containers.RepeatedScalarFieldContainer[str]
+    trades: _containers.RepeatedCompositeFieldContainer[UserTrades]
+    user_deposits: _containers.RepeatedCompositeFieldContainer[UserDeposits]
+    chains: _containers.MessageMap[str, ChainHistory]
+    def __init__(self, last_tx_index: _Optional[int] = ..., users: _Optional[_Iterable[bytes]] = ..., user_ids: _Optional[_Iterable[int]] = ..., accounts: _Optional[_Iterable[int]] = ..., nonces: _Optional[_Iterable[int]] = ..., balances: _Optional[_Mapping[str, TokenBalances]] = ..., markets: _Optional[_Mapping[str, MarketState]] = ..., pairs: _Optional[_Iterable[str]] = ..., trades: _Optional[_Iterable[_Union[UserTrades, _Mapping]]] = ..., user_deposits: _Optional[_Iterable[_Union[UserDeposits, _Mapping]]] = ..., chains: _Optional[_Mapping[str, ChainHistory]] = ...) -> None: ...
+
+class TokenBalances(_message.Message):
+    __slots__ = ("users", "amounts")
+    USERS_FIELD_NUMBER: _ClassVar[int]
+    AMOUNTS_FIELD_NUMBER: _ClassVar[int]
+    users: _containers.RepeatedScalarFieldContainer[int]
+    amounts: bytes
+    def __init__(self, users: _Optional[_Iterable[int]] = ..., amounts: _Optional[bytes] = ...) -> None: ...
+
+class MarketState(_message.Message):
+    __slots__ = ("base_token", "quote_token", "buy_orders", "buy_remaining", "sell_orders", "sell_remaining", "first_id", "final_id", "last_update_id", "klines")
+    BASE_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    QUOTE_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    BUY_ORDERS_FIELD_NUMBER: _ClassVar[int]
+    BUY_REMAINING_FIELD_NUMBER: _ClassVar[int]
+    SELL_ORDERS_FIELD_NUMBER: _ClassVar[int]
+    SELL_REMAINING_FIELD_NUMBER: _ClassVar[int]
+    FIRST_ID_FIELD_NUMBER: _ClassVar[int]
+    FINAL_ID_FIELD_NUMBER: _ClassVar[int]
+    LAST_UPDATE_ID_FIELD_NUMBER: _ClassVar[int]
+    KLINES_FIELD_NUMBER: _ClassVar[int]
+    base_token: str
+    quote_token: str
+    buy_orders: _containers.RepeatedScalarFieldContainer[bytes]
+    buy_remaining: _containers.RepeatedScalarFieldContainer[int]
+    sell_orders: _containers.RepeatedScalarFieldContainer[bytes]
+    sell_remaining: _containers.RepeatedScalarFieldContainer[int]
+    first_id: int
+    final_id: int
+    last_update_id: int
+    klines: Klines
+    def __init__(self, base_token: _Optional[str] = ..., quote_token: _Optional[str] = ..., buy_orders: _Optional[_Iterable[bytes]] = ..., buy_remaining: _Optional[_Iterable[int]] = ..., sell_orders: _Optional[_Iterable[bytes]] = ..., sell_remaining: _Optional[_Iterable[int]] = ..., first_id: _Optional[int] = ..., final_id: _Optional[int] = ..., last_update_id: _Optional[int] = ..., klines: _Optional[_Union[Klines, _Mapping]] = ...) -> None: ...
+
+class Klines(_message.Message):
+    __slots__ = ("open_time", "close_time", "open", "high", "low", "close", "volume", "number_of_trades")
+    OPEN_TIME_FIELD_NUMBER: _ClassVar[int]
+    CLOSE_TIME_FIELD_NUMBER: _ClassVar[int]
+    OPEN_FIELD_NUMBER: _ClassVar[int]
+    HIGH_FIELD_NUMBER: _ClassVar[int]
+    LOW_FIELD_NUMBER: _ClassVar[int]
+    CLOSE_FIELD_NUMBER: _ClassVar[int]
+    VOLUME_FIELD_NUMBER: _ClassVar[int]
+    NUMBER_OF_TRADES_FIELD_NUMBER: _ClassVar[int]
+    open_time: _containers.RepeatedScalarFieldContainer[int]
+    close_time: _containers.RepeatedScalarFieldContainer[int]
+    open: _containers.RepeatedScalarFieldContainer[float]
+    high: _containers.RepeatedScalarFieldContainer[float]
+    low: _containers.RepeatedScalarFieldContainer[float]
+    close: _containers.RepeatedScalarFieldContainer[float]
+    volume: _containers.RepeatedScalarFieldContainer[float]
+    number_of_trades: _containers.RepeatedScalarFieldContainer[int]
+    def __init__(self, open_time: _Optional[_Iterable[int]] = ..., close_time: _Optional[_Iterable[int]] = ..., open: _Optional[_Iterable[float]] = ..., high: _Optional[_Iterable[float]] = ..., low: _Optional[_Iterable[float]] = ..., close: _Optional[_Iterable[float]] = ..., volume: _Optional[_Iterable[float]] = ..., number_of_trades: _Optional[_Iterable[int]] = ...) -> None: ...
+
+class UserTrades(_message.Message):
+    __slots__ = ("user", "t", "amounts", "pairs", "order_types", "orders")
+    USER_FIELD_NUMBER: _ClassVar[int]
+    T_FIELD_NUMBER: _ClassVar[int]
+    AMOUNTS_FIELD_NUMBER: _ClassVar[int]
+    PAIRS_FIELD_NUMBER: _ClassVar[int]
+    ORDER_TYPES_FIELD_NUMBER: _ClassVar[int]
+    ORDERS_FIELD_NUMBER: _ClassVar[int]
+    user: int
+    t: _containers.RepeatedScalarFieldContainer[int]
+    amounts: _containers.RepeatedScalarFieldContainer[int]
+    pairs: _containers.RepeatedScalarFieldContainer[int]
+    order_types: _containers.RepeatedScalarFieldContainer[int]
+    orders: _containers.RepeatedScalarFieldContainer[bytes]
+    def __init__(self, user: _Optional[int] = ..., t: _Optional[_Iterable[int]] = ..., amounts: _Optional[_Iterable[int]] = ..., pairs: _Optional[_Iterable[int]] = ..., order_types: _Optional[_Iterable[int]] = ..., orders: _Optional[_Iterable[bytes]] = ...) -> None: ...
+
+class UserDeposits(_message.Message):
+    __slots__ = ("user", "deposits")
+    USER_FIELD_NUMBER: _ClassVar[int]
+    DEPOSITS_FIELD_NUMBER: _ClassVar[int]
+    user: int
+    deposits: _containers.RepeatedCompositeFieldContainer[DepositRecord]
+    def __init__(self, user: _Optional[int] = ..., deposits: _Optional[_Iterable[_Union[DepositRecord, _Mapping]]] = ...) -> None: ...
+
+class DepositRecord(_message.Message):
+    __slots__ = ("tx_hash", "chain", "token_contract", "amount", "decimal", "time", "user_id", "vout")
+    TX_HASH_FIELD_NUMBER: _ClassVar[int]
+    CHAIN_FIELD_NUMBER: _ClassVar[int]
+    TOKEN_CONTRACT_FIELD_NUMBER: _ClassVar[int]
+    AMOUNT_FIELD_NUMBER: _ClassVar[int]
+    DECIMAL_FIELD_NUMBER: _ClassVar[int]
+    TIME_FIELD_NUMBER: _ClassVar[int]
+    USER_ID_FIELD_NUMBER: _ClassVar[int]
+    VOUT_FIELD_NUMBER: _ClassVar[int]
+    tx_hash: str
+    chain: str
+    token_contract: str
+    amount: bytes
+    decimal: int
+    time: int
+    user_id: int
+    vout: int
+    def __init__(self, tx_hash: _Optional[str] = ..., chain: _Optional[str] = ..., token_contract: _Optional[str] = ..., amount: _Optional[bytes] = ..., decimal: _Optional[int] = ..., time: _Optional[int] = ..., user_id: _Optional[int] = ..., vout: _Optional[int] = ...) -> None: ...
+
+class ChainHistory(_message.Message):
+    __slots__ = ("deposit_tx_hashes", "deposit_vouts", "withdraws", "withdraw_nonce_users", "withdraw_nonces", "withdraw_nonce", "contract_decimals", "deposit_keys")
+    class ContractDecimalsEntry(_message.Message):
+        __slots__ = ("key", "value")
+        KEY_FIELD_NUMBER: _ClassVar[int]
+        VALUE_FIELD_NUMBER: _ClassVar[int]
+        key: str
+        value: int
+        def __init__(self, key: _Optional[str] = ..., value: _Optional[int] = ...) -> None: ...
+    DEPOSIT_TX_HASHES_FIELD_NUMBER: _ClassVar[int]
+    DEPOSIT_VOUTS_FIELD_NUMBER: _ClassVar[int]
+    WITHDRAWS_FIELD_NUMBER: _ClassVar[int]
+    WITHDRAW_NONCE_USERS_FIELD_NUMBER: _ClassVar[int]
+    WITHDRAW_NONCES_FIELD_NUMBER: _ClassVar[int]
+    WITHDRAW_NONCE_FIELD_NUMBER: _ClassVar[int]
+    CONTRACT_DECIMALS_FIELD_NUMBER: _ClassVar[int]
+    DEPOSIT_KEYS_FIELD_NUMBER: _ClassVar[int]
+    deposit_tx_hashes: _containers.RepeatedScalarFieldContainer[str]
+    deposit_vouts: _containers.RepeatedScalarFieldContainer[int]
+    withdraws: _containers.RepeatedScalarFieldContainer[bytes]
+    withdraw_nonce_users: _containers.RepeatedScalarFieldContainer[int]
+    withdraw_nonces: _containers.RepeatedScalarFieldContainer[int]
+    withdraw_nonce: int
+    contract_decimals: _containers.ScalarMap[str, int]
+    deposit_keys: bytes
+    def __init__(self, deposit_tx_hashes: _Optional[_Iterable[str]] = ..., deposit_vouts: _Optional[_Iterable[int]] = ..., withdraws: _Optional[_Iterable[bytes]] = ..., withdraw_nonce_users: _Optional[_Iterable[int]] = ..., withdraw_nonces: _Optional[_Iterable[int]] = ..., withdraw_nonce: _Optional[int] = ..., contract_decimals: _Optional[_Mapping[str, int]] = ..., deposit_keys: _Optional[bytes] = ...) -> None: ...
+
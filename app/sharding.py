@@ -0,0 +1,374 @@
+"""
+Sharded order matching.
+
+Pairs are partitioned across worker processes and every worker owns the
+order books of its pairs. Balances stay in the coordinating `Zex`, which
+processes transactions in sequencer order:
+
+- before an order is sent to its worker, the balance it could spend is
+  reserved, i.e. debited, exactly as `Market.place` would check it, so
+  workers never reject an order for lack of balance;
+- workers match their orders against scratch balances that start from
+  the reservations, and return the resulting balance deltas together
+  with the order events and trades, tagged with the transaction index;
+- at the end of the batch the deltas are applied and the events are
+  replayed, in transaction order, onto the coordinator's copy of the
+  books, so depth, open orders and snapshots are served as usual.
+
+Credits from matching (fills, cancel refunds and price improvement) are
+only known to the coordinator once the workers ran the transactions, so
+its balances are at most the serial engine's. An order or a withdraw
+that the coordinator's balances do not cover is therefore only rejected
+after the transactions submitted before it were run and merged, see
+`ShardedMatcher.flush`, and the results are exactly the serial engine's.
+"""
+
+from collections import defaultdict, deque
+from multiprocessing.connection import Connection
+from types import SimpleNamespace
+import multiprocessing as mp
+import zlib
+
+from loguru import logger
+
+from app.order_book import Order
+from app.zex import BUY, Market, Zex
+from app.zex_types import ExecutionType, OrderEvent
+
+ORDER, CANCEL = 0, 1
+
+
+def shard_of(pair: str, shards: int) -> int:
+    return zlib.crc32(pair.encode()) % shards
+
+
+class ShardedMatcher:
+    def __init__(self, zex: Zex, workers: int):
+        self.zex = zex
+        self.workers = workers
+        self._connections: list[Connection] = []
+        self._processes: list[mp.Process] = []
+        self._ops: list[list[tuple]] = [[] for _ in range(workers)]
+        self._seq = 0
+        # orders sent to workers and not merged yet, by transaction index
+        self._pending: dict[int, Order] = {}
+        self._rejected: list[tuple[int, OrderEvent]] = []
+        # pairs modified by the transactions of the batch merged so far
+        self._modified_pairs: set[str] = set()
+
+    def start(self):
+        markets_states: list[dict[str, tuple]] = [{} for _ in range(self.workers)]
+        for pair, market in self.zex.state_manager.markets.items():
+            markets_states[shard_of(pair, self.workers)][pair] = _market_state(market)
+        for markets_state in markets_states:
+            connection, worker_connection = mp.Pipe()
+            process = mp.Process(
+                target=_run_shard,
+                args=(
+                    worker_connection,
+                    markets_state,
+                    self.zex.light_node,
+                    self.zex.benchmark_mode,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._connections.append(connection)
+            self._processes.append(process)
+        logger.info(f"matching on {self.workers} worker processes")
+
+    def stop(self):
+        for connection in self._connections:
+            connection.send(None)
+        for process in self._processes:
+            process.join()
+        self._connections.clear()
+        self._processes.clear()
+
+    def submit_order(self, market: Market, order: Order, t: int):
+        self._seq += 1
+        if order.price <= 0 or order.amount <= 0:
+            event = market.rejected_event(order, "invalid price or amount")
+            self._rejected.append((self._seq, event))
+            return
+        balances, required = market.required_balance(order)
+        balance = balances.get(order.public, 0)
+        if balance < required and self.flush():
+            balance = balances.get(order.public, 0)
+        if balance < required:
+            event = market.rejected_event(order, "insufficient balance")
+            self._rejected.append((self._seq, event))
+            return
+        balances[order.public] = balance - required
+
+        self._pending[self._seq] = order
+        self._ops[shard_of(market.pair, self.workers)].append(
+            (
+                ORDER,
+                self._seq,
+                market.base_token,
+                market.quote_token,
+                order,
+                t,
+                required,
+            )
+        )
+
+    def submit_cancel(self, market: Market, tx: bytes):
+        self._seq += 1
+        self._ops[shard_of(market.pair, self.workers)].append(
+            (CANCEL, self._seq, market.base_token, market.quote_token, tx)
+        )
+
+    def execute(self) -> set[str]:
+        """Run the rest of the batch, returns the pairs the batch modified."""
+        self.flush()
+        modified_pairs, self._modified_pairs = self._modified_pairs, set()
+        return modified_pairs
+
+    def flush(self) -> bool:
+        """
+        Run the transactions submitted so far on the workers and merge the
+        results, so that their credits are visible to the next ones.
+        Returns False when no transaction was waiting for a worker.
+        """
+        waiting = any(self._ops)
+        if not (waiting or self._rejected):
+            return False
+        busy = []
+        for connection, ops in zip(self._connections, self._ops, strict=True):
+            if ops:
+                connection.send(ops)
+                busy.append(connection)
+        results = [connection.recv() for connection in busy]
+        self._ops = [[] for _ in range(self.workers)]
+
+        assets = self.zex.state_manager.assets
+        markets = self.zex.state_manager.markets
+        events = self._rejected
+        trades = []
+        modified_pairs = self._modified_pairs
+        for deltas, shard_events, shard_trades, shard_markets in results:
+            for token, balances in deltas.items():
+                token_balances = assets[token]
+                for public, delta in balances.items():
+                    token_balances[public] = token_balances.get(public, 0) + delta
+            events.extend(shard_events)
+            trades.extend(shard_trades)
+            for pair, (final_id, candles) in shard_markets.items():
+                market = markets[pair]
+                market.final_id = final_id
+                if candles is not None:
+                    market.kline_manager.merge_candles(candles)
+                modified_pairs.add(pair)
+
+        events.sort(key=lambda item: item[0])
+        for seq, event in events:
+            if event.execution_type != ExecutionType.REJECTED:
+                self._apply_event(markets[event.pair], seq, event)
+            self.zex.order_events.append(event)
+
+        trades.sort(key=lambda item: item[0])
+        for _, public, trade in trades:
+            self.zex.trades[public].append(trade)
+            markets[trade[2]]._prune_old_trades(public, trade[0])
+
+        self._pending.clear()
+        self._rejected = []
+        return waiting
+
+    def _apply_event(self, market: Market, seq: int, event: OrderEvent):
+        """Replay a worker's order event onto the coordinator's book."""
+        key = (event.public, event.nonce)
+        if event.execution_type == ExecutionType.NEW:
+            _rest(market, self._pending[seq], event.amount)
+        elif event.execution_type == ExecutionType.CANCELED:
+            _remove(market, market.order_index[key])
+        elif event.is_maker:
+            _fill(market, market.order_index[key], event.last_filled)
+        elif event.order_status == "PARTIALLY_FILLED":
+            # the remaining of a taker order rests on the book
+            remaining = event.amount - event.cumulative_filled
+            _rest(market, self._pending[seq], remaining)
+
+
+def _market_state(market: Market) -> tuple:
+    orders = [
+        (order.tx, order.side, order.price, order.amount, order.remaining)
+        + (order.nonce, order.public, order.user_id)
+        for book_side in (market.buy_orders, market.sell_orders)
+        for order in book_side.iter_orders()
+    ]
+    return (
+        market.base_token,
+        market.quote_token,
+        orders,
+        market.final_id,
+        market.kline_manager.kline,
+    )
+
+
+def _rest(market: Market, order: Order, remaining: int):
+    order.remaining = remaining
+    book_side, side = (
+        (market.buy_orders, "bids")
+        if order.side == BUY
+        else (market.sell_orders, "asks")
+    )
+    with market.order_book_lock:
+        level = book_side.add(order)
+        market._order_book_updates[side][order.price] = level.quantity
+    market.order_index[(order.public, order.nonce)] = order
+    market.zex.amounts[order.tx] = order
+    market.zex.orders[order.public][order.tx] = order
+    market.zex.digest.add_order(order)
+    market.update_book_ticker()
+
+
+def _fill(market: Market, order: Order, amount: int):
+    if order.remaining > amount:
+        side = "bids" if order.side == BUY else "asks"
+        market.zex.digest.remove_order(order)
+        with market.order_book_lock:
+            order.remaining -= amount
+            order.level.quantity -= amount
+            market._order_book_updates[side][order.price] = order.level.quantity
+        market.zex.digest.add_order(order)
+        market.update_book_ticker()
+    else:
+        _remove(market, order)
+
+
+def _remove(market: Market, order: Order):
+    book_side, side = (
+        (market.buy_orders, "bids")
+        if order.side == BUY
+        else (market.sell_orders, "asks")
+    )
+    with market.order_book_lock:
+        level = order.level
+        level.quantity -= order.remaining
+        market._order_book_updates[side][order.price] = level.quantity
+        book_side.remove(order)
+    market.zex.digest.remove_order(order)
+    del market.order_index[(order.public, order.nonce)]
+    del market.zex.amounts[order.tx]
+    del market.zex.orders[order.public][order.tx]
+    market.update_book_ticker()
+
+
+class _NoDigest:
+    def add_order(self, order: Order):
+        pass
+
+    def remove_order(self, order: Order):
+        pass
+
+
+def _new_context(light_node: bool, benchmark_mode: bool) -> SimpleNamespace:
+    """The parts of `Zex` a worker's markets use."""
+    return SimpleNamespace(
+        state_manager=SimpleNamespace(assets=defaultdict(lambda: defaultdict(int))),
+        amounts={},
+        orders=defaultdict(dict),
+        trades=defaultdict(deque),
+        order_events=[],
+        # the coordinator hashes the orders when it replays the events
+        digest=_NoDigest(),
+        light_node=light_node,
+        benchmark_mode=benchmark_mode,
+    )
+
+
+def _new_market(context: SimpleNamespace, base_token: str, quote_token: str):
+    market = Market(base_token, quote_token, context)
+    # worker markets never publish depth updates themselves
+    market._order_book_updates = {"bids": {}, "asks": {}}
+    return market
+
+
+def _run_shard(
+    connection: Connection,
+    markets_state: dict[str, tuple],
+    light_node: bool,
+    benchmark_mode: bool,
+):
+    context = _new_context(light_node, benchmark_mode)
+    markets: dict[str, Market] = {}
+    for pair, state in markets_state.items():
+        base_token, quote_token, orders, final_id, kline = state
+        market = _new_market(context, base_token, quote_token)
+        for tx, side, price, amount, remaining, nonce, public, user_id in orders:
+            order = Order(tx, side, pair, price, amount, nonce, public, user_id)
+            order.remaining = remaining
+            book_side = market.buy_orders if side == BUY else market.sell_orders
+            book_side.add(order)
+            market.order_index[(public, nonce)] = order
+            context.amounts[tx] = order
+            context.orders[public][tx] = order
+        market.final_id = final_id
+        market.kline_manager.kline = kline
+        markets[pair] = market
+
+    while True:
+        ops = connection.recv()
+        if ops is None:
+            break
+        connection.send(_execute_ops(context, markets, ops))
+
+
+def _execute_ops(
+    context: SimpleNamespace, markets: dict[str, Market], ops: list[tuple]
+) -> tuple:
+    assets = defaultdict(lambda: defaultdict(int))
+    context.state_manager.assets = assets
+    for market in markets.values():
+        market.base_token_balances = assets[market.base_token]
+        market.quote_token_balances = assets[market.quote_token]
+
+    events = []
+    trades = []
+    last_candles: dict[str, int | None] = {}
+    for op in ops:
+        kind, seq, base_token, quote_token = op[:4]
+        pair = f"{base_token}-{quote_token}"
+        market = markets.get(pair)
+        if market is None:
+            market = _new_market(context, base_token, quote_token)
+            markets[pair] = market
+        if pair not in last_candles:
+            kline = market.kline_manager.kline
+            last_candles[pair] = kline.index[-1] if len(kline) else None
+
+        if kind == ORDER:
+            order, t, reserved = op[4:]
+            balances = (
+                market.quote_token_balances
+                if order.side == BUY
+                else market.base_token_balances
+            )
+            balances[order.public] += reserved
+            if not market.match_instantly(order, t):
+                market.place(order)
+        else:
+            market.cancel(op[4])
+
+        events.extend((seq, event) for event in context.order_events)
+        context.order_events.clear()
+        for public, user_trades in context.trades.items():
+            trades.extend((seq, public, trade) for trade in user_trades)
+        context.trades.clear()
+
+    deltas = {
+        token: {public: delta for public, delta in balances.items() if delta}
+        for token, balances in assets.items()
+    }
+    touched = {}
+    for pair, last_candle in last_candles.items():
+        market = markets[pair]
+        market._order_book_updates = {"bids": {}, "asks": {}}
+        kline = market.kline_manager.kline
+        # the candle open before the batch may have been updated too
+        candles = kline if last_candle is None else kline.loc[last_candle:]
+        touched[pair] = (market.final_id, candles if len(candles) else None)
+    return deltas, events, trades, touched
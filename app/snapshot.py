@@ -0,0 +1,363 @@
+"""
+Saved state format.
+
+A saved state, full or delta, is a header followed by a `zex_pb2.State`,
+compressed or not:
+
+    magic (4 bytes) | version (1 byte) | compression (1 byte) | payload
+
+Users are stored once in `State.users` and referenced by index, balances
+are fixed width integers in balance units, order and trade amounts are
+integers in lots of their market, and klines are stored column by column.
+
+The magic starts with a byte no protobuf message starts with, so a state
+saved as a bare `zex_pb2.ZexState` by earlier versions is recognized and
+migrated when it is read.
+"""
+
+from collections.abc import Callable, Iterable, Iterator, MutableMapping
+from contextlib import contextmanager
+from decimal import Decimal
+from io import BytesIO
+from struct import Struct
+from typing import IO
+import mmap
+import zlib
+
+from loguru import logger
+import pandas as pd
+
+from app.deposit_set import DepositSet
+from app.fixed_point import BALANCE_DECIMALS, floor_units, from_units
+from app.kline_manager import KlineManager
+from app.models.transaction import get_market_steps
+from app.proto import zex_pb2
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"\xffZEX"
+VERSION = 2
+HEADER = Struct(">4s B B")
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+# bytes per balance in TokenBalances.amounts
+BALANCE_WIDTH = 16
+
+
+class Table:
+    """Values of a repeated field, stored once and referenced by index."""
+
+    def __init__(self, values):
+        self.values = values
+        self._index: dict = {}
+
+    def index(self, value) -> int:
+        i = self._index.get(value)
+        if i is None:
+            i = self._index[value] = len(self._index)
+            self.values.append(value)
+        return i
+
+
+class LazyDict(MutableMapping):
+    """
+    A dict whose loaded values are only built when first read.
+
+    Values set with `set_saved` are kept as they were loaded and converted
+    with `load` on first access, so history nobody asks for is never built.
+    """
+
+    def __init__(self, load: Callable):
+        self._load = load
+        self._values: dict = {}
+        self._saved: dict = {}
+
+    def set_saved(self, key, saved):
+        self._values.pop(key, None)
+        self._saved[key] = saved
+
+    def saved(self, key):
+        """The value of `key` as it was loaded, None once it was built."""
+        return self._saved.get(key)
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            saved = self._saved.pop(key)
+        value = self._values[key] = self._load(saved)
+        return value
+
+    def __setitem__(self, key, value):
+        self._saved.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if self._saved.pop(key, None) is None:
+            del self._values[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._values or key in self._saved
+
+    def __iter__(self) -> Iterator:
+        return iter([*self._values, *self._saved])
+
+    def __len__(self) -> int:
+        return len(self._values) + len(self._saved)
+
+
+@contextmanager
+def open_state(data: IO[bytes]):
+    """The bytes of a saved state, memory-mapped when read from a file."""
+    try:
+        fileno = data.fileno()
+    except OSError:
+        yield data.read()
+        return
+    with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+def encode_state(state: zex_pb2.State, compression: str = "none") -> bytes:
+    payload = state.SerializeToString()
+    if compression == "zlib":
+        payload = zlib.compress(payload)
+    elif compression == "zstd":
+        payload = _zstandard().ZstdCompressor().compress(payload)
+    return HEADER.pack(MAGIC, VERSION, COMPRESSIONS[compression]) + payload
+
+
+def decode_state(data: bytes | mmap.mmap) -> zex_pb2.State:
+    """Parse a saved state, migrating states saved by earlier versions."""
+    if data[: len(MAGIC)] != MAGIC:
+        legacy = zex_pb2.ZexState()
+        with memoryview(data) as view:
+            legacy.ParseFromString(view)
+        return migrate_state(legacy)
+
+    _, version, compression = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported state version: {version}")
+    with memoryview(data)[HEADER.size :] as payload:
+        if compression == COMPRESSIONS["zlib"]:
+            return _parse_state(zlib.decompress(payload))
+        if compression == COMPRESSIONS["zstd"]:
+            return _parse_state(_zstandard().ZstdDecompressor().decompress(payload))
+        if compression == COMPRESSIONS["none"]:
+            return _parse_state(payload)
+    raise ValueError(f"unsupported state compression: {compression}")
+
+
+def _parse_state(payload) -> zex_pb2.State:
+    state = zex_pb2.State()
+    state.ParseFromString(payload)
+    return state
+
+
+def check_compression(compression: str):
+    """Fail early when the configured compression is not available."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unsupported state compression: {compression}")
+    if compression == "zstd":
+        _zstandard()
+
+
+def _zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstd state compression needs the zstandard package")
+    return zstandard
+
+
+def pack_balances(amounts: Iterable[int]) -> bytes:
+    return b"".join(
+        amount.to_bytes(BALANCE_WIDTH, "big", signed=True) for amount in amounts
+    )
+
+
+def unpack_balances(data: bytes) -> list[int]:
+    from_bytes = int.from_bytes
+    return [
+        from_bytes(data[i : i + BALANCE_WIDTH], "big", signed=True)
+        for i in range(0, len(data), BALANCE_WIDTH)
+    ]
+
+
+def pack_deposit_amount(amount: Decimal, decimal: int) -> bytes:
+    """A deposited amount in the smallest unit of its token."""
+    units = int(amount.scaleb(decimal))
+    return units.to_bytes((units.bit_length() + 7) // 8, "big")
+
+
+def unpack_deposit_amount(data: bytes, decimal: int) -> Decimal:
+    # computed as DepositTransaction.from_tx does, to get the same Decimal
+    return Decimal(int.from_bytes(data, "big")) / 10 ** Decimal(decimal)
+
+
+def _legacy_units(amount: Decimal, public: bytes, token: str) -> int:
+    """
+    Balance units of an amount of a legacy state, which could have more
+    decimals than balances keep, rounded down.
+    """
+    units = floor_units(amount)
+    if from_units(units) != amount:
+        logger.warning(
+            "{token} amount {amount} of {public} is rounded down to "
+            "{decimals} decimals",
+            token=token,
+            amount=amount,
+            public=public.hex(),
+            decimals=BALANCE_DECIMALS,
+        )
+    return units
+
+
+def migrate_state(legacy: zex_pb2.ZexState) -> zex_pb2.State:
+    """Convert a state saved as a `zex_pb2.ZexState`."""
+    state = zex_pb2.State()
+    state.last_tx_index = legacy.last_tx_index
+    users = Table(state.users)
+    pairs = Table(state.pairs)
+
+    for entry in legacy.nonces:
+        state.accounts.append(users.index(entry.public_key))
+        state.nonces.append(entry.nonce)
+
+    # token -> user -> balance units, packed once the orders off the grid
+    # are refunded
+    balances: dict[str, dict[int, int]] = {}
+    for token, pb_balance in legacy.balances.items():
+        token_balances = balances[token] = {}
+        for entry in pb_balance.balances:
+            token_balances[users.index(entry.public_key)] = _legacy_units(
+                Decimal(entry.amount), entry.public_key, token
+            )
+
+    remaining = {entry.tx: Decimal(entry.amount) for entry in legacy.amounts}
+    for pair, pb_market in legacy.markets.items():
+        tick, lot = get_market_steps(pair)
+        market_state = state.markets[pair]
+        market_state.base_token = pb_market.base_token
+        market_state.quote_token = pb_market.quote_token
+        for pb_orders, orders, remaining_amounts, is_buy in (
+            (
+                pb_market.buy_orders,
+                market_state.buy_orders,
+                market_state.buy_remaining,
+                True,
+            ),
+            (
+                pb_market.sell_orders,
+                market_state.sell_orders,
+                market_state.sell_remaining,
+                False,
+            ),
+        ):
+            for pb_order in pb_orders:
+                amount = remaining[pb_order.tx]
+                price = Decimal(pb_order.price)
+                steps = lot.to_steps(amount)
+                if steps is not None and tick.to_steps(price) is not None:
+                    orders.append(pb_order.tx)
+                    remaining_amounts.append(steps)
+                    continue
+                # cancelled, rounding would lose part of the funds it locks
+                public = pb_order.tx[-97:-64]
+                if is_buy:
+                    token, locked = pb_market.quote_token, amount * price
+                else:
+                    token, locked = pb_market.base_token, amount
+                logger.warning(
+                    "order {order} on {pair} with price {price} and remaining "
+                    "amount {amount} is off the tick size {tick} or the lot "
+                    "size {lot}, it is cancelled and {locked} {token} refunded",
+                    order=pb_order.tx.hex(),
+                    pair=pair,
+                    price=price,
+                    amount=amount,
+                    tick=tick.size,
+                    lot=lot.size,
+                    locked=locked,
+                    token=token,
+                )
+                token_balances = balances.setdefault(token, {})
+                user = users.index(public)
+                token_balances[user] = token_balances.get(user, 0) + _legacy_units(
+                    locked, public, token
+                )
+        market_state.first_id = pb_market.first_id
+        market_state.final_id = pb_market.final_id
+        market_state.last_update_id = pb_market.last_update_id
+        kline_manager = KlineManager(pair)
+        kline_manager.kline = pd.read_pickle(BytesIO(pb_market.kline))
+        kline_manager.to_protobuf(market_state.klines)
+
+    for token, token_balances in balances.items():
+        state.balances[token].users.extend(token_balances)
+        state.balances[token].amounts = pack_balances(token_balances.values())
+
+    for entry in legacy.trades:
+        user_trades = state.trades.add()
+        user_trades.user = users.index(entry.public_key)
+        for trade in entry.trades:
+            _, lot = get_market_steps(trade.pair)
+            amount = Decimal(trade.amount)
+            steps = lot.to_steps(amount)
+            if steps is None:
+                steps = lot.floor_steps(amount)
+                logger.warning(
+                    "trade amount {amount} of order {order} on {pair} is rounded "
+                    "down to the lot size {lot}",
+                    amount=amount,
+                    order=trade.order.hex(),
+                    pair=trade.pair,
+                    lot=lot.size,
+                )
+            user_trades.t.append(trade.t)
+            user_trades.amounts.append(steps)
+            user_trades.pairs.append(pairs.index(trade.pair))
+            user_trades.order_types.append(trade.order_type)
+            user_trades.orders.append(trade.order)
+
+    for entry in legacy.user_deposits:
+        user_deposits = state.user_deposits.add()
+        user_deposits.user = users.index(entry.public_key)
+        for pb_deposit in entry.deposits:
+            user_deposits.deposits.add(
+                tx_hash=pb_deposit.tx_hash,
+                chain=pb_deposit.chain,
+                token_contract=pb_deposit.token_contract,
+                amount=pack_deposit_amount(
+                    Decimal(pb_deposit.amount), pb_deposit.decimal
+                ),
+                decimal=pb_deposit.decimal,
+                time=pb_deposit.time,
+                user_id=pb_deposit.user_id,
+                vout=pb_deposit.vout,
+            )
+
+    # withdraws per user are the chain's withdraws grouped by user, they are
+    # rebuilt from those when loading
+    for chain, pb_deposits in legacy.deposits.items():
+        chain_history = state.chains[chain]
+        deposits = DepositSet()
+        for entry in pb_deposits.deposits:
+            deposits.add((entry.tx_hash, entry.vout))
+        chain_history.deposit_keys = deposits.keys()
+        chain_history.withdraws.extend(legacy.withdraws_on_chain[chain].raw_txs)
+        for entry in legacy.user_withdraw_nonce_on_chain[chain].nonces:
+            chain_history.withdraw_nonce_users.append(users.index(entry.public_key))
+            chain_history.withdraw_nonces.append(entry.nonce)
+        chain_history.withdraw_nonce = legacy.withdraw_nonce_on_chain[chain]
+        chain_history.contract_decimals.update(
+            legacy.contract_decimal_on_chain[chain].contract_decimal
+        )
+
+    public_to_id = {
+        entry.public_key: entry.user_id for entry in legacy.public_to_id_lookup
+    }
+    for public in public_to_id:
+        users.index(public)
+    state.user_ids.extend(public_to_id.get(public, 0) for public in state.users)
+    return state
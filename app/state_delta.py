@@ -0,0 +1,70 @@
+"""
+Delta snapshots.
+
+Every few saves the whole state is written to `state_dest` as a full
+checkpoint. The saves in between only write what changed since the
+previous save: the markets touched, every user who traded, cancelled,
+registered, deposited or withdrew, and the deposits and withdraws
+recorded on each chain. Deltas are written next to the checkpoint they
+build on, named after its `last_tx_index`, so a delta is never applied
+to any other checkpoint, and are applied in order when the state is
+loaded, see `Zex.merge_protobuf`.
+"""
+
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+import glob
+import os
+
+from app.models.transaction import WithdrawTransaction
+from app.proto import zex_pb2
+from app.snapshot import decode_state
+
+
+@dataclass
+class StateChanges:
+    """What changed since the previous save."""
+
+    users: set[bytes] = field(default_factory=set)
+    markets: set[str] = field(default_factory=set)
+    # chain -> (tx_hash, vout) of the deposits recorded since the previous save
+    deposits: dict[str, list[tuple[str, int]]] = field(default_factory=dict)
+    # chain -> withdraws recorded since the previous save
+    withdraws: dict[str, list[WithdrawTransaction]] = field(default_factory=dict)
+
+    @property
+    def chains(self) -> set[str]:
+        return self.deposits.keys() | self.withdraws.keys()
+
+
+def select(mapping: Mapping, keys: Iterable | None) -> Iterable[tuple]:
+    """Items of `mapping`, or only those of `keys` when they are given."""
+    if keys is None:
+        return mapping.items()
+    return ((key, mapping[key]) for key in keys if key in mapping)
+
+
+def delta_path(state_dest, checkpoint_index: int, number: int) -> str:
+    return f"{state_dest}.delta.{checkpoint_index}.{number}"
+
+
+def remove_deltas(state_dest):
+    """Remove the delta files of every checkpoint written to `state_dest`."""
+    for path in glob.glob(f"{glob.escape(str(state_dest))}.delta.*"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_deltas(state_dest, checkpoint_index: int) -> Iterator[zex_pb2.State]:
+    """The deltas written on top of the checkpoint at `checkpoint_index`, in order."""
+    number = 1
+    while True:
+        try:
+            with open(delta_path(state_dest, checkpoint_index, number), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        yield decode_state(data)
+        number += 1
@@ -0,0 +1,108 @@
+"""
+Rolling digest of the state, to check that nodes agree.
+
+The digest is the sum, modulo 2**256, of one hash per user over what the
+user holds: nonce, balances and withdraw nonces on each chain, one hash
+per open order with its remaining amount, plus one hash of the withdraw
+nonce of each chain. A batch only rehashes the users it touched, and the
+markets add the hash of an order when it rests and subtract it when it is
+filled or cancelled, so the digest is kept up to date after every batch
+at the cost of the batch itself, and two nodes with the same digest at
+the same `last_tx_index` have the same balances, books and nonces.
+"""
+
+from collections import deque
+from collections.abc import Iterable, Mapping
+from hashlib import blake2b
+from struct import Struct
+
+from app.chain import ChainState
+from app.order_book import Order
+from app.snapshot import BALANCE_WIDTH
+
+MODULUS = 1 << 256
+CHAINS_KEY = b"chains"
+# digests of the last batches, by last_tx_index
+HISTORY_SIZE = 1000
+NONCE = Struct(">Q")
+# tx length, remaining amount
+ORDER = Struct(">HQ")
+
+
+class StateDigest:
+    def __init__(self):
+        self.value = 0
+        self._hashes: dict[bytes, int] = {}
+        self.history: deque[tuple[int, int]] = deque(maxlen=HISTORY_SIZE)
+
+    def update(self, key: bytes, data: bytes):
+        """Replace the hash of `key` in the digest with the hash of `data`."""
+        new = int.from_bytes(blake2b(key + data, digest_size=32).digest())
+        old = self._hashes.get(key, 0)
+        self._hashes[key] = new
+        self.value = (self.value - old + new) % MODULUS
+
+    def add_order(self, order: Order):
+        """Add the hash of an open order with its remaining amount."""
+        self.value = (self.value + _order_hash(order)) % MODULUS
+
+    def remove_order(self, order: Order):
+        """Subtract the hash of an open order with its remaining amount."""
+        self.value = (self.value - _order_hash(order)) % MODULUS
+
+    def record(self, last_tx_index: int):
+        self.history.append((last_tx_index, self.value))
+
+    def at(self, last_tx_index: int) -> int | None:
+        """The digest after the batch ending at `last_tx_index`, if still kept."""
+        # copied, batches are recorded while the API reads
+        for index, value in reversed(list(self.history)):
+            if index == last_tx_index:
+                return value
+            if index < last_tx_index:
+                return None
+        return None
+
+    def reset(self):
+        self.value = 0
+        self._hashes.clear()
+        self.history.clear()
+
+
+def user_data(
+    public: bytes,
+    nonces: Mapping[bytes, int],
+    assets: Iterable[tuple[str, Mapping[bytes, int]]],
+    chain_states: Iterable[tuple[str, ChainState]],
+) -> bytes:
+    """What a user holds, encoded the same way on every node."""
+    parts = [NONCE.pack(nonces.get(public, 0))]
+    for token, balances in assets:
+        balance = balances.get(public, 0)
+        if balance:
+            parts.append(_name(token))
+            parts.append(balance.to_bytes(BALANCE_WIDTH, "big", signed=True))
+    for chain, chain_state in chain_states:
+        nonce = chain_state.user_withdraw_nonces.get(public, 0)
+        if nonce:
+            parts.append(_name(chain))
+            parts.append(NONCE.pack(nonce))
+    return b"".join(parts)
+
+
+def chains_data(chain_states: Iterable[tuple[str, ChainState]]) -> bytes:
+    return b"".join(
+        _name(chain) + NONCE.pack(chain_state.withdraw_nonce)
+        for chain, chain_state in chain_states
+    )
+
+
+def _order_hash(order: Order) -> int:
+    tx = order.tx
+    data = ORDER.pack(len(tx), order.remaining) + tx
+    return int.from_bytes(blake2b(data, digest_size=32).digest())
+
+
+def _name(name: str) -> bytes:
+    encoded = name.encode()
+    return bytes([len(encoded)]) + encoded
@@ -0,0 +1,44 @@
+"""
+Time-ordered transfer history of users.
+
+Deposits and withdraws are stored once, deposits per user in
+`StateManager.user_deposits` and withdraws per chain in
+`ChainState.withdraws`. A user's transfers are indexed by time in
+columns that only refer to those: the time, the chain of a withdraw or
+None for a deposit, and the position in the list it is stored in. The
+index of a user is built on the first query and then kept up to date,
+so queries page through it without sorting.
+"""
+
+from array import array
+from bisect import bisect_right
+
+
+class UserTransfers:
+    __slots__ = ("times", "chains", "positions")
+
+    def __init__(self):
+        self.times = array("Q")
+        # chain of each withdraw, None for deposits
+        self.chains: list[str | None] = []
+        self.positions = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def add(self, time: int, chain: str | None, position: int):
+        """Index a transfer, after the transfers at the same time."""
+        if not self.times or self.times[-1] <= time:
+            self.times.append(time)
+            self.chains.append(chain)
+            self.positions.append(position)
+            return
+        i = bisect_right(self.times, time)
+        self.times.insert(i, time)
+        self.chains.insert(i, chain)
+        self.positions.insert(i, position)
+
+    def page(self, offset: int, limit: int | None) -> zip:
+        """(chain, position) of the transfers in a page, oldest first."""
+        end = None if limit is None else offset + limit
+        return zip(self.chains[offset:end], self.positions[offset:end], strict=True)
@@ -0,0 +1,74 @@
+"""
+Transactions already verified on this node.
+
+An order is verified when it is submitted, in `transmit_tx`, and again
+when the sequencer hands it back, in `verify_batches`, and bots resubmit
+orders they did not see go through. The verifier workers of both paths
+remember the digest of every transaction they found valid in a table in
+shared memory, and skip the signature checks of a transaction whose
+digest is in it. The digest is a 32 byte blake2b of the whole
+transaction, signature included, so a hit means these exact bytes were
+verified; verification does not depend on the state, so the result still
+holds.
+
+The table is split into buckets of `WAYS` digests, each with a reference
+byte that a hit sets, and a digest replaces the first digest of its
+bucket without a reference from a clock hand. Workers read and write the
+table without locks: a digest torn by concurrent writes matches no
+transaction and only costs a miss.
+"""
+
+from hashlib import blake2b
+from multiprocessing.shared_memory import SharedMemory
+
+DIGEST_SIZE = 32
+WAYS = 8
+
+
+def tx_digest(tx: bytes) -> bytes:
+    return blake2b(tx, digest_size=DIGEST_SIZE).digest()
+
+
+class VerifiedCache:
+    def __init__(self, entries: int):
+        self.buckets = max(1, entries // WAYS)
+        entries = self.buckets * WAYS
+        # digests | reference byte of each digest | clock hand of each bucket
+        self._refs = entries * DIGEST_SIZE
+        self._hands = self._refs + entries
+        self._shm = SharedMemory(create=True, size=self._hands + self.buckets)
+
+    def __contains__(self, digest: bytes) -> bool:
+        buf = self._shm.buf
+        first = self._bucket(digest) * WAYS
+        for entry in range(first, first + WAYS):
+            offset = entry * DIGEST_SIZE
+            if buf[offset : offset + DIGEST_SIZE] == digest:
+                buf[self._refs + entry] = 1
+                return True
+        return False
+
+    def add(self, digest: bytes):
+        buf = self._shm.buf
+        bucket = self._bucket(digest)
+        first = bucket * WAYS
+        way = buf[self._hands + bucket]
+        # give the digests hit since the hand last passed a second chance
+        for _ in range(WAYS):
+            ref = self._refs + first + way
+            if not buf[ref]:
+                break
+            buf[ref] = 0
+            way = (way + 1) % WAYS
+        offset = (first + way) * DIGEST_SIZE
+        buf[offset : offset + DIGEST_SIZE] = digest
+        buf[self._hands + bucket] = (way + 1) % WAYS
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+    def _bucket(self, digest: bytes) -> int:
+        return int.from_bytes(digest[:8], "little") % self.buckets
@@ -1,8 +1,11 @@
+from collections import Counter, deque
 from dataclasses import dataclass
+from functools import lru_cache
 from hashlib import sha256
-from itertools import repeat
-from struct import calcsize, unpack
-from struct import error as struct_error
+from itertools import accumulate
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from struct import Struct
 import multiprocessing
 
 from eth_account.messages import encode_defunct
@@ -16,234 +19,34 @@ from pyfrost.frost import (
 )
 from secp256k1 import PublicKey
 from web3 import Web3
-import numpy as np
 
+from .codec import DEPOSIT_SIGNATURES
 from .config import settings
+from .messages import (
+    cancel_msg,
+    order_msg,
+    register_msg,
+    withdraw_msg,
+)
+from .models.transaction import (
+    INVALID,
+    INVALID_RECORD,
+    TX_RECORD,
+    VALID_RECORD,
+    DecodedTx,
+    decode_record,
+    tx_record,
+)
+from .precheck import Rejections, precheck
+from .verified_cache import VerifiedCache, tx_digest
 
 DEPOSIT, WITHDRAW, BUY, SELL, CANCEL, REGISTER = b"dwbscr"
 
 w3 = Web3()
 
-
-class MessageFormatError(Exception):
-    """Custom exception for message formatting errors."""
-
-    pass
-
-
-def order_msg(tx: bytes) -> bytes:
-    """
-    Format order message for verification.
-
-    Args:
-        tx: Transaction bytes containing order data
-
-    Returns:
-        Formatted message bytes
-
-    Raises:
-        MessageFormatError: If message formatting fails
-    """
-    try:
-        if len(tx) < 4:
-            raise MessageFormatError("Transaction too short for header")
-
-        # Unpack header
-        try:
-            version, side, base_token_len, quote_token_len = unpack(">B B B B", tx[:4])
-        except struct_error as e:
-            raise MessageFormatError(f"Failed to unpack header: {e}")
-
-        # Validate token lengths
-        if base_token_len == 0 or quote_token_len == 0:
-            raise MessageFormatError("Invalid token length")
-
-        # Create and validate format string
-        order_format = f">{base_token_len}s {quote_token_len}s d d I I 33s"
-        order_format_size = calcsize(order_format)
-
-        if len(tx) < 4 + order_format_size:
-            raise MessageFormatError("Transaction too short for order data")
-
-        # Unpack order data
-        try:
-            base_token, quote_token, amount, price, t, nonce, public = unpack(
-                order_format, tx[4 : 4 + order_format_size]
-            )
-        except struct_error as e:
-            raise MessageFormatError(f"Failed to unpack order data: {e}")
-
-        # Decode tokens
-        try:
-            base_token = base_token.decode("ascii")
-            quote_token = quote_token.decode("ascii")
-        except UnicodeDecodeError as e:
-            raise MessageFormatError(f"Invalid token encoding: {e}")
-
-        # Validate side
-        if side not in (BUY, SELL):
-            raise MessageFormatError(f"Invalid order side: {side}")
-
-        # Format message
-        try:
-            public = public.hex()
-            msg = f"""v: {version}
-name: {"buy" if side == BUY else "sell"}
-base token: {base_token}
-quote token: {quote_token}
-amount: {np.format_float_positional(amount, trim="0")}
-price: {np.format_float_positional(price, trim="0")}
-t: {t}
-nonce: {nonce}
-public: {public}
-"""
-            msg = "".join(("\x19Ethereum Signed Message:\n", str(len(msg)), msg))
-            logger.debug("Order message created successfully", message=msg)
-            return msg.encode()
-        except Exception as e:
-            raise MessageFormatError(f"Failed to format message: {e}")
-
-    except MessageFormatError:
-        raise
-    except Exception as e:
-        raise MessageFormatError(f"Unexpected error formatting order message: {e}")
-
-
-def withdraw_msg(tx: bytes) -> bytes:
-    """
-    Format withdrawal message for verification.
-
-    Args:
-        tx: Transaction bytes containing withdrawal data
-
-    Returns:
-        Formatted message bytes
-
-    Raises:
-        MessageFormatError: If message formatting fails
-    """
-    try:
-        if len(tx) < 3:
-            raise MessageFormatError("Transaction too short for header")
-
-        # Unpack header
-        try:
-            version, token_len = unpack(">B x B", tx[:3])
-        except struct_error as e:
-            raise MessageFormatError(f"Failed to unpack header: {e}")
-
-        # Validate token length
-        if token_len == 0:
-            raise MessageFormatError("Invalid token length")
-
-        # Create and validate format string
-        withdraw_format = f">3s {token_len}s d 20s I I 33s"
-        format_size = calcsize(withdraw_format)
-
-        if len(tx) < 3 + format_size:
-            raise MessageFormatError("Transaction too short for withdrawal data")
-
-        # Unpack withdrawal data
-        try:
-            token_chain, token_name, amount, destination, t, nonce, public = unpack(
-                withdraw_format, tx[3 : 3 + format_size]
-            )
-        except struct_error as e:
-            raise MessageFormatError(f"Failed to unpack withdrawal data: {e}")
-
-        # Decode tokens
-        try:
-            token_chain = token_chain.decode("ascii")
-            token_name = token_name.decode("ascii")
-        except UnicodeDecodeError as e:
-            raise MessageFormatError(f"Invalid token encoding: {e}")
-
-        # Format message
-        try:
-            msg = f"""v: {version}
-name: withdraw
-token chain: {token_chain}
-token name: {token_name}
-amount: {amount}
-to: 0x{destination.hex()}
-t: {t}
-nonce: {nonce}
-public: {public.hex()}
-"""
-            msg = "\x19Ethereum Signed Message:\n" + str(len(msg)) + msg
-            logger.debug("Withdrawal message created successfully", message=msg)
-            return msg.encode()
-        except Exception as e:
-            raise MessageFormatError(f"Failed to format message: {e}")
-
-    except MessageFormatError:
-        raise
-    except Exception as e:
-        raise MessageFormatError(f"Unexpected error formatting withdrawal message: {e}")
-
-
-def register_msg() -> bytes:
-    """
-    Format registration message for verification.
-
-    Returns:
-        Formatted message bytes
-
-    Raises:
-        MessageFormatError: If message formatting fails
-    """
-    try:
-        msg = "Welcome to ZEX."
-        msg = "".join(("\x19Ethereum Signed Message:\n", str(len(msg)), msg))
-        logger.debug("Registration message created successfully", message=msg)
-        return msg.encode()
-    except Exception as e:
-        raise MessageFormatError(f"Failed to format registration message: {e}")
-
-
-def cancel_msg(tx: bytes) -> bytes:
-    """
-    Format cancellation message for verification.
-
-    Args:
-        tx: Transaction bytes containing cancellation data
-
-    Returns:
-        Formatted message bytes
-
-    Raises:
-        MessageFormatError: If message formatting fails
-    """
-    try:
-        if (
-            len(tx) < 99
-        ):  # Minimum length check (1 byte version + 1 byte type + minimum order tx + 33 bytes public key)
-            raise MessageFormatError("Transaction too short for cancellation data")
-
-        try:
-            order_tx = tx[2:-97].hex()
-            public_key = tx[-97:-64].hex()
-        except Exception as e:
-            raise MessageFormatError(f"Failed to hex encode transaction data: {e}")
-
-        try:
-            msg = f"""v: {tx[0]}
-name: cancel
-slice: {order_tx}
-public: {public_key}
-"""
-            msg = "".join(("\x19Ethereum Signed Message:\n", str(len(msg)), msg))
-            logger.debug("Cancellation message created successfully", message=msg)
-            return msg.encode()
-        except Exception as e:
-            raise MessageFormatError(f"Failed to format message: {e}")
-
-    except MessageFormatError:
-        raise
-    except Exception as e:
-        raise MessageFormatError(
-            f"Unexpected error formatting cancellation message: {e}"
-        )
+# parsed keys of the latest signers in each worker, parsing decompresses the
+# point and a few market makers sign most transactions
+PUBLIC_KEY_CACHE_SIZE = 4096
 
 
 @dataclass
@@ -255,6 +58,12 @@ class VerificationResult:
     error_message: str | None = None
 
 
+@lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)
+def cached_public_key(public: bytes) -> PublicKey:
+    """The parsed compressed public key, see `PUBLIC_KEY_CACHE_SIZE`."""
+    return PublicKey(public, raw=True)
+
+
 def verify_single_tx(
     tx: bytes,
     deposit_monitor_pub_key: int,
@@ -321,7 +130,7 @@ def _verify_deposit_tx(
     try:
         msg = tx[:-206]
         msg_hash = sha256(msg).hexdigest()
-        nonce, frost_sig, ecdsa_sig = unpack(">42s 32s 132s", tx[-206:])
+        nonce, frost_sig, ecdsa_sig = DEPOSIT_SIGNATURES.unpack_from(tx, len(tx) - 206)
 
         # Verify FROST signature
         try:
@@ -374,7 +183,7 @@ def _verify_withdraw_tx(tx: bytes) -> VerificationResult:
     try:
         msg, pubkey, sig = withdraw_msg(tx), tx[-97:-64], tx[-64:]
         logger.debug(f"Withdraw request pubkey: {pubkey.hex()}")
-        pubkey = PublicKey(pubkey, raw=True)
+        pubkey = cached_public_key(pubkey)
         sig = pubkey.ecdsa_deserialize_compact(sig)
         msg_hash = keccak(msg)
         return VerificationResult(is_valid=pubkey.ecdsa_verify(msg_hash, sig, raw=True))
@@ -405,7 +214,7 @@ def _verify_standard_tx(tx: bytes, tx_type: int) -> VerificationResult:
                 error_message=f"Unsupported transaction type: {chr(tx_type)}",
             )
 
-        pubkey = PublicKey(pubkey, raw=True)
+        pubkey = cached_public_key(pubkey)
         sig = pubkey.ecdsa_deserialize_compact(sig)
         msg_hash = keccak(msg)
         is_verified = pubkey.ecdsa_verify(msg_hash, sig, raw=True)
@@ -430,32 +239,199 @@ def _verify_standard_tx(tx: bytes, tx_type: int) -> VerificationResult:
         )
 
 
-def _verify_chunk(
-    txs: list[bytes],
+# A batch, in a ring slot at an offset aligned to 8 bytes, and as handed to
+# the engine by `TransactionVerifier.finish`:
+#
+#     count (uint32) | tx offsets (count + 1 uint32) | records | txs
+#
+# workers verify and decode their range of the batch in place and write the
+# record of each transaction, see `TX_RECORD`
+RING_SLOTS = 4
+SLOT_SIZE = 16 * 1024 * 1024
+BATCH_COUNT = Struct("<I")
+PACKED_INVALID = TX_RECORD.pack(*INVALID_RECORD)
+PACKED_VALID = TX_RECORD.pack(*VALID_RECORD)
+
+
+def _batch_layout(count: int) -> tuple[Struct, int, int]:
+    """The tx offsets layout, and the offsets of records and txs in a batch."""
+    offsets = Struct(f"<{count + 1}I")
+    records = BATCH_COUNT.size + offsets.size
+    return offsets, records, records + count * TX_RECORD.size
+
+
+def decode_batch(batch: bytes) -> list[DecodedTx | None]:
+    """
+    Decode a batch returned by `TransactionVerifier.finish`, None for the
+    invalid transactions.
+    """
+    (count,) = BATCH_COUNT.unpack_from(batch)
+    offsets_layout, records, data = _batch_layout(count)
+    offsets = offsets_layout.unpack_from(batch, BATCH_COUNT.size)
+    results = []
+    for i, record in enumerate(TX_RECORD.iter_unpack(memoryview(batch)[records:data])):
+        tx = batch[data + offsets[i] : data + offsets[i + 1]]
+        try:
+            results.append(decode_record(tx, *record))
+        except Exception as e:
+            logger.exception(f"Error decoding transaction: {e}")
+            results.append(None)
+    return results
+
+
+def _is_valid(
+    tx: bytes,
+    cache: VerifiedCache | None,
+    submitted: bool,
+    rejected: Counter[str],
+    deposit_monitor_pub_key: int,
+    deposit_shield_address: str,
+) -> bool:
+    """
+    Verify a transaction, unless it is rejected on its structure, see
+    `app.precheck`, or it was already found valid on this node.
+    """
+    reason = precheck(tx, submitted)
+    if reason is not None:
+        rejected[reason] += 1
+        return False
+    digest = None
+    if cache is not None:
+        digest = tx_digest(tx)
+        if digest in cache:
+            return True
+    is_valid = verify_single_tx(
+        tx, deposit_monitor_pub_key, deposit_shield_address
+    ).is_valid
+    if is_valid and cache is not None:
+        cache.add(digest)
+    return is_valid
+
+
+def _record(
+    tx: bytes,
+    verify: bool,
+    cache: VerifiedCache | None,
+    submitted: bool,
+    rejected: Counter[str],
     deposit_monitor_pub_key: int,
     deposit_shield_address: str,
-) -> list[VerificationResult]:
-    """Verify a chunk of transactions."""
-    return [
-        verify_single_tx(
+) -> bytes:
+    """
+    The packed record of a transaction, see `tx_record`, submitted
+    transactions are only verified. Any error makes the transaction
+    invalid, a worker never stops in the middle of a batch.
+    """
+    try:
+        if verify and not _is_valid(
             tx,
+            cache,
+            submitted,
+            rejected,
             deposit_monitor_pub_key,
             deposit_shield_address,
-        ).is_valid
-        for tx in txs
-    ]
+        ):
+            return PACKED_INVALID
+        if submitted:
+            return PACKED_VALID
+        return TX_RECORD.pack(*tx_record(tx))
+    except Exception as e:
+        logger.exception(f"Error recording transaction: {e}")
+        return PACKED_INVALID
+
+
+def _verify_worker(
+    connection: Connection,
+    ring: SharedMemory,
+    cache: VerifiedCache | None,
+    submitted: bool,
+    deposit_monitor_pub_key: int,
+    deposit_shield_address: str,
+):
+    """
+    Verify and decode ranges of the batches in the ring until told to stop,
+    replies with the number of transactions rejected by `precheck` by
+    reason.
+    """
+    buf = ring.buf
+    try:
+        while (job := connection.recv()) is not None:
+            rejected = Counter()
+            if type(job[0]) is list:
+                # transactions of a batch too large for a slot
+                txs, verify = job
+                records = b"".join(
+                    _record(
+                        tx,
+                        verify,
+                        cache,
+                        submitted,
+                        rejected,
+                        deposit_monitor_pub_key,
+                        deposit_shield_address,
+                    )
+                    for tx in txs
+                )
+                connection.send((records, rejected))
+                continue
+            slot, count, start, end, verify = job
+            base = slot * SLOT_SIZE
+            offsets_layout, records, data = _batch_layout(count)
+            offsets = offsets_layout.unpack_from(buf, base + BATCH_COUNT.size)
+            for i in range(start, end):
+                tx = bytes(buf[base + data + offsets[i] : base + data + offsets[i + 1]])
+                offset = base + records + i * TX_RECORD.size
+                buf[offset : offset + TX_RECORD.size] = _record(
+                    tx,
+                    verify,
+                    cache,
+                    submitted,
+                    rejected,
+                    deposit_monitor_pub_key,
+                    deposit_shield_address,
+                )
+            connection.send(rejected)
+    finally:
+        del buf
+        ring.close()
+
+
+@dataclass(eq=False)
+class VerifyTicket:
+    """A batch handed to the workers, see `TransactionVerifier.submit`."""
+
+    slot: int | None
+    size: int  # bytes of the batch in its slot
+    connections: list[Connection]
+    replies: list | None = None  # received before `finish`, see `submit`
 
 
 class TransactionVerifier:
-    def __init__(self, num_processes: int | None = None):
+    def __init__(
+        self,
+        num_processes: int | None = None,
+        cache: VerifiedCache | None = None,
+        submitted: bool = False,
+        rejections: Rejections | None = None,
+    ):
         """
-        Initialize the TransactionVerifier with a multiprocessing pool.
+        Start long-lived verifier processes.
+
+        Batches are written to a ring of shared memory slots and every worker
+        verifies and decodes its range of a batch in place, so only job
+        descriptions and acknowledgements cross process boundaries.
 
         Args:
             num_processes: Number of processes to use. Defaults to CPU count if None.
+            cache: Transactions already verified, shared with other verifiers,
+                see `app.verified_cache`.
+            submitted: Whether the transactions are submitted to this node,
+                rather than sequenced, see `app.precheck`. They are not decoded.
+            rejections: Counts of transactions rejected before verification.
         """
         self.num_processes = num_processes or multiprocessing.cpu_count()
-        self.pool = multiprocessing.Pool(processes=self.num_processes)
+        self.slots = RING_SLOTS
+        self.rejections = rejections
 
         # Initialize environment variables
         self.deposit_monitor_pub_key = settings.zex.keys.deposit_public_key
@@ -463,25 +439,133 @@ class TransactionVerifier:
             settings.zex.keys.deposit_shield_address
         )
 
+        self._ring = SharedMemory(create=True, size=RING_SLOTS * SLOT_SIZE)
+        self._free_slots = deque(range(RING_SLOTS))
+        self._in_flight: deque[VerifyTicket] = deque()
+        self._connections: list[Connection] = []
+        self._processes: list[multiprocessing.Process] = []
+        for _ in range(self.num_processes):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_verify_worker,
+                args=(
+                    worker_connection,
+                    self._ring,
+                    cache,
+                    submitted,
+                    int(self.deposit_monitor_pub_key),
+                    self.deposit_shield_address,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._connections.append(connection)
+            self._processes.append(process)
+
     def __enter__(self):
         """Context manager entry point."""
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit point - ensures proper cleanup of the pool."""
+        """Context manager exit point - ensures proper cleanup of the workers."""
         self.cleanup()
 
     def cleanup(self):
-        """Clean up resources by closing and joining the multiprocessing pool."""
-        if hasattr(self, "pool"):
-            self.pool.close()
-            self.pool.join()
+        """Stop the workers and release the ring."""
+        for connection in self._connections:
+            connection.send(None)
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        self._ring.close()
+        self._ring.unlink()
+
+    def submit(self, txs: list[bytes], verify: bool = True) -> VerifyTicket:
+        """
+        Hand a batch to the workers, up to `slots` batches can be in flight.
+
+        Args:
+            txs: List of transactions to verify
+            verify: Whether to verify them, or only decode them. Only for
+                finalized history that is trusted, see `trusted_replay_index`
+                in the settings.
 
-    @staticmethod
-    def _chunkify(lst: list, n_chunks: int) -> list[list]:
-        """Split a list into n roughly equal chunks."""
-        chunk_size = len(lst) // n_chunks + 1
-        return [lst[i : i + chunk_size] for i in range(0, len(lst), chunk_size)]
+        Returns:
+            The ticket to collect the batch with, see `finish`
+        """
+        count = len(txs)
+        chunk_size = count // self.num_processes + 1
+        ranges = [
+            (start, min(start + chunk_size, count))
+            for start in range(0, count, chunk_size)
+        ]
+        connections = self._connections[: len(ranges)]
+
+        tx_offsets = list(accumulate(map(len, txs), initial=0))
+        offsets_layout, _, data = _batch_layout(count)
+        size = data + tx_offsets[-1]
+        if size > SLOT_SIZE:
+            # a worker blocks sending the records of a batch too large for a
+            # slot until they are received, take the replies of the batches
+            # in flight first so sending these transactions cannot deadlock
+            if self._in_flight:
+                self._receive(self._in_flight[-1])
+            for connection, (start, end) in zip(connections, ranges, strict=True):
+                connection.send((txs[start:end], verify))
+            ticket = VerifyTicket(None, size, connections)
+            self._in_flight.append(ticket)
+            return ticket
+
+        slot = self._free_slots.popleft()
+        base = slot * SLOT_SIZE
+        buf = self._ring.buf
+        BATCH_COUNT.pack_into(buf, base, count)
+        offsets_layout.pack_into(buf, base + BATCH_COUNT.size, *tx_offsets)
+        buf[base + data : base + size] = b"".join(txs)
+        for connection, (start, end) in zip(connections, ranges, strict=True):
+            connection.send((slot, count, start, end, verify))
+        ticket = VerifyTicket(slot, size, connections)
+        self._in_flight.append(ticket)
+        return ticket
+
+    def _receive(self, ticket: VerifyTicket):
+        """Receive the replies of the batches in flight up to `ticket`."""
+        for pending in self._in_flight:
+            if pending.replies is None:
+                pending.replies = [
+                    connection.recv() for connection in pending.connections
+                ]
+            if pending is ticket:
+                return
+
+    def finish(self, txs: list[bytes], ticket: VerifyTicket) -> bytes:
+        """
+        Wait for a submitted batch, returns it with the record of each
+        transaction, see `decode_batch`.
+        """
+        self._receive(ticket)
+        self._in_flight.remove(ticket)
+        replies = ticket.replies
+        if ticket.slot is None:
+            offsets_layout, _, _ = _batch_layout(len(txs))
+            batch = b"".join(
+                [
+                    BATCH_COUNT.pack(len(txs)),
+                    offsets_layout.pack(*accumulate(map(len, txs), initial=0)),
+                    *(records for records, _ in replies),
+                    *txs,
+                ]
+            )
+            replies = [rejected for _, rejected in replies]
+        else:
+            base = ticket.slot * SLOT_SIZE
+            batch = bytes(self._ring.buf[base : base + ticket.size])
+            self._free_slots.append(ticket.slot)
+        rejected = sum(replies, Counter())
+        if rejected and self.rejections is not None:
+            self.rejections.add(rejected)
+        return batch
 
     def verify(self, txs: list[bytes]) -> list[bytes | None]:
         """
@@ -493,23 +577,23 @@ class TransactionVerifier:
         Returns:
             List of verified transactions (None for invalid transactions)
         """
-        chunks = self._chunkify(txs, self.num_processes)
-
-        results = self.pool.starmap(
-            _verify_chunk,
-            zip(
-                chunks,
-                repeat(int(self.deposit_monitor_pub_key)),
-                repeat(self.deposit_shield_address),
-            ),
-        )
+        batch = self.finish(txs, self.submit(txs))
+        _, records, data = _batch_layout(len(txs))
+        # the status is the first byte of each record
+        statuses = batch[records : data : TX_RECORD.size]
+        return [
+            tx if status != INVALID else None
+            for tx, status in zip(txs, statuses, strict=True)
+        ]
+
+    def verify_and_decode(self, txs: list[bytes]) -> list[DecodedTx | None]:
+        """
+        Verify and decode a list of transactions.
 
-        verified_txs = txs.copy()
-        i = 0
-        for chunk_results in results:
-            for verified in chunk_results:
-                if not verified:
-                    verified_txs[i] = None
-                i += 1
+        Args:
+            txs: List of transactions to verify
 
-        return verified_txs
+        Returns:
+            List of decoded transactions (None for invalid transactions)
+        """
+        return decode_batch(self.finish(txs, self.submit(txs)))
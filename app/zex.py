@@ -1,15 +1,13 @@
 from collections import deque
-from collections.abc import Callable
-from copy import deepcopy
+from collections.abc import Callable, Iterable
 from decimal import Decimal, FloatOperation, getcontext
 from io import BytesIO
 from threading import Lock
 from time import time as unix_time
-from typing import IO, Literal
+from typing import IO, TYPE_CHECKING, Literal
 import asyncio
-import heapq
-import struct
-import time
+import os
+import warnings
 
 from eth_utils.address import to_checksum_address
 from loguru import logger
@@ -17,20 +15,55 @@ import httpx
 import pandas as pd
 
 from app.chain import ChainState
+from app.fixed_point import BALANCE_DECIMALS, from_units, to_units
 from app.kline_manager import KlineManager
+from app.order_book import BookTicker, DepthSide, DepthSnapshot, Order, OrderBookSide
 
 from .config import settings
+from .journal import BatchJournal
 from .models.transaction import (
+    DecodedTx,
     Deposit,
     DepositTransaction,
     WithdrawTransaction,
+    decode_tx,
+    get_market_steps,
 )
 from .proto import zex_pb2
 from .singleton import SingletonMeta
-from .zex_types import Chain, ExecutionType, UserPublic
+from .snapshot import (
+    LazyDict,
+    Table,
+    check_compression,
+    decode_state,
+    encode_state,
+    open_state,
+    pack_balances,
+    pack_deposit_amount,
+    unpack_balances,
+    unpack_deposit_amount,
+)
+from .state_delta import (
+    StateChanges,
+    delta_path,
+    read_deltas,
+    remove_deltas,
+    select,
+)
+from .state_digest import CHAINS_KEY, StateDigest, chains_data, user_data
+from .transfers import UserTransfers
+from .zex_types import Chain, ExecutionType, OrderEvent, UserPublic
+
+if TYPE_CHECKING:
+    from app.sharding import ShardedMatcher
 
 BTC_DEPOSIT, DEPOSIT, WITHDRAW, BUY, SELL, CANCEL, REGISTER = b"xdwbscr"
 TRADES_TTL = 1000
+# depth requests are served up to this many levels per side
+DEPTH_LIMIT_MAX = 1000
+# number of levels per side read from the book for depth requests, level
+# changes are folded into them until fewer than DEPTH_LIMIT_MAX are left
+DEPTH_SNAPSHOT_LEVELS = 5000
 
 
 def get_token_name(chain, address):
@@ -43,16 +76,78 @@ def get_token_name(chain, address):
     return f"{chain}:{address}"
 
 
+def deposits_from_protobuf(
+    pb_deposits: Iterable[zex_pb2.DepositRecord],
+) -> list[Deposit]:
+    return [
+        Deposit(
+            tx_hash=pb_deposit.tx_hash,
+            chain=pb_deposit.chain,
+            token_contract=pb_deposit.token_contract,
+            amount=unpack_deposit_amount(pb_deposit.amount, pb_deposit.decimal),
+            decimal=pb_deposit.decimal,
+            time=pb_deposit.time,
+            user_id=pb_deposit.user_id,
+            vout=pb_deposit.vout,
+        )
+        for pb_deposit in pb_deposits
+    ]
+
+
 class StateManager:
     """Manages the overall state of the Zex exchange."""
 
     def __init__(self):
         self.chain_states: dict[str, ChainState] = {}
-        self.assets: dict[str, dict[bytes, Decimal]] = {
+        self.assets: dict[str, dict[bytes, int]] = {
             settings.zex.usdt_mainnet: {}
-        }  # token -> {public_key -> amount}
-        self.user_deposits: dict[bytes, list[Deposit]] = {}
+        }  # token -> {public_key -> amount in balance units}
+        # public_key -> deposits, history of loaded users is built when read
+        self.user_deposits: LazyDict = LazyDict(deposits_from_protobuf)
         self.markets: dict[str, Market] = {}
+        # public_key -> the user's transfers by time, see app.transfers
+        self.transfers: dict[bytes, UserTransfers] = {}
+
+    def user_transfers(
+        self, public: bytes, offset: int = 0, limit: int | None = None
+    ) -> list[Deposit | WithdrawTransaction]:
+        """A page of the user's deposits and withdraws, oldest first."""
+        transfers = self.transfers.get(public)
+        if transfers is None:
+            transfers = self.transfers[public] = self._index_transfers(public)
+        deposits = self.user_deposits.get(public, [])
+        return [
+            deposits[position]
+            if chain is None
+            else self.chain_states[chain].withdraws[position]
+            for chain, position in transfers.page(offset, limit)
+        ]
+
+    def _index_transfers(self, public: bytes) -> UserTransfers:
+        entries = [
+            (deposit.time, None, position)
+            for position, deposit in enumerate(self.user_deposits.get(public, []))
+        ]
+        for chain, chain_state in self.chain_states.items():
+            withdraws = chain_state.withdraws
+            entries.extend(
+                (withdraws[position].time, chain, position)
+                for position in chain_state.user_withdraws.get(public, ())
+            )
+        # stable, deposits stay before withdraws at the same time
+        entries.sort(key=lambda entry: entry[0])
+        transfers = UserTransfers()
+        for entry in entries:
+            transfers.add(*entry)
+        return transfers
+
+    def record_transfer(
+        self, public: bytes, time: int, chain: str | None, position: int
+    ):
+        """Index a new transfer of a user whose transfers were queried."""
+        transfers = self.transfers.get(public)
+        if transfers is not None:
+            transfers.add(time, chain, position)
 
     def ensure_chain_initialized(self, chain: str) -> ChainState:
         """Ensures a chain's state is initialized."""
@@ -65,7 +160,7 @@ class StateManager:
         if token not in self.assets:
             self.assets[token] = {}
         if public not in self.assets[token]:
-            self.assets[token][public] = Decimal("0")
+            self.assets[token][public] = 0
 
     def ensure_market_initialized(
         self, token_name: str, quote_token: str, zex_instance
@@ -77,146 +172,142 @@ class StateManager:
         pair = f"{token_name}-{quote_token}"
         if pair not in self.markets:
             self.markets[pair] = Market(token_name, quote_token, zex_instance)
+            zex_instance.changes.markets.add(pair)
         return self.markets[pair]
 
-    def to_protobuf(self, pb_state: zex_pb2.ZexState):
-        """Serialize state manager to protobuf."""
-        # Serialize chain states
-        for chain, chain_state in self.chain_states.items():
-            chain_state.to_protobuf(chain, pb_state)
+    def to_protobuf(
+        self,
+        pb_state: zex_pb2.State,
+        users: Table,
+        changes: StateChanges | None = None,
+    ):
+        """Serialize state manager to protobuf, only `changes` for a delta."""
+        changed_users = None if changes is None else changes.users
 
-        # Serialize user deposits
-        for public, deposits in self.user_deposits.items():
+        # Serialize chain states
+        chains = None if changes is None else changes.chains
+        for chain, chain_state in select(self.chain_states, chains):
+            chain_state.to_protobuf(chain, pb_state.chains[chain], users, changes)
+
+        # Serialize user deposits, a user's history that was never read is
+        # written as it was loaded
+        for public in self.user_deposits if changed_users is None else changed_users:
+            if public not in self.user_deposits:
+                continue
             entry = pb_state.user_deposits.add()
-            entry.public_key = public
-            for deposit in deposits:
-                pb_deposit = entry.deposits.add()
-                pb_deposit.tx_hash = deposit.tx_hash
-                pb_deposit.chain = deposit.chain
-                pb_deposit.token_contract = deposit.token_contract
-                pb_deposit.amount = str(deposit.amount)
-                pb_deposit.decimal = deposit.decimal
-                pb_deposit.time = deposit.time
-                pb_deposit.user_id = deposit.user_id
-                pb_deposit.vout = deposit.vout
-
-        # Serialize assets (balances)
+            entry.user = users.index(public)
+            saved = self.user_deposits.saved(public)
+            if saved is not None:
+                entry.deposits.extend(saved)
+                continue
+            for deposit in self.user_deposits[public]:
+                entry.deposits.add(
+                    tx_hash=deposit.tx_hash,
+                    chain=deposit.chain,
+                    token_contract=deposit.token_contract,
+                    amount=pack_deposit_amount(deposit.amount, deposit.decimal),
+                    decimal=deposit.decimal,
+                    time=deposit.time,
+                    user_id=deposit.user_id,
+                    vout=deposit.vout,
+                )
+
+        # Serialize assets (balances), every token is written so that markets
+        # of a delta find their tokens
         for token, balances in self.assets.items():
-            pb_balance = pb_state.balances[token]
-            for public, amount in balances.items():
-                entry = pb_balance.balances.add()
-                entry.public_key = public
-                entry.amount = str(amount)
-
-        # Serialize markets
-        for pair, market in self.markets.items():
+            pb_balances = pb_state.balances[token]
+            entries = list(select(balances, changed_users))
+            pb_balances.users.extend([users.index(public) for public, _ in entries])
+            pb_balances.amounts = pack_balances(amount for _, amount in entries)
+
+        # Serialize markets, the levels of the books are rebuilt from the
+        # orders when loading
+        pairs = None if changes is None else changes.markets
+        for pair, market in select(self.markets, pairs):
             pb_market = pb_state.markets[pair]
             pb_market.base_token = market.base_token
             pb_market.quote_token = market.quote_token
 
-            # Serialize order books
-            for order in market.buy_orders:
-                pb_order = pb_market.buy_orders.add()
-                pb_order.price = str(-order[0])  # Negate price for buy orders
-                pb_order.tx = order[1]
-            for order in market.sell_orders:
-                pb_order = pb_market.sell_orders.add()
-                pb_order.price = str(order[0])
-                pb_order.tx = order[1]
-
-            # Serialize order book state
-            for price, amount in market.bids_order_book.items():
-                entry = pb_market.bids_order_book.add()
-                entry.price = str(price)
-                entry.amount = str(amount)
-            for price, amount in market.asks_order_book.items():
-                entry = pb_market.asks_order_book.add()
-                entry.price = str(price)
-                entry.amount = str(amount)
+            # best level first and in time priority
+            for book_side, pb_orders, pb_remaining in (
+                (market.buy_orders, pb_market.buy_orders, pb_market.buy_remaining),
+                (market.sell_orders, pb_market.sell_orders, pb_market.sell_remaining),
+            ):
+                orders = list(book_side.iter_orders())
+                pb_orders.extend([order.tx for order in orders])
+                pb_remaining.extend([order.remaining for order in orders])
 
             pb_market.first_id = market.first_id
             pb_market.final_id = market.final_id
             pb_market.last_update_id = market.last_update_id
+            market.kline_manager.to_protobuf(pb_market.klines)
 
-            # Serialize kline data
-            buffer = BytesIO()
-            market.kline_manager.kline.to_pickle(buffer)
-            pb_market.kline = buffer.getvalue()
-
-    @classmethod
-    def from_protobuf(cls, pb_state: zex_pb2.ZexState, zex_instance: "Zex"):
-        """Deserialize state manager from protobuf and sets self as Zex's state manager"""
-        state_manager = cls()
-        zex_instance.state_manager = state_manager
-
-        # Deserialize chain states
-        for chain in pb_state.deposits.keys():
-            state_manager.chain_states[chain] = ChainState.from_protobuf(
-                chain, pb_state
+    def merge_protobuf(
+        self, pb_state: zex_pb2.State, users: list[bytes], zex_instance: "Zex"
+    ):
+        """
+        Load a saved state into the state manager, or apply a delta to it.
+
+        Markets in `pb_state` replace the loaded ones, balances and deposits
+        of its users replace theirs, and chain histories are appended to.
+        """
+        # Deserialize assets (balances), before the markets that refer to them
+        for token, pb_balances in pb_state.balances.items():
+            self.assets.setdefault(token, {}).update(
+                zip(
+                    [users[user] for user in pb_balances.users],
+                    unpack_balances(pb_balances.amounts),
+                    strict=True,
+                )
             )
 
-        # Deserialize user deposits
-        state_manager.user_deposits = {
-            e.public_key: [
-                Deposit(
-                    tx_hash=pb_deposit.tx_hash,
-                    chain=pb_deposit.chain,
-                    token_contract=pb_deposit.token_contract,
-                    amount=Decimal(pb_deposit.amount),
-                    decimal=pb_deposit.decimal,
-                    time=pb_deposit.time,
-                    user_id=pb_deposit.user_id,
-                    vout=pb_deposit.vout,
-                )
-                for pb_deposit in e.deposits
-            ]
-            for e in pb_state.user_deposits
-        }
+        # Deserialize chain states
+        for chain, pb_chain in pb_state.chains.items():
+            self.ensure_chain_initialized(chain).merge_protobuf(pb_chain, users)
 
-        # Deserialize assets (balances)
-        state_manager.assets = {
-            token: {e.public_key: Decimal(e.amount) for e in pb_balance.balances}
-            for token, pb_balance in pb_state.balances.items()
-        }
+        # Deserialize user deposits, when first read
+        for entry in pb_state.user_deposits:
+            self.user_deposits.set_saved(users[entry.user], entry.deposits)
 
+        public_to_id = zex_instance.public_to_id_lookup
         for pair, pb_market in pb_state.markets.items():
             market = Market(pb_market.base_token, pb_market.quote_token, zex_instance)
-            market.buy_orders = [
-                (-Decimal(o.price), o.tx) for o in pb_market.buy_orders
-            ]
-            market.sell_orders = [
-                (Decimal(o.price), o.tx) for o in pb_market.sell_orders
-            ]
-
-            market.bids_order_book = {
-                Decimal(e.price): Decimal(e.amount) for e in pb_market.bids_order_book
-            }
-            market.asks_order_book = {
-                Decimal(e.price): Decimal(e.amount) for e in pb_market.asks_order_book
-            }
+            for book_side, pb_orders, pb_remaining in (
+                (market.buy_orders, pb_market.buy_orders, pb_market.buy_remaining),
+                (market.sell_orders, pb_market.sell_orders, pb_market.sell_remaining),
+            ):
+                for tx, remaining in zip(pb_orders, pb_remaining, strict=True):
+                    order = Order.from_tx(tx, market.tick, market.lot)
+                    order.remaining = remaining
+                    order.user_id = public_to_id.get(order.public, 0)
+                    book_side.add(order)
+                    market.order_index[(order.public, order.nonce)] = order
 
             market.first_id = pb_market.first_id
             market.final_id = pb_market.final_id
             market.last_update_id = pb_market.last_update_id
-            market.kline_manager.kline = pd.read_pickle(BytesIO(pb_market.kline))
-            state_manager.markets[pair] = market
+            market.kline_manager.load_protobuf(pb_market.klines)
+            market.publish_depth(full=True)
+            market.update_book_ticker()
+            self.markets[pair] = market
 
-        # Update chain balances from assets
-        for token, balances in state_manager.assets.items():
+    def update_chain_balances(self):
+        """Set the balances of the chains to the assets of their tokens."""
+        for token, balances in self.assets.items():
             if ":" in token:  # Non-verified token
                 chain, contract = token.split(":")
-                if chain in state_manager.chain_states:
-                    state_manager.chain_states[chain].balances[contract] = sum(
-                        balances.values()
+                if chain in self.chain_states:
+                    self.chain_states[chain].balances[contract] = from_units(
+                        sum(balances.values())
                     )
             else:  # Verified token
                 for chain, token_info in settings.zex.verified_tokens.get(
                     token, {}
                 ).items():
-                    if chain in state_manager.chain_states:
-                        state_manager.chain_states[chain].balances[
+                    if chain in self.chain_states:
+                        self.chain_states[chain].balances[
                             token_info.contract_address
-                        ] = sum(balances.values())
+                        ] = from_units(sum(balances.values()))
 
 
 class Zex(metaclass=SingletonMeta):
@@ -256,6 +347,7 @@ class Zex(metaclass=SingletonMeta):
         order_callback: Callable[..., None],
         deposit_callback: Callable[[UserPublic, Chain, str, Decimal], None],
         withdraw_callback: Callable[[UserPublic, Chain, str, Decimal], None],
+        book_ticker_callback: Callable[[str, dict], None],
         state_dest: str,
         light_node: bool = False,
         benchmark_mode=False,
@@ -270,6 +362,7 @@ class Zex(metaclass=SingletonMeta):
             order_callback,
             deposit_callback,
             withdraw_callback,
+            book_ticker_callback,
         )
         self._initialize_state(state_dest, light_node, benchmark_mode)
         self._initialize_test_mode_if_enabled()
@@ -286,6 +379,7 @@ class Zex(metaclass=SingletonMeta):
         order_callback,
         deposit_callback,
         withdraw_callback,
+        book_ticker_callback,
     ):
         """Initialize callback functions."""
         self.kline_callback = kline_callback
@@ -293,6 +387,7 @@ class Zex(metaclass=SingletonMeta):
         self.order_callback = order_callback
         self.deposit_callback = deposit_callback
         self.withdraw_callback = withdraw_callback
+        self.book_ticker_callback = book_ticker_callback
 
     def _initialize_state(self, state_dest, light_node, benchmark_mode):
         """Initialize the exchange state."""
@@ -303,13 +398,46 @@ class Zex(metaclass=SingletonMeta):
         self.save_frequency = settings.zex.state_save_frequency
 
         self.benchmark_mode = benchmark_mode
+        # set while applying history that was already published, nothing is
+        # sent to clients meanwhile
+        self.catching_up = False
 
         self.last_tx_index = 0
         self.saved_state_index = 0
+        # pid of the child process writing a snapshot, see save_state_in_background
+        self._state_saver_pid: int | None = None
+        # last_tx_index of the snapshot that child is writing
+        self._state_saver_index = 0
+        # every Nth snapshot is a full checkpoint, the others are deltas
+        self.checkpoint_frequency = settings.zex.state_checkpoint_frequency
+        self.state_compression = settings.zex.state_compression
+        check_compression(self.state_compression)
+        # last_tx_index of the checkpoint deltas are written against, None
+        # until a checkpoint is written by this process
+        self._checkpoint_index: int | None = None
+        self._deltas_written = 0
+        self.changes = StateChanges()
+        # users changed by the batch being processed, rehashed into the
+        # digest at its end, see app.state_digest
+        self.batch_users: set[bytes] = set()
+        self.digest = StateDigest()
+        self.journal = (
+            BatchJournal(
+                settings.zex.journal_dir,
+                settings.zex.journal_sync_interval,
+                settings.zex.journal_segment_size,
+            )
+            if settings.zex.journal_dir
+            else None
+        )
         self.save_state_tx_index_threshold = self.save_frequency
-        self.amounts: dict[UserPublic, Decimal] = {}
+        self.amounts: dict[bytes, Order] = {}
         self.trades: dict[UserPublic, deque] = {}
-        self.orders: dict[UserPublic, dict[bytes, Literal[True]]] = {}
+        self.orders: dict[UserPublic, dict[bytes, Order]] = {}
+        # order events of the batch being processed, dispatched at its end
+        self.order_events: list[OrderEvent] = []
+        # matches orders in worker processes when set, see app.sharding
+        self.shards: ShardedMatcher | None = None
         self.public_to_id_lookup: dict[UserPublic, int] = {}
         self.id_to_public_lookup: dict[int, UserPublic] = {}
 
@@ -415,109 +543,102 @@ class Zex(metaclass=SingletonMeta):
                                 deposit.token_name, settings.zex.usdt_mainnet, self
                             )
 
-    def to_protobuf(self) -> zex_pb2.ZexState:
-        state = zex_pb2.ZexState()
+    def to_protobuf(self, changes: StateChanges | None = None) -> zex_pb2.State:
+        """
+        Serialize the state to protobuf.
+
+        With `changes` only what they record is serialized, as a delta to
+        apply with `merge_protobuf`.
+        """
+        state = zex_pb2.State()
         state.last_tx_index = self.last_tx_index
+        changed_users = None if changes is None else changes.users
+        users = Table(state.users)
 
-        # Serialize state manager
-        self.state_manager.to_protobuf(state)
+        self._serialize_nonces(state, users, changed_users)
 
-        self._serialize_amounts(state)
-        self._serialize_trades(state)
-        self._serialize_orders(state)
-        self._serialize_nonces(state)
-        self._serialize_user_lookups(state)
+        # Serialize state manager
+        self.state_manager.to_protobuf(state, users, changes)
 
-        # Serialize user lookups
-        for public, user_id in self.public_to_id_lookup.items():
-            entry = state.public_to_id_lookup.add()
-            entry.public_key = public
-            entry.user_id = user_id
-        state.id_to_public_lookup.update(self.id_to_public_lookup)
+        self._serialize_trades(state, users, changed_users)
+        self._serialize_user_lookups(state, users, changed_users)
 
         return state
 
-    def _serialize_amounts(self, state: zex_pb2.ZexState):
-        """Serialize transaction amounts to protobuf."""
-        for tx, amount in self.amounts.items():
-            entry = state.amounts.add()
-            entry.tx = tx
-            entry.amount = str(amount)
+    def _serialize_nonces(
+        self, state: zex_pb2.State, users: Table, changed_users: set[bytes] | None
+    ):
+        """Serialize user nonces to protobuf."""
+        for public, nonce in select(self.nonces, changed_users):
+            state.accounts.append(users.index(public))
+            state.nonces.append(nonce)
 
-    def _serialize_trades(self, state: zex_pb2.ZexState):
+    def _serialize_trades(
+        self, state: zex_pb2.State, users: Table, changed_users: set[bytes] | None
+    ):
         """Serialize user trades to protobuf."""
-        for public, trades in self.trades.items():
+        pairs = Table(state.pairs)
+        for public, trades in select(self.trades, changed_users):
             entry = state.trades.add()
-            entry.public_key = public
-            for trade in trades:
-                pb_trade = entry.trades.add()
-                (
-                    pb_trade.t,
-                    pb_trade.amount,
-                    pb_trade.pair,
-                    pb_trade.order_type,
-                    pb_trade.order,
-                ) = trade[0], str(trade[1]), trade[2], trade[3], trade[4]
-
-    def _serialize_orders(self, state: zex_pb2.ZexState):
-        """Serialize user orders to protobuf."""
-        for public, orders in self.orders.items():
-            entry = state.orders.add()
-            entry.public_key = public
-            entry.orders.extend(orders.keys())
-
-    def _serialize_nonces(self, state: zex_pb2.ZexState):
-        """Serialize user nonces to protobuf."""
-        for public, nonce in self.nonces.items():
-            entry = state.nonces.add()
-            entry.public_key = public
-            entry.nonce = nonce
-
-    def _serialize_user_lookups(self, state: zex_pb2.ZexState):
-        """Serialize user ID lookups to protobuf."""
-        for public, user_id in self.public_to_id_lookup.items():
-            entry = state.public_to_id_lookup.add()
-            entry.public_key = public
-            entry.user_id = user_id
-        state.id_to_public_lookup.update(self.id_to_public_lookup)
+            entry.user = users.index(public)
+            if not trades:
+                continue
+            t, amounts, trade_pairs, order_types, orders = zip(*trades, strict=True)
+            entry.t.extend(t)
+            entry.amounts.extend(amounts)
+            entry.pairs.extend([pairs.index(pair) for pair in trade_pairs])
+            entry.order_types.extend(order_types)
+            entry.orders.extend(orders)
+
+    def _serialize_user_lookups(
+        self, state: zex_pb2.State, users: Table, changed_users: set[bytes] | None
+    ):
+        """Serialize user IDs to protobuf, one per user of the state."""
+        for public in (
+            self.public_to_id_lookup if changed_users is None else changed_users
+        ):
+            users.index(public)
+        state.user_ids.extend(
+            [self.public_to_id_lookup.get(public, 0) for public in state.users]
+        )
 
     @classmethod
     def from_protobuf(
         cls,
-        pb_state: zex_pb2.ZexState,
+        pb_state: zex_pb2.State,
         kline_callback: Callable[[str, pd.DataFrame], None],
         depth_callback: Callable[[str, dict], None],
         order_callback: Callable,
         deposit_callback: Callable,
         withdraw_callback: Callable,
+        book_ticker_callback: Callable,
         state_dest: str,
         light_node: bool,
+        deltas: Iterable[zex_pb2.State] = (),
     ):
+        """Load a full state and the deltas saved after it, in order."""
         zex = cls(
             kline_callback,
             depth_callback,
             order_callback,
             deposit_callback,
             withdraw_callback,
+            book_ticker_callback,
             state_dest,
             light_node,
         )
-        zex.last_tx_index = pb_state.last_tx_index
+        zex.state_manager = StateManager()
+        zex.trades = {}
+        zex.nonces = {}
+        zex.public_to_id_lookup = {}
+        zex.id_to_public_lookup = {}
 
-        StateManager.from_protobuf(pb_state, zex)
+        for state in (pb_state, *deltas):
+            zex.merge_protobuf(state)
 
-        # Deserialize state components
-        zex._deserialize_amounts(pb_state)
-        zex._deserialize_trades(pb_state)
-        zex._deserialize_orders(pb_state)
-        zex._deserialize_nonces(pb_state)
-        zex._deserialize_user_lookups(pb_state)
-
-        # Deserialize user lookups
-        zex.public_to_id_lookup = {
-            entry.public_key: entry.user_id for entry in pb_state.public_to_id_lookup
-        }
-        zex.id_to_public_lookup = dict(pb_state.id_to_public_lookup)
+        zex._deserialize_orders()
+        zex.state_manager.update_chain_balances()
+        zex.rebuild_digest()
 
         # Set last user ID
         zex.last_user_id = (
@@ -526,47 +647,174 @@ class Zex(metaclass=SingletonMeta):
 
         return zex
 
-    def _deserialize_amounts(self, pb_state: zex_pb2.ZexState):
-        """Deserialize transaction amounts from protobuf."""
-        self.amounts = {e.tx: Decimal(e.amount) for e in pb_state.amounts}
+    def merge_protobuf(self, pb_state: zex_pb2.State):
+        """Load a saved state, or apply a delta to the loaded one."""
+        self.last_tx_index = pb_state.last_tx_index
+        users = list(pb_state.users)
+
+        # user IDs first, resting orders of the markets refer to them
+        self._deserialize_user_lookups(pb_state, users)
+        self._deserialize_nonces(pb_state, users)
+        self.state_manager.merge_protobuf(pb_state, users, self)
+        self._deserialize_trades(pb_state, users)
 
-    def _deserialize_trades(self, pb_state: zex_pb2.ZexState):
+    def _deserialize_user_lookups(self, pb_state: zex_pb2.State, users: list[bytes]):
+        """Deserialize user ID lookups from protobuf."""
+        for public, user_id in zip(users, pb_state.user_ids, strict=True):
+            if user_id:
+                self.public_to_id_lookup[public] = user_id
+                self.id_to_public_lookup[user_id] = public
+
+    def _deserialize_nonces(self, pb_state: zex_pb2.State, users: list[bytes]):
+        """Deserialize user nonces from protobuf."""
+        for user, nonce in zip(pb_state.accounts, pb_state.nonces, strict=True):
+            self.nonces[users[user]] = nonce
+
+    def _deserialize_trades(self, pb_state: zex_pb2.State, users: list[bytes]):
         """Deserialize user trades from protobuf."""
-        self.trades = {
-            e.public_key: deque(
-                (
-                    trade.t,
-                    Decimal(trade.amount),
-                    trade.pair,
-                    trade.order_type,
-                    trade.order,
+        pairs = list(pb_state.pairs)
+        for e in pb_state.trades:
+            self.trades[users[e.user]] = deque(
+                zip(
+                    e.t,
+                    e.amounts,
+                    [pairs[pair] for pair in e.pairs],
+                    e.order_types,
+                    e.orders,
+                    strict=True,
                 )
-                for trade in e.trades
             )
-            for e in pb_state.trades
-        }
 
-    def _deserialize_orders(self, pb_state: zex_pb2.ZexState):
-        """Deserialize user orders from protobuf."""
-        self.orders = {
-            e.public_key: {order: True for order in e.orders} for e in pb_state.orders
+    def _deserialize_orders(self):
+        """Rebuild open orders, by tx and by user, from the restored order books."""
+        self.amounts = {
+            order.tx: order
+            for market in self.state_manager.markets.values()
+            for book_side in (market.buy_orders, market.sell_orders)
+            for order in book_side.iter_orders()
         }
+        # a user's orders are kept in the order they were placed
+        self.orders = {public: {} for public in self.nonces}
+        for order in sorted(self.amounts.values(), key=lambda order: order.nonce):
+            self.orders.setdefault(order.public, {})[order.tx] = order
 
-    def _deserialize_nonces(self, pb_state: zex_pb2.ZexState):
-        """Deserialize user nonces from protobuf."""
-        self.nonces = {e.public_key: e.nonce for e in pb_state.nonces}
+    def save_state(self):
+        """Write a full checkpoint and drop the deltas of older checkpoints."""
+        self._write_snapshot(self.state_dest, self.to_protobuf())
+        remove_deltas(self.state_dest)
+
+    def save_state_delta(self, changes: StateChanges, dest: str):
+        """Write what `changes` records, see app.state_delta."""
+        self._write_snapshot(dest, self.to_protobuf(changes))
+
+    def _write_snapshot(self, dest, state: zex_pb2.State):
+        # write aside and rename, so the previous snapshot stays whole until then
+        tmp_dest = f"{dest}.tmp"
+        with open(tmp_dest, "wb") as f:
+            f.write(encode_state(state, self.state_compression))
+            # the journal is cut once the snapshot is written, it has to last
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_dest, dest)
+
+    def _next_snapshot(self) -> Callable[[], None]:
+        """Pick the snapshot due, a delta or a checkpoint, and reset the changes."""
+        changes, self.changes = self.changes, StateChanges()
+        if (
+            self._checkpoint_index is None
+            or self._deltas_written + 1 >= self.checkpoint_frequency
+        ):
+            self._checkpoint_index = self.last_tx_index
+            self._deltas_written = 0
+            return self.save_state
+        self._deltas_written += 1
+        dest = delta_path(self.state_dest, self._checkpoint_index, self._deltas_written)
+        return lambda: self.save_state_delta(changes, dest)
+
+    def save_state_in_background(self) -> bool:
+        """
+        Save the state from a forked child process.
+
+        The child serializes its copy-on-write image of the state, so
+        matching continues while the snapshot is written. Every
+        `checkpoint_frequency` saves the whole state is written, the saves in
+        between only write what changed since the previous one. Returns
+        False, without saving, while the previous snapshot is still being
+        written.
+        """
+        if not self._reap_state_saver(block=False):
+            return False
+        save = self._next_snapshot()
+        saved_index = self.last_tx_index
+        if not hasattr(os, "fork"):
+            save()
+            self._discard_journal(saved_index)
+            return True
 
-    def _deserialize_user_lookups(self, pb_state: zex_pb2.ZexState):
-        """Deserialize user ID lookups from protobuf."""
-        self.public_to_id_lookup = {
-            entry.public_key: entry.user_id for entry in pb_state.public_to_id_lookup
-        }
-        self.id_to_public_lookup = dict(pb_state.id_to_public_lookup)
+        with warnings.catch_warnings():
+            # the child only serializes the state and exits, it never touches
+            # locks other threads might have held while forking
+            warnings.simplefilter("ignore", DeprecationWarning)
+            pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                save()
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+        self._state_saver_pid = pid
+        self._state_saver_index = saved_index
+        return True
 
-    def save_state(self):
-        state = self.to_protobuf()
-        with open(self.state_dest, "wb") as f:
-            f.write(state.SerializeToString())
+    def finish_state_save(self):
+        """Wait for the snapshot being written in the background, if any."""
+        self._reap_state_saver(block=True)
+
+    def _reap_state_saver(self, block: bool) -> bool:
+        if self._state_saver_pid is None:
+            return True
+        pid, status = os.waitpid(self._state_saver_pid, 0 if block else os.WNOHANG)
+        if pid == 0:
+            return False
+        self._state_saver_pid = None
+        exit_code = os.waitstatus_to_exitcode(status)
+        if exit_code != 0:
+            logger.error("saving state failed", exit_code=exit_code)
+            # the changes written by the failed save are gone, so the next
+            # save starts a new checkpoint
+            self._checkpoint_index = None
+        else:
+            self._discard_journal(self._state_saver_index)
+        return True
+
+    def _discard_journal(self, saved_index: int):
+        """Drop the journaled batches a saved state already has."""
+        if self.journal is not None:
+            self.journal.discard_through(saved_index)
+
+    def replay_journal(self) -> int:
+        """
+        Apply the journaled batches after the loaded state, before pulling
+        new ones from the sequencer. Returns how many were applied.
+        """
+        if self.journal is None:
+            return 0
+        replayed = 0
+        self.catching_up = True
+        try:
+            for index, txs in self.journal.batches(after=self.last_tx_index):
+                if index != self.last_tx_index + 1:
+                    logger.warning(
+                        "journal has no batch after {last_tx_index}, replay stopped",
+                        last_tx_index=self.last_tx_index,
+                    )
+                    break
+                self.process(txs, index)
+                replayed += 1
+        finally:
+            self.catching_up = False
+        return replayed
 
     @classmethod
     def load_state(
@@ -577,11 +825,19 @@ class Zex(metaclass=SingletonMeta):
         order_callback: Callable,
         deposit_callback: Callable,
         withdraw_callback: Callable,
+        book_ticker_callback: Callable,
         state_dest: str,
         light_node: bool,
     ):
-        pb_state = zex_pb2.ZexState()
-        pb_state.ParseFromString(data.read())
+        with open_state(data) as saved:
+            pb_state = decode_state(saved)
+        deltas = list(read_deltas(state_dest, pb_state.last_tx_index))
+        if deltas:
+            logger.info(
+                "applying {deltas} state deltas up to tx {last_tx_index}",
+                deltas=len(deltas),
+                last_tx_index=deltas[-1].last_tx_index,
+            )
         return cls.from_protobuf(
             pb_state,
             kline_callback,
@@ -589,74 +845,182 @@ class Zex(metaclass=SingletonMeta):
             order_callback,
             deposit_callback,
             withdraw_callback,
+            book_ticker_callback,
             state_dest,
             light_node,
+            deltas,
         )
 
-    def process(self, txs: list[bytes], last_tx_index):
+    def process(self, txs: list[bytes | DecodedTx | None], last_tx_index):
+        """
+        Apply a batch of transactions.
+
+        Transactions usually arrive already decoded by the verifier, raw
+        transactions are decoded here.
+        """
+        if self.journal is not None:
+            self.journal.append(
+                last_tx_index,
+                [tx if type(tx) is bytes else tx.tx for tx in txs if tx],
+            )
         modified_pairs: set[str] = set()
+        markets = self.state_manager.markets
         for tx in txs:
             if not tx:
                 continue
-            v, name = tx[0:2]
-            if v != 1:
-                logger.error("invalid version", version=v)
-                continue
+            if type(tx) is bytes:
+                tx = decode_tx(tx)
+                if tx is None:
+                    continue
+            name = tx.name
 
             if name == DEPOSIT or name == BTC_DEPOSIT:
-                tx = DepositTransaction.from_tx(tx)
-                self.deposit(tx)
+                self.deposit(tx.payload)
             elif name == WITHDRAW:
-                tx = WithdrawTransaction.from_tx(tx)
-                self.withdraw(tx)
+                self.withdraw(tx.payload)
             elif name in (BUY, SELL):
-                base_token, quote_token, pair = self._get_tx_pair(tx)
-
-                market = self.state_manager.ensure_market_initialized(
-                    base_token, quote_token, self
-                )
+                pair = tx.pair
+                market = markets.get(pair)
+                if market is None:
+                    market = self.state_manager.ensure_market_initialized(
+                        tx.base_token, tx.quote_token, self
+                    )
                 t = int(unix_time())
                 # fast route check for instant match
                 logger.debug(
                     "executing tx base: {base_token}, quote: {quote_token}",
-                    base_token=base_token,
-                    quote_token=quote_token,
+                    base_token=tx.base_token,
+                    quote_token=tx.quote_token,
                 )
 
-                _, _, _, nonce, public = _parse_transaction(tx)
-                if not self.validate_nonce(public, nonce):
+                order = tx.payload
+                if not self.validate_nonce(order.public, order.nonce):
                     continue
+                order.user_id = self.public_to_id_lookup.get(order.public, 0)
 
-                if market.match_instantly(tx, t):
+                if self.shards is not None:
+                    self.shards.submit_order(market, order, t)
+                    continue
+                if market.match_instantly(order, t):
                     modified_pairs.add(pair)
                     continue
-                ok = market.place(tx)
+                ok = market.place(order)
                 if not ok:
                     continue
 
                 modified_pairs.add(pair)
 
             elif name == CANCEL:
-                base_token, quote_token, pair = self._get_tx_pair(tx[1:])
-                success = self.state_manager.markets[pair].cancel(tx)
+                pair = tx.pair
+                if self.shards is not None:
+                    self.shards.submit_cancel(markets[pair], tx.tx)
+                    continue
+                success = markets[pair].cancel(tx.tx)
                 if success:
                     modified_pairs.add(pair)
             elif name == REGISTER:
-                self.register_pub(public=tx[2:35])
+                self.register_pub(public=tx.payload)
             else:
                 raise ValueError(f"invalid transaction name {name}")
+        if self.shards is not None:
+            modified_pairs.update(self.shards.execute())
         for pair in modified_pairs:
-            if self.benchmark_mode:
-                break
+            self.state_manager.markets[pair].publish_depth()
+        self.changes.markets.update(modified_pairs)
+        self._flush_order_events()
+        for pair in modified_pairs:
+            if self.benchmark_mode or self.catching_up:
+                # the depth updates of the batch are not sent, drop them
+                self.state_manager.markets[pair].get_order_book_update()
+                continue
             asyncio.create_task(self.kline_callback(pair, self.get_kline(pair)))
             asyncio.create_task(
                 self.depth_callback(pair, self.get_order_book_update(pair))
             )
+            asyncio.create_task(
+                self.book_ticker_callback(pair, self.get_book_ticker(pair))
+            )
         self.last_tx_index = last_tx_index
+        self._update_digest(self.batch_users)
+        self.batch_users.clear()
+        self.digest.record(last_tx_index)
 
         if self.saved_state_index + self.save_frequency < self.last_tx_index:
-            self.saved_state_index = self.last_tx_index
-            self.save_state()
+            # retried after the next batch while the previous snapshot is written
+            if self.save_state_in_background():
+                self.saved_state_index = self.last_tx_index
+
+    def _user_changed(self, public: bytes):
+        self.changes.users.add(public)
+        self.batch_users.add(public)
+
+    def _update_digest(self, users: Iterable[bytes]):
+        """Rehash `users` and the chains into the state digest."""
+        assets = sorted(self.state_manager.assets.items())
+        chains = sorted(self.state_manager.chain_states.items())
+        for public in users:
+            self.digest.update(
+                public,
+                user_data(public, self.nonces, assets, chains),
+            )
+        self.digest.update(CHAINS_KEY, chains_data(chains))
+
+    def rebuild_digest(self):
+        """Compute the state digest from the whole state, as after loading it."""
+        users = {*self.nonces, *self.orders}
+        for balances in self.state_manager.assets.values():
+            users.update(balances)
+        for chain_state in self.state_manager.chain_states.values():
+            users.update(chain_state.user_withdraw_nonces)
+        self.digest.reset()
+        self.batch_users.clear()
+        self._update_digest(users)
+        for order in self.amounts.values():
+            self.digest.add_order(order)
+        self.digest.record(self.last_tx_index)
+
+    def _flush_order_events(self):
+        """Dispatch the order events of the batch, grouped by user, in one task."""
+        if not self.order_events:
+            return
+        events, self.order_events = self.order_events, []
+        if self.catching_up:
+            for event in events:
+                self._user_changed(event.public)
+            return
+        transaction_time = int(unix_time() * 1000)
+        markets = self.state_manager.markets
+        user_events: dict[str, list[dict]] = {}
+        for event in events:
+            # makers' orders, balances and trades change with the taker's
+            self._user_changed(event.public)
+            market = markets[event.pair]
+            tick, lot = market.tick, market.lot
+            public = event.public.hex()
+            if public not in user_events:
+                user_events[public] = []
+            user_events[public].append(
+                {
+                    "nonce": event.nonce,
+                    "symbol": event.pair,
+                    "side": event.side,
+                    "amount": lot.to_decimal(event.amount),
+                    "price": tick.to_decimal(event.price),
+                    "execution_type": event.execution_type,
+                    "order_status": event.order_status,
+                    "last_filled": lot.to_decimal(event.last_filled),
+                    "cumulative_filled": lot.to_decimal(event.cumulative_filled),
+                    "last_executed_price": tick.to_decimal(event.last_executed_price),
+                    "transaction_time": transaction_time,
+                    "is_on_orderbook": event.is_on_orderbook,
+                    "is_maker": event.is_maker,
+                    "cumulative_quote_asset_quantity": Decimal(0),  # TODO
+                    "last_quote_asset_quantity": Decimal(0),  # TODO
+                    "quote_order_quantity": Decimal(0),  # TODO
+                    "reject_reason": event.reject_reason,
+                }
+            )
+        asyncio.create_task(self.order_callback(user_events))
 
     def validate_deposit(self, deposit: Deposit) -> bool:
         """Validates a deposit transaction."""
@@ -668,6 +1032,13 @@ class Zex(metaclass=SingletonMeta):
             )
             return False
 
+        if deposit.decimal > BALANCE_DECIMALS:
+            logger.critical(
+                f"unsupported decimal: {deposit.decimal}, tx_hash: {deposit.tx_hash}, "
+                f"vout: {deposit.vout}, token_contract: {deposit.token_contract}"
+            )
+            return False
+
         chain_state = self.state_manager.ensure_chain_initialized(deposit.chain)
         if (deposit.tx_hash, deposit.vout) in chain_state.deposits:
             logger.error(
@@ -698,18 +1069,28 @@ class Zex(metaclass=SingletonMeta):
 
         # Record deposit
         chain_state.deposits.add((deposit.tx_hash, deposit.vout))
+        self.changes.deposits.setdefault(deposit.chain, []).append(
+            (deposit.tx_hash, deposit.vout)
+        )
+        self._user_changed(public)
         if public not in self.state_manager.user_deposits:
             self.state_manager.user_deposits[public] = []
-        self.state_manager.user_deposits[public].append(deposit)
+        user_deposits = self.state_manager.user_deposits[public]
+        user_deposits.append(deposit)
+        self.state_manager.record_transfer(
+            public, deposit.time, None, len(user_deposits) - 1
+        )
 
         # Update balances
-        self.state_manager.assets[deposit.token_name][public] += deposit.amount
+        self.state_manager.assets[deposit.token_name][public] += to_units(
+            deposit.amount
+        )
         chain_state.balances[deposit.token_contract] += deposit.amount
 
         logger.info(
             f"deposit on chain: {deposit.chain}, token: {deposit.token_name}, "
             f"amount: {deposit.amount} for user: {public}, tx_hash: {deposit.tx_hash}, "
-            f"new balance: {self.state_manager.assets[deposit.token_name][public]}"
+            f"new balance: {from_units(self.state_manager.assets[deposit.token_name][public])}"
         )
 
     # Modified Zex class methods to use the new managers
@@ -736,11 +1117,12 @@ class Zex(metaclass=SingletonMeta):
                 deposit.token_name, settings.zex.usdt_mainnet, self
             )
 
-            asyncio.create_task(
-                self.deposit_callback(
-                    public.hex(), deposit.chain, deposit.token_name, deposit.amount
+            if not self.catching_up:
+                asyncio.create_task(
+                    self.deposit_callback(
+                        public.hex(), deposit.chain, deposit.token_name, deposit.amount
+                    )
                 )
-            )
 
     def is_withdrawable(self, chain, token_name, contract_address, withdraw_amount):
         if token_name not in settings.zex.verified_tokens:
@@ -768,6 +1150,11 @@ class Zex(metaclass=SingletonMeta):
         if tx.amount <= 0:
             logger.debug(f"invalid amount: {tx.amount}")
             return False, None, None
+        try:
+            to_units(tx.amount)
+        except ValueError:
+            logger.debug(f"invalid amount: {tx.amount}")
+            return False, None, None
 
         chain_state = self.state_manager.chain_states.get(tx.chain)
         if not chain_state:
@@ -809,8 +1196,16 @@ class Zex(metaclass=SingletonMeta):
         chain_state = self.state_manager.chain_states[tx.chain]
 
         # Check user balance
-        balance = self.state_manager.assets[token].get(tx.public, Decimal("0"))
-        if balance < tx.amount:
+        balances = self.state_manager.assets[token]
+        balance = balances.get(tx.public, 0)
+        if (
+            balance < to_units(tx.amount)
+            and self.shards is not None
+            and self.shards.flush()
+        ):
+            # orders before it may have credited the user, see app.sharding
+            balance = balances.get(tx.public, 0)
+        if balance < to_units(tx.amount):
             logger.debug("balance not enough")
             return False
 
@@ -822,7 +1217,8 @@ class Zex(metaclass=SingletonMeta):
         if vault_balance < tx.amount:
             logger.error(
                 f"vault balance: {vault_balance}, withdraw amount: {tx.amount}, "
-                f"user balance before deduction: {balance}, vault does not have enough balance"
+                f"user balance before deduction: {from_units(balance)}, "
+                "vault does not have enough balance"
             )
             return False
 
@@ -835,13 +1231,12 @@ class Zex(metaclass=SingletonMeta):
         chain_state = self.state_manager.chain_states[tx.chain]
 
         # Update balances
-        self.state_manager.assets[token][tx.public] -= tx.amount
+        self.state_manager.assets[token][tx.public] -= to_units(tx.amount)
         chain_state.balances[token_contract] -= tx.amount
 
         # Update withdrawal records
-        if tx.public not in chain_state.user_withdraws:
-            chain_state.user_withdraws[tx.public] = []
-        chain_state.user_withdraws[tx.public].append(tx)
+        position = chain_state.add_withdraw(tx)
+        self.state_manager.record_transfer(tx.public, tx.time, tx.chain, position)
 
         # Update nonces
         chain_state.withdraw_nonce += 1
@@ -849,12 +1244,13 @@ class Zex(metaclass=SingletonMeta):
             chain_state.user_withdraw_nonces[tx.public] = 0
         chain_state.user_withdraw_nonces[tx.public] += 1
 
-        chain_state.withdraws.append(tx)
+        self.changes.withdraws.setdefault(tx.chain, []).append(tx)
+        self._user_changed(tx.public)
 
         logger.info(
             f"withdraw on chain: {tx.chain}, token: {tx.token_name}, "
             f"amount: {tx.amount} for user: {tx.public}, "
-            f"new balance: {self.state_manager.assets[tx.token_name][tx.public]}"
+            f"new balance: {from_units(self.state_manager.assets[tx.token_name][tx.public])}"
         )
 
     def withdraw(self, tx: WithdrawTransaction):
@@ -878,9 +1274,12 @@ class Zex(metaclass=SingletonMeta):
         # Process withdrawal
         self.process_withdraw(tx, token, token_contract)
 
-        asyncio.create_task(
-            self.withdraw_callback(tx.public.hex(), tx.chain, tx.token_name, tx.amount)
-        )
+        if not self.catching_up:
+            asyncio.create_task(
+                self.withdraw_callback(
+                    tx.public.hex(), tx.chain, tx.token_name, tx.amount
+                )
+            )
 
     def validate_nonce(self, public: bytes, nonce: int) -> bool:
         if self.nonces[public] != nonce:
@@ -891,10 +1290,13 @@ class Zex(metaclass=SingletonMeta):
             )
             return False
         self.nonces[public] += 1
+        self._user_changed(public)
         return True
 
     def get_order_book_update(self, pair: str):
-        order_book_update = self.state_manager.markets[pair].get_order_book_update()
+        market = self.state_manager.markets[pair]
+        order_book_update = market.get_order_book_update()
+        tick, lot = market.tick, market.lot
         now = int(unix_time() * 1000)
         return {
             "e": "depthUpdate",  # Event type
@@ -905,10 +1307,12 @@ class Zex(metaclass=SingletonMeta):
             "u": order_book_update["u"],
             "pu": order_book_update["pu"],
             "b": [
-                [float(p), float(q)] for p, q in order_book_update["bids"].items()
+                [float(tick.to_decimal(p)), float(lot.to_decimal(q))]
+                for p, q in order_book_update["bids"].items()
             ],  # Bids to be updated
             "a": [
-                [float(p), float(q)] for p, q in order_book_update["asks"].items()
+                [float(tick.to_decimal(p)), float(lot.to_decimal(q))]
+                for p, q in order_book_update["asks"].items()
             ],  # Asks to be updated
         }
 
@@ -922,29 +1326,35 @@ class Zex(metaclass=SingletonMeta):
                 "bids": [],
                 "asks": [],
             }
-        with self.state_manager.markets[pair].order_book_lock:
-            order_book = {
-                "bids": deepcopy(self.state_manager.markets[pair].bids_order_book),
-                "asks": deepcopy(self.state_manager.markets[pair].asks_order_book),
-            }
-        last_update_id = self.state_manager.markets[pair].last_update_id
+        market = self.state_manager.markets[pair]
+        snapshot = market.depth_snapshot
+        tick, lot = market.tick, market.lot
+        bids = [
+            [tick.to_decimal(p), lot.to_decimal(q)] for p, q in snapshot.bids.top(limit)
+        ]
+        asks = [
+            [tick.to_decimal(p), lot.to_decimal(q)] for p, q in snapshot.asks.top(limit)
+        ]
         now = int(unix_time() * 1000)
         return {
-            "lastUpdateId": last_update_id,
+            "lastUpdateId": snapshot.version,
             "E": now,  # Message output time
             "T": now,  # Transaction time
-            "bids": [
-                [p, q]
-                for p, q in sorted(
-                    order_book["bids"].items(), key=lambda x: x[0], reverse=True
-                )[:limit]
-            ],
-            "asks": [
-                [p, q]
-                for p, q in sorted(order_book["asks"].items(), key=lambda x: x[0])[
-                    :limit
-                ]
-            ],
+            "bids": bids,
+            "asks": asks,
+        }
+
+    def get_book_ticker(self, pair: str):
+        market = self.state_manager.markets[pair]
+        ticker = market.book_ticker
+        tick, lot = market.tick, market.lot
+        return {
+            "u": market.final_id,  # Order book update id
+            "s": pair,  # Symbol
+            "b": str(tick.to_decimal(ticker.bid_price)),  # Best bid price
+            "B": str(lot.to_decimal(ticker.bid_quantity)),  # Best bid quantity
+            "a": str(tick.to_decimal(ticker.ask_price)),  # Best ask price
+            "A": str(lot.to_decimal(ticker.ask_quantity)),  # Best ask quantity
         }
 
     def get_kline(self, pair: str) -> pd.DataFrame:
@@ -964,23 +1374,6 @@ class Zex(metaclass=SingletonMeta):
             return kline
         return self.state_manager.markets[pair].kline_manager.kline
 
-    def _get_tx_pair(self, tx: bytes):
-        base_token, quote_token = self._extract_base_and_quote_token(tx)
-        pair = f"{base_token}-{quote_token}"
-        return base_token, quote_token, pair
-
-    def _extract_base_and_quote_token(self, tx):
-        base_token_len, quote_token_len = struct.unpack(">xx B B", tx[:4])
-
-        order_format = f">{base_token_len}s {quote_token_len}s"
-        order_format_size = struct.calcsize(order_format)
-        base_token, quote_token = struct.unpack(
-            order_format, tx[4 : 4 + order_format_size]
-        )
-        base_token = base_token.decode("ascii")
-        quote_token = quote_token.decode("ascii")
-        return base_token, quote_token
-
     def register_pub(self, public: bytes):
         if public not in self.public_to_id_lookup:
             with self.last_user_id_lock:
@@ -994,6 +1387,7 @@ class Zex(metaclass=SingletonMeta):
             self.orders[public] = {}
         if public not in self.nonces:
             self.nonces[public] = 0
+        self._user_changed(public)
 
         logger.info(
             "user registered with public: {public}, user id: {user_id}",
@@ -1002,18 +1396,19 @@ class Zex(metaclass=SingletonMeta):
         )
 
 
-def _parse_transaction(tx: bytes) -> tuple[int, Decimal, Decimal, int, bytes]:
-    operation, base_token_len, quote_token_len = struct.unpack(">x B B B", tx[:4])
-
-    order_format = f">{base_token_len}s {quote_token_len}s d d I I 33s"
-    order_format_size = struct.calcsize(order_format)
-    base_token, quote_token, amount, price, t, nonce, public = struct.unpack(
-        order_format, tx[4 : 4 + order_format_size]
-    )
-    base_token = base_token.decode("ascii")
-    quote_token = quote_token.decode("ascii")
-
-    return operation, Decimal(str(amount)), Decimal(str(price)), nonce, public
+def _publish_side(
+    published: DepthSide,
+    book_side: OrderBookSide,
+    changes: dict[int, int],
+    full: bool,
+) -> DepthSide:
+    if not (full or changes):
+        return published
+    if not full:
+        published = published.with_changes(changes, DEPTH_SNAPSHOT_LEVELS)
+        if published.complete or len(published.prices) >= DEPTH_LIMIT_MAX:
+            return published
+    return DepthSide.read(book_side, DEPTH_SNAPSHOT_LEVELS)
 
 
 class Market:
@@ -1023,12 +1418,24 @@ class Market:
         self.pair = f"{base_token}-{quote_token}"
         self.zex = zex
 
-        self.buy_orders: list[tuple[Decimal, bytes]] = []
-        self.sell_orders: list[tuple[Decimal, bytes]] = []
+        self.tick, self.lot = get_market_steps(self.pair)
+        # balance units of one lot of base token, and of quote token for one
+        # lot at a price of one tick
+        self.lot_units = self.lot.to_units(BALANCE_DECIMALS)
+        self.notional_units = self.tick.coefficient * self.lot.to_units(
+            BALANCE_DECIMALS - self.tick.decimals
+        )
+
+        self.buy_orders = OrderBookSide(is_bid=True)
+        self.sell_orders = OrderBookSide(is_bid=False)
+        # (public, nonce) -> resting order, for constant time cancels
+        self.order_index: dict[tuple[bytes, int], Order] = {}
         self.order_book_lock = Lock()
-        self.bids_order_book: dict[Decimal, Decimal] = {}
-        self.asks_order_book: dict[Decimal, Decimal] = {}
         self._order_book_updates = {"bids": {}, "asks": {}}
+        self.depth_snapshot = DepthSnapshot(
+            0, DepthSide(True, [], [], True), DepthSide(False, [], [], True)
+        )
+        self.book_ticker = BookTicker(0, 0, 0, 0)
         self.first_id = 0
         self.final_id = 0
         self.last_update_id = 0
@@ -1052,73 +1459,101 @@ class Market:
             self.last_update_id = self.final_id
         return data
 
-    def match_instantly(self, tx: bytes, t: int) -> bool:
-        operation, amount, price, nonce, public = _parse_transaction(tx)
-        if price <= 0 or amount <= 0:
+    def publish_depth(self, full: bool = False):
+        """
+        Publish the best levels of the book for depth requests.
+
+        Called by the engine after a batch. A side folds the level changes
+        of the batch into the levels it published before, and is only read
+        from the book again when fewer than `DEPTH_LIMIT_MAX` of them are
+        known, or when `full` is set.
+        """
+        snapshot = self.depth_snapshot
+        updates = self._order_book_updates
+        self.depth_snapshot = DepthSnapshot(
+            self.final_id,
+            _publish_side(snapshot.bids, self.buy_orders, updates["bids"], full),
+            _publish_side(snapshot.asks, self.sell_orders, updates["asks"], full),
+        )
+
+    def update_book_ticker(self):
+        """Refresh the cached best bid and ask, called after every book change."""
+        bid = self.buy_orders.best_level()
+        ask = self.sell_orders.best_level()
+        self.book_ticker = BookTicker(
+            bid.price if bid else 0,
+            bid.quantity if bid else 0,
+            ask.price if ask else 0,
+            ask.quantity if ask else 0,
+        )
+
+    def match_instantly(self, order: Order, t: int) -> bool:
+        price = order.price
+        if price <= 0 or order.amount <= 0:
             return False
 
-        if operation == BUY:
+        if order.side == BUY:
             if not self.sell_orders:
                 return False
-            best_sell_price = self.sell_orders[0][0]
+            best_sell_price = self.sell_orders.best_price()
             if price >= best_sell_price:
-                return self._execute_instant_buy(public, nonce, amount, price, tx, t)
-        elif operation == SELL:
+                return self._execute_instant_buy(order, t)
+        elif order.side == SELL:
             if not self.buy_orders:
                 return False
-            # Negate because buy prices are stored negatively
-            best_buy_price = -self.buy_orders[0][0]
+            best_buy_price = self.buy_orders.best_price()
             if price <= best_buy_price:
-                return self._execute_instant_sell(public, nonce, amount, price, tx, t)
+                return self._execute_instant_sell(order, t)
         else:
-            raise ValueError(f"Unsupported transaction type: {operation}")
+            raise ValueError(f"Unsupported transaction type: {order.side}")
 
         return False
 
-    def _execute_instant_buy(
-        self,
-        public: bytes,
-        nonce: int,
-        amount: Decimal,
-        price: Decimal,
-        tx: bytes,
-        t: int,
-    ) -> bool:
-        initial_amount = amount
-        required = amount * price
+    def _execute_instant_buy(self, order: Order, t: int) -> bool:
+        public = order.public
+        nonce = order.nonce
+        price = order.price
+        initial_amount = amount = order.amount
+        required = amount * price * self.notional_units
         balance = self.quote_token_balances.get(public, 0)
         if balance < required:
             logger.debug(
                 "Insufficient balance, current balance: {current_balance}, "
                 "side: buy, base token: {base_token}, quote token: {quote_token}",
-                current_balance=balance,
+                current_balance=from_units(balance),
                 base_token=self.base_token,
                 quote_token=self.quote_token,
             )
             return False
 
         # Execute the trade
-        while amount > 0 and self.sell_orders and self.sell_orders[0][0] <= price:
-            sell_price, sell_order = self.sell_orders[0]
-            trade_amount = min(amount, self.zex.amounts[sell_order])
-            self._record_trade(tx, sell_order, trade_amount, sell_price, t)
+        while amount > 0 and self.sell_orders:
+            level = self.sell_orders.best_level()
+            sell_price = level.price
+            if sell_price > price:
+                break
+            sell_order = level.head
+            trade_amount = min(amount, sell_order.remaining)
+            self._record_trade(order, sell_order, trade_amount, sell_price, t)
 
-            sell_public = sell_order[-97:-64]
-            self._update_sell_order(sell_order, trade_amount, sell_price, sell_public)
+            sell_public = sell_order.public
+            self._update_sell_order(sell_order, trade_amount)
             self._update_balances(public, sell_public, trade_amount, sell_price)
-            self.quote_token_balances[public] -= trade_amount * sell_price
+            self.quote_token_balances[public] -= (
+                trade_amount * sell_price * self.notional_units
+            )
             amount -= trade_amount
 
         if amount > 0:
             # Add remaining amount to buy orders
-            self._add_remaining_amount_to_orders("bids", public, amount, price, tx)
+            self._add_remaining_amount_to_orders("bids", order, amount)
 
             # TODO: send partial fill message for taker order
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public=public.hex(),
+            self.zex.order_events.append(
+                OrderEvent(
+                    public=public,
                     nonce=nonce,
-                    symbol=self.pair,
+                    pair=self.pair,
                     side="buy",
                     amount=initial_amount,
                     price=price,
@@ -1127,22 +1562,18 @@ class Market:
                     last_filled=initial_amount - amount,
                     cumulative_filled=initial_amount - amount,
                     last_executed_price=sell_price,
-                    transaction_time=int(time.time() * 1000),
                     is_on_orderbook=True,
                     is_maker=False,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
                 )
             )
 
         else:
             # TODO: send completed message for taker order
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public=public.hex(),
+            self.zex.order_events.append(
+                OrderEvent(
+                    public=public,
                     nonce=nonce,
-                    symbol=self.pair,
+                    pair=self.pair,
                     side="buy",
                     amount=initial_amount,
                     price=price,
@@ -1151,60 +1582,55 @@ class Market:
                     last_filled=initial_amount,
                     cumulative_filled=initial_amount,
                     last_executed_price=sell_price,
-                    transaction_time=int(time.time() * 1000),
                     is_on_orderbook=False,
                     is_maker=False,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
                 )
             )
 
+        self.update_book_ticker()
         return True
 
-    def _execute_instant_sell(
-        self,
-        public: bytes,
-        nonce: int,
-        amount: Decimal,
-        price: Decimal,
-        tx: bytes,
-        t: int,
-    ) -> bool:
-        initial_amount = amount
+    def _execute_instant_sell(self, order: Order, t: int) -> bool:
+        public = order.public
+        nonce = order.nonce
+        price = order.price
+        initial_amount = amount = order.amount
         balance = self.base_token_balances.get(public, 0)
-        if balance < amount:
+        if balance < amount * self.lot_units:
             logger.debug(
                 "Insufficient balance, current balance: {current_balance}, "
                 "side: sell, base token: {base_token}, quote token: {quote_token}",
-                current_balance=balance,
+                current_balance=from_units(balance),
                 base_token=self.base_token,
                 quote_token=self.quote_token,
             )
             return False
         # Execute the trade
-        while amount > 0 and self.buy_orders and -self.buy_orders[0][0] >= price:
-            buy_price, buy_order = self.buy_orders[0]
-            buy_price = -buy_price  # Negate because buy prices are stored negatively
-            trade_amount = min(amount, self.zex.amounts[buy_order])
-            self._record_trade(buy_order, tx, trade_amount, buy_price, t)
-
-            buy_public = buy_order[-97:-64]
-            self._update_buy_order(buy_order, trade_amount, buy_price, buy_public)
+        while amount > 0 and self.buy_orders:
+            level = self.buy_orders.best_level()
+            buy_price = level.price
+            if buy_price < price:
+                break
+            buy_order = level.head
+            trade_amount = min(amount, buy_order.remaining)
+            self._record_trade(buy_order, order, trade_amount, buy_price, t)
+
+            buy_public = buy_order.public
+            self._update_buy_order(buy_order, trade_amount)
             self._update_balances(buy_public, public, trade_amount, buy_price)
-            self.base_token_balances[public] -= trade_amount
+            self.base_token_balances[public] -= trade_amount * self.lot_units
 
             amount -= trade_amount
 
         if amount > 0:
             # Add remaining amount to sell orders
-            self._add_remaining_amount_to_orders("asks", public, amount, price, tx)
+            self._add_remaining_amount_to_orders("asks", order, amount)
 
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public=public.hex(),
+            self.zex.order_events.append(
+                OrderEvent(
+                    public=public,
                     nonce=nonce,
-                    symbol=self.pair,
+                    pair=self.pair,
                     side="sell",
                     amount=initial_amount,
                     price=price,
@@ -1213,21 +1639,17 @@ class Market:
                     last_filled=initial_amount - amount,
                     cumulative_filled=initial_amount - amount,
                     last_executed_price=buy_price,
-                    transaction_time=int(time.time() * 1000),
                     is_on_orderbook=True,
                     is_maker=False,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
                 )
             )
 
         else:
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public=public.hex(),
+            self.zex.order_events.append(
+                OrderEvent(
+                    public=public,
                     nonce=nonce,
-                    symbol=self.pair,
+                    pair=self.pair,
                     side="sell",
                     amount=initial_amount,
                     price=price,
@@ -1236,125 +1658,128 @@ class Market:
                     last_filled=initial_amount,
                     cumulative_filled=initial_amount,
                     last_executed_price=buy_price,
-                    transaction_time=int(time.time() * 1000),
                     is_on_orderbook=True,
                     is_maker=False,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
                 )
             )
+        self.update_book_ticker()
         return True
 
-    def _add_remaining_amount_to_buy_orders(self, public, amount, price, tx):
-        heapq.heappush(self.buy_orders, (-price, tx))
-        self.zex.amounts[tx] = amount
-        self.zex.orders[public][tx] = True
+    def _add_remaining_amount_to_buy_orders(self, order: Order, amount: int):
+        order.remaining = amount
+        self.zex.amounts[order.tx] = order
+        self.zex.orders[order.public][order.tx] = order
+        self.zex.digest.add_order(order)
         with self.order_book_lock:
-            if price in self.bids_order_book:
-                self.bids_order_book[price] += amount
-            else:
-                self.bids_order_book[price] = amount
-            self._order_book_updates["bids"][price] = self.bids_order_book[price]
-        self.quote_token_balances[public] -= amount * price
-
-    def _add_remaining_amount_to_sell_orders(self, public, amount, price, tx):
-        heapq.heappush(self.sell_orders, (price, tx))
-        self.zex.amounts[tx] = amount
-        self.zex.orders[public][tx] = True
+            level = self.buy_orders.add(order)
+            self._order_book_updates["bids"][order.price] = level.quantity
+        self.order_index[(order.public, order.nonce)] = order
+        self.quote_token_balances[order.public] -= (
+            amount * order.price * self.notional_units
+        )
+
+    def _add_remaining_amount_to_sell_orders(self, order: Order, amount: int):
+        order.remaining = amount
+        self.zex.amounts[order.tx] = order
+        self.zex.orders[order.public][order.tx] = order
+        self.zex.digest.add_order(order)
         with self.order_book_lock:
-            if price in self.asks_order_book:
-                self.asks_order_book[price] += amount
-            else:
-                self.asks_order_book[price] = amount
-            self._order_book_updates["asks"][price] = self.asks_order_book[price]
-        self.base_token_balances[public] -= amount
+            level = self.sell_orders.add(order)
+            self._order_book_updates["asks"][order.price] = level.quantity
+        self.order_index[(order.public, order.nonce)] = order
+        self.base_token_balances[order.public] -= amount * self.lot_units
 
     def _add_remaining_amount_to_orders(
-        self, order_book_side: Literal["bids", "asks"], public, amount, price, tx
+        self,
+        order_book_side: Literal["bids", "asks"],
+        order: Order,
+        amount: int,
     ):
         match order_book_side:
             case "bids":
-                self._add_remaining_amount_to_buy_orders(public, amount, price, tx)
+                self._add_remaining_amount_to_buy_orders(order, amount)
             case "asks":
-                self._add_remaining_amount_to_sell_orders(public, amount, price, tx)
+                self._add_remaining_amount_to_sell_orders(order, amount)
 
     def _record_trade(
         self,
-        buy_order: bytes,
-        sell_order: bytes,
-        trade_amount: Decimal,
-        price: Decimal,
+        buy_order: Order,
+        sell_order: Order,
+        trade_amount: int,
+        price: int,
         t: int,
     ):
-        buy_public = buy_order[-97:-64]
-        sell_public = sell_order[-97:-64]
-
-        for public, order_type in [(buy_public, BUY), (sell_public, SELL)]:
-            trade = (
-                t,
-                trade_amount,
-                self.pair,
-                order_type,
-                buy_order if order_type == BUY else sell_order,
-            )
+        for order, order_type in [(buy_order, BUY), (sell_order, SELL)]:
+            public = order.public
+            trade = (t, trade_amount, self.pair, order_type, order.tx)
             self.zex.trades[public].append(trade)
             self._prune_old_trades(public, t)
 
         if not self.zex.benchmark_mode and not self.zex.light_node:
-            self.kline_manager.update_kline(float(price), float(trade_amount))
+            self.kline_manager.update_kline(
+                float(self.tick.to_decimal(price)),
+                float(self.lot.to_decimal(trade_amount)),
+            )
 
         self.final_id += 1
 
-    def place(self, tx: bytes) -> bool:
-        operation, amount, price, nonce, public = _parse_transaction(tx)
+    def rejected_event(self, order: Order, reason: str) -> OrderEvent:
+        return OrderEvent(
+            public=order.public,
+            nonce=order.nonce,
+            pair=self.pair,
+            side="buy" if order.side == BUY else "sell",
+            amount=order.amount,
+            price=order.price,
+            execution_type=ExecutionType.REJECTED,
+            order_status="REJECTED",
+            last_filled=0,
+            cumulative_filled=0,
+            last_executed_price=0,
+            is_on_orderbook=False,
+            is_maker=True,
+            reject_reason=reason,
+        )
+
+    def required_balance(self, order: Order) -> tuple[dict[bytes, int], int]:
+        """Return the balances an order is paid from and the amount it locks."""
+        if order.side == BUY:
+            return (
+                self.quote_token_balances,
+                order.amount * order.price * self.notional_units,
+            )
+        return self.base_token_balances, order.amount * self.lot_units
+
+    def place(self, order: Order) -> bool:
+        operation = order.side
+        amount = order.amount
+        price = order.price
+        nonce = order.nonce
+        public = order.public
         if price <= 0 or amount <= 0:
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public=public.hex(),
-                    nonce=nonce,
-                    symbol=self.pair,
-                    side="buy" if operation == BUY else "sell",
-                    amount=amount,
-                    price=price,
-                    execution_type=ExecutionType.REJECTED,
-                    order_status="REJECTED",
-                    last_filled=Decimal("0"),
-                    cumulative_filled=Decimal("0"),
-                    last_executed_price=Decimal("0"),
-                    transaction_time=int(time.time() * 1000),
-                    is_on_orderbook=False,
-                    is_maker=True,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
-                    reject_reason="invalid price or amount",
-                )
+            self.zex.order_events.append(
+                self.rejected_event(order, "invalid price or amount")
             )
             return False
 
         if operation == BUY:
             side = "buy"
             order_book_update_key = "bids"
-            order_book = self.bids_order_book
-            orders_heap = self.buy_orders
-            heap_item = (-price, tx)
+            book_side = self.buy_orders
 
             balances_dict = self.quote_token_balances
-            balance = Decimal(str(balances_dict.get(public, 0)))
+            balance = balances_dict.get(public, 0)
 
-            required = amount * price
+            required = amount * price * self.notional_units
         elif operation == SELL:
             side = "sell"
             order_book_update_key = "asks"
-            order_book = self.asks_order_book
-            orders_heap = self.sell_orders
-            heap_item = (price, tx)
+            book_side = self.sell_orders
 
             balances_dict = self.base_token_balances
-            balance = Decimal(str(balances_dict.get(public, 0)))
+            balance = balances_dict.get(public, 0)
 
-            required = amount
+            required = amount * self.lot_units
         else:
             raise ValueError(f"Unsupported transaction type: {operation}")
 
@@ -1362,184 +1787,140 @@ class Market:
             logger.debug(
                 "Insufficient balance, current balance: {current_balance}, "
                 "side: {side}, base token: {base_token}, quote token: {quote_token}",
-                current_balance=float(balance),
+                current_balance=from_units(balance),
                 side=side,
                 base_token=self.base_token,
                 quote_token=self.quote_token,
             )
 
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public=public.hex(),
-                    nonce=nonce,
-                    symbol=self.pair,
-                    side="buy" if operation == BUY else "sell",
-                    amount=amount,
-                    price=price,
-                    execution_type=ExecutionType.REJECTED,
-                    order_status="REJECTED",
-                    last_filled=Decimal("0"),
-                    cumulative_filled=Decimal("0"),
-                    last_executed_price=Decimal("0"),
-                    transaction_time=int(time.time() * 1000),
-                    is_on_orderbook=False,
-                    is_maker=True,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
-                    reject_reason="insufficient balance",
-                )
+            self.zex.order_events.append(
+                self.rejected_event(order, "insufficient balance")
             )
             return False
 
-        heapq.heappush(orders_heap, heap_item)
         with self.order_book_lock:
-            if price in order_book:
-                order_book[price] += amount
-            else:
-                order_book[price] = amount
-            self._order_book_updates[order_book_update_key][price] = order_book[price]
+            level = book_side.add(order)
+            self._order_book_updates[order_book_update_key][price] = level.quantity
+        self.order_index[(public, nonce)] = order
 
         balances_dict[public] = balance - required
 
         self.final_id += 1
-        self.zex.amounts[tx] = amount
-        self.zex.orders[public][tx] = True
+        self.zex.amounts[order.tx] = order
+        self.zex.orders[public][order.tx] = order
+        self.zex.digest.add_order(order)
 
-        asyncio.create_task(
-            self.zex.order_callback(
-                public=public.hex(),
+        self.zex.order_events.append(
+            OrderEvent(
+                public=public,
                 nonce=nonce,
-                symbol=self.pair,
+                pair=self.pair,
                 side=side,
                 amount=amount,
                 price=price,
                 execution_type=ExecutionType.NEW,
                 order_status="NEW",
-                last_filled=Decimal("0"),
-                cumulative_filled=Decimal("0"),
-                last_executed_price=Decimal("0"),
-                transaction_time=int(time.time() * 1000),
+                last_filled=0,
+                cumulative_filled=0,
+                last_executed_price=0,
                 is_on_orderbook=True,
                 is_maker=True,
-                cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                last_quote_asset_quantity=Decimal(0),  # TODO
-                quote_order_quantity=Decimal(0),  # TODO
             )
         )
+        self.update_book_ticker()
         return True
 
     def cancel(self, tx: bytes) -> bool:
         public = tx[-97:-64]
         order_slice = tx[2:-97]
-        for order in self.zex.orders[public]:
-            if order_slice not in order:
-                continue
-            operation, amount, price, nonce, public = _parse_transaction(order)
-            amount = self.zex.amounts.pop(order)
-            del self.zex.orders[public][order]
-            if operation == BUY:
-                self.quote_token_balances[public] += amount * price
-                self.buy_orders.remove((-price, order))
-                heapq.heapify(self.buy_orders)
-                with self.order_book_lock:
-                    if amount >= self.bids_order_book[price]:
-                        del self.bids_order_book[price]
-                        self._order_book_updates["bids"][price] = 0
-                    else:
-                        self.bids_order_book[price] -= amount
-                        self._order_book_updates["bids"][price] = self.bids_order_book[
-                            price
-                        ]
+        # the slice of the cancelled order ends with its nonce
+        nonce = int.from_bytes(order_slice[-4:], "big")
+        order = self.order_index.get((public, nonce))
+        if order is None or order_slice not in order.tx:
+            return False
 
-            else:
-                self.base_token_balances[public] += amount
-                self.sell_orders.remove((price, order))
-                heapq.heapify(self.sell_orders)
-                with self.order_book_lock:
-                    if amount >= self.asks_order_book[price]:
-                        del self.asks_order_book[price]
-                        self._order_book_updates["asks"][price] = 0
-                    else:
-                        self.asks_order_book[price] -= amount
-                        self._order_book_updates["asks"][price] = self.asks_order_book[
-                            price
-                        ]
-            self.final_id += 1
-            asyncio.create_task(
-                self.zex.order_callback(
-                    public.hex(),
-                    nonce,
-                    self.pair,
-                    "buy" if operation == BUY else "sell",
-                    amount,
-                    price,
-                    ExecutionType.CANCELED,
-                    "CANCELED",
-                    last_filled=Decimal("0"),
-                    cumulative_filled=Decimal("0"),
-                    last_executed_price=Decimal("0"),
-                    transaction_time=int(time.time() * 1000),
-                    is_on_orderbook=False,
-                    is_maker=True,
-                    cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                    last_quote_asset_quantity=Decimal(0),  # TODO
-                    quote_order_quantity=Decimal(0),  # TODO
-                )
-            )
-            return True
+        operation = order.side
+        amount = order.remaining
+        price = order.price
+        self.zex.digest.remove_order(order)
+        del self.zex.amounts[order.tx]
+        del self.zex.orders[public][order.tx]
+        del self.order_index[(public, nonce)]
+        if operation == BUY:
+            self.quote_token_balances[public] += amount * price * self.notional_units
+            book_side, book_type = self.buy_orders, "bids"
         else:
-            return False
+            self.base_token_balances[public] += amount * self.lot_units
+            book_side, book_type = self.sell_orders, "asks"
+        with self.order_book_lock:
+            level = order.level
+            level.quantity -= amount
+            self._order_book_updates[book_type][price] = level.quantity
+            book_side.remove(order)
+        self.final_id += 1
+        self.zex.order_events.append(
+            OrderEvent(
+                public=public,
+                nonce=nonce,
+                pair=self.pair,
+                side="buy" if operation == BUY else "sell",
+                amount=amount,
+                price=price,
+                execution_type=ExecutionType.CANCELED,
+                order_status="CANCELED",
+                last_filled=0,
+                cumulative_filled=0,
+                last_executed_price=0,
+                is_on_orderbook=False,
+                is_maker=True,
+            )
+        )
+        self.update_book_ticker()
+        return True
 
-    def _update_buy_order(
-        self,
-        buy_order: bytes,
-        trade_amount: Decimal,
-        buy_price: Decimal,
-        buy_public: bytes,
-    ):
-        _, amount, _, nonce, _ = _parse_transaction(buy_order)
+    def _update_buy_order(self, buy_order: Order, trade_amount: int):
+        buy_public = buy_order.public
+        nonce = buy_order.nonce
+        amount = buy_order.amount
+        level = buy_order.level
+        buy_price = level.price
         with self.order_book_lock:
-            if self.zex.amounts[buy_order] > trade_amount:
-                self.bids_order_book[buy_price] -= trade_amount
-                self._order_book_updates["bids"][buy_price] = self.bids_order_book[
-                    buy_price
-                ]
-                self.zex.amounts[buy_order] -= trade_amount
+            level.quantity -= trade_amount
+            self._order_book_updates["bids"][buy_price] = level.quantity
+            self.zex.digest.remove_order(buy_order)
+            if buy_order.remaining > trade_amount:
+                buy_order.remaining -= trade_amount
+                self.zex.digest.add_order(buy_order)
                 self.final_id += 1
 
-                asyncio.create_task(
-                    self.zex.order_callback(
-                        public=buy_public.hex(),
+                self.zex.order_events.append(
+                    OrderEvent(
+                        public=buy_public,
                         nonce=nonce,
-                        symbol=self.pair,
+                        pair=self.pair,
                         side="buy",
                         amount=trade_amount,
                         price=buy_price,
                         execution_type=ExecutionType.TRADE,
                         order_status="PARTIALLY_FILLED",
                         last_filled=trade_amount,
-                        cumulative_filled=amount - self.zex.amounts[buy_order],
+                        cumulative_filled=amount - buy_order.remaining,
                         last_executed_price=buy_price,
-                        transaction_time=int(time.time() * 1000),
                         is_on_orderbook=True,
                         is_maker=True,
-                        cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                        last_quote_asset_quantity=Decimal(0),  # TODO
-                        quote_order_quantity=Decimal(0),  # TODO
                     )
                 )
             else:
-                heapq.heappop(self.buy_orders)
-                self._remove_from_order_book("bids", buy_price, trade_amount)
-                del self.zex.amounts[buy_order]
-                del self.zex.orders[buy_public][buy_order]
+                self.buy_orders.remove(buy_order)
+                del self.order_index[(buy_public, nonce)]
+                del self.zex.amounts[buy_order.tx]
+                del self.zex.orders[buy_public][buy_order.tx]
                 self.final_id += 1
-                asyncio.create_task(
-                    self.zex.order_callback(
-                        public=buy_public.hex(),
+                self.zex.order_events.append(
+                    OrderEvent(
+                        public=buy_public,
                         nonce=nonce,
-                        symbol=self.pair,
+                        pair=self.pair,
                         side="buy",
                         amount=trade_amount,
                         price=buy_price,
@@ -1548,66 +1929,56 @@ class Market:
                         last_filled=trade_amount,
                         cumulative_filled=amount,
                         last_executed_price=buy_price,
-                        transaction_time=int(time.time() * 1000),
                         is_on_orderbook=False,
                         is_maker=True,
-                        cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                        last_quote_asset_quantity=Decimal(0),  # TODO
-                        quote_order_quantity=Decimal(0),  # TODO
                     )
                 )
 
-    def _update_sell_order(
-        self,
-        sell_order: bytes,
-        trade_amount: Decimal,
-        sell_price: Decimal,
-        sell_public: bytes,
-    ):
-        _, amount, _, nonce, _ = _parse_transaction(sell_order)
+    def _update_sell_order(self, sell_order: Order, trade_amount: int):
+        sell_public = sell_order.public
+        nonce = sell_order.nonce
+        amount = sell_order.amount
+        level = sell_order.level
+        sell_price = level.price
         with self.order_book_lock:
-            if self.zex.amounts[sell_order] > trade_amount:
-                self.asks_order_book[sell_price] -= trade_amount
-                self._order_book_updates["asks"][sell_price] = self.asks_order_book[
-                    sell_price
-                ]
-                self.zex.amounts[sell_order] -= trade_amount
+            level.quantity -= trade_amount
+            self._order_book_updates["asks"][sell_price] = level.quantity
+            self.zex.digest.remove_order(sell_order)
+            if sell_order.remaining > trade_amount:
+                sell_order.remaining -= trade_amount
+                self.zex.digest.add_order(sell_order)
                 self.final_id += 1
 
-                asyncio.create_task(
-                    self.zex.order_callback(
-                        public=sell_public.hex(),
+                self.zex.order_events.append(
+                    OrderEvent(
+                        public=sell_public,
                         nonce=nonce,
-                        symbol=self.pair,
+                        pair=self.pair,
                         side="sell",
                         amount=trade_amount,
                         price=sell_price,
                         execution_type=ExecutionType.TRADE,
                         order_status="PARTIALLY_FILLED",
                         last_filled=trade_amount,
-                        cumulative_filled=amount - self.zex.amounts[sell_order],
+                        cumulative_filled=amount - sell_order.remaining,
                         last_executed_price=sell_price,
-                        transaction_time=int(time.time() * 1000),
                         is_on_orderbook=True,
                         is_maker=True,
-                        cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                        last_quote_asset_quantity=Decimal(0),  # TODO
-                        quote_order_quantity=Decimal(0),  # TODO
                     )
                 )
             else:
-                heapq.heappop(self.sell_orders)
-                self._remove_from_order_book("asks", sell_price, trade_amount)
-                del self.zex.amounts[sell_order]
-                del self.zex.orders[sell_public][sell_order]
+                self.sell_orders.remove(sell_order)
+                del self.order_index[(sell_public, nonce)]
+                del self.zex.amounts[sell_order.tx]
+                del self.zex.orders[sell_public][sell_order.tx]
                 self.final_id += 1
 
                 # TODO: fill market maker order completely
-                asyncio.create_task(
-                    self.zex.order_callback(
-                        public=sell_public.hex(),
+                self.zex.order_events.append(
+                    OrderEvent(
+                        public=sell_public,
                         nonce=nonce,
-                        symbol=self.pair,
+                        pair=self.pair,
                         side="sell",
                         amount=trade_amount,
                         price=sell_price,
@@ -1616,39 +1987,25 @@ class Market:
                         last_filled=trade_amount,
                         cumulative_filled=amount,
                         last_executed_price=sell_price,
-                        transaction_time=int(time.time() * 1000),
                         is_on_orderbook=False,
                         is_maker=True,
-                        cumulative_quote_asset_quantity=Decimal(0),  # TODO
-                        last_quote_asset_quantity=Decimal(0),  # TODO
-                        quote_order_quantity=Decimal(0),  # TODO
                     )
                 )
 
-    def _remove_from_order_book(self, book_type: str, price: Decimal, amount: Decimal):
-        order_book = (
-            self.bids_order_book if book_type == "bids" else self.asks_order_book
-        )
-        if order_book[price] <= amount:
-            self._order_book_updates[book_type][price] = 0
-            del order_book[price]
-        else:
-            order_book[price] -= amount
-            self._order_book_updates[book_type][price] = order_book[price]
-
     def _update_balances(
         self,
         buy_public: bytes,
         sell_public: bytes,
-        trade_amount: Decimal,
-        price: Decimal,
+        trade_amount: int,
+        price: int,
     ):
         self.base_token_balances[buy_public] = (
-            self.base_token_balances.get(buy_public, 0) + trade_amount
+            self.base_token_balances.get(buy_public, 0) + trade_amount * self.lot_units
         )
 
         self.quote_token_balances[sell_public] = (
-            self.quote_token_balances.get(sell_public, 0) + price * trade_amount
+            self.quote_token_balances.get(sell_public, 0)
+            + price * trade_amount * self.notional_units
         )
 
     def _prune_old_trades(self, public: bytes, current_time: int):
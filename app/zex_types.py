@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import NamedTuple
 
 from eth_typing.evm import HexAddress
 
@@ -14,3 +15,22 @@ class ExecutionType(Enum):
     REJECTED = "REJECTED"
     TRADE = "TRADE"
     EXPIRED = "EXPIRED"
+
+
+class OrderEvent(NamedTuple):
+    """An order update recorded by the engine, amounts in lots and prices in ticks."""
+
+    public: UserPublic
+    nonce: int
+    pair: str
+    side: str
+    amount: int
+    price: int
+    execution_type: ExecutionType
+    order_status: str
+    last_filled: int
+    cumulative_filled: int
+    last_executed_price: int
+    is_on_orderbook: bool
+    is_maker: bool
+    reject_reason: str = "NONE"
@@ -0,0 +1,23 @@
+import pytest
+
+from app.zex import Zex
+
+
+async def _noop(*args):
+    pass
+
+
+@pytest.fixture
+def callbacks():
+    """Kline, depth, order, deposit, withdraw and book ticker callbacks doing nothing."""
+    return (_noop,) * 6
+
+
+@pytest.fixture
+def zex_instance(callbacks):
+    return Zex(
+        *callbacks,
+        state_dest="test_state.bin",
+        light_node=False,
+        benchmark_mode=False,
+    )
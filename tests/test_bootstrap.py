@@ -0,0 +1,120 @@
+import hashlib
+import os
+
+import httpx
+import pytest
+
+from app import bootstrap
+from app.bootstrap import digest_headers, download_path, download_state, state_digest
+
+
+class StateServer:
+    """Serves a state with range requests, like the /state route."""
+
+    def __init__(self, data: bytes, fail_every: int = 0, digest: bytes | None = None):
+        self.data = data
+        self.digest = digest
+        self.fail_every = fail_every
+        self.requests = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            raise httpx.ReadError("connection dropped", request=request)
+        headers = digest_headers(self.digest or hashlib.sha256(self.data).digest())
+        if_range = request.headers.get("if-range")
+        range_header = request.headers.get("range")
+        if range_header is None or (if_range and if_range != headers["etag"]):
+            return httpx.Response(200, headers=headers, content=self.data)
+        start, end = map(int, range_header.removeprefix("bytes=").split("-"))
+        if start >= len(self.data):
+            headers["content-range"] = f"bytes */{len(self.data)}"
+            return httpx.Response(416, headers=headers)
+        end = min(end, len(self.data) - 1)
+        headers["content-range"] = f"bytes {start}-{end}/{len(self.data)}"
+        return httpx.Response(206, headers=headers, content=self.data[start : end + 1])
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(bootstrap, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(bootstrap, "sleep", lambda _: None)
+
+
+def _download(server: StateServer, state_dest, retries=5):
+    return download_state(
+        "http://node/v1/state",
+        state_dest,
+        retries=retries,
+        transport=httpx.MockTransport(server.handle),
+    )
+
+
+def test_download_in_chunks(tmp_path):
+    server = StateServer(os.urandom(10_500), fail_every=3)
+    path = _download(server, tmp_path / "state.bin")
+    with open(path, "rb") as f:
+        assert f.read() == server.data
+    assert server.requests > 11
+
+
+def test_resume_after_restart(tmp_path):
+    server = StateServer(os.urandom(10_500), fail_every=2)
+    with pytest.raises(httpx.ReadError):
+        _download(server, tmp_path / "state.bin", retries=0)
+    assert 0 < os.path.getsize(download_path(tmp_path / "state.bin")) < len(server.data)
+
+    server.fail_every = 0
+    server.requests = 0
+    path = _download(server, tmp_path / "state.bin")
+    with open(path, "rb") as f:
+        assert f.read() == server.data
+    assert server.requests == 10
+
+
+def test_restart_when_state_changes(tmp_path):
+    server = StateServer(os.urandom(10_500), fail_every=2)
+    with pytest.raises(httpx.ReadError):
+        _download(server, tmp_path / "state.bin", retries=0)
+
+    server.data = os.urandom(3_000)
+    server.fail_every = 0
+    path = _download(server, tmp_path / "state.bin")
+    with open(path, "rb") as f:
+        assert f.read() == server.data
+
+
+def test_digest_mismatch(tmp_path):
+    server = StateServer(os.urandom(2_500), digest=b"\x00" * 32)
+    with pytest.raises(ValueError):
+        _download(server, tmp_path / "state.bin", retries=1)
+
+
+def test_no_state(tmp_path):
+    transport = httpx.MockTransport(lambda request: httpx.Response(404))
+    assert (
+        download_state(
+            "http://node/v1/state", tmp_path / "state.bin", transport=transport
+        )
+        is None
+    )
+
+
+def test_unreachable(tmp_path):
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    with pytest.raises(httpx.ConnectError):
+        download_state(
+            "http://node/v1/state",
+            tmp_path / "state.bin",
+            transport=httpx.MockTransport(refuse),
+        )
+
+
+def test_state_digest(tmp_path):
+    path = tmp_path / "state.bin"
+    path.write_bytes(b"state")
+    assert state_digest(path) == hashlib.sha256(b"state").digest()
+    path.write_bytes(b"another state")
+    assert state_digest(path) == hashlib.sha256(b"another state").digest()
@@ -0,0 +1,53 @@
+import os
+
+from app import deposit_set
+from app.deposit_set import KEY_SIZE, DepositSet, deposit_key
+
+
+def test_add_and_merge(monkeypatch):
+    monkeypatch.setattr(deposit_set, "HOT_SIZE", 8)
+    deposits = DepositSet()
+    added = [(f"0x{os.urandom(32).hex()}", vout) for vout in range(50)]
+    for deposit in added:
+        assert deposit not in deposits
+        deposits.add(deposit)
+        assert deposit in deposits
+    deposits.add(added[0])
+    assert len(deposits) == 50
+    assert ("0x" + "00" * 32, 0) not in deposits
+
+    keys = deposits.keys()
+    assert len(keys) == 50 * KEY_SIZE
+    chunks = [keys[i : i + KEY_SIZE] for i in range(0, len(keys), KEY_SIZE)]
+    assert chunks == sorted(chunks)
+
+
+def test_update_keys():
+    first, second = DepositSet(), DepositSet()
+    for vout in range(10):
+        first.add(("0xaa", vout))
+    for vout in range(5, 15):
+        second.add(("0xaa", vout))
+
+    loaded = DepositSet()
+    loaded.update_keys(first.keys())
+    loaded.update_keys(second.keys())
+    assert len(loaded) == 15
+    assert all(("0xaa", vout) in loaded for vout in range(15))
+    assert ("0xab", 0) not in loaded
+
+
+def test_runs_halve_in_size(monkeypatch):
+    monkeypatch.setattr(deposit_set, "HOT_SIZE", 4)
+    deposits = DepositSet()
+    for vout in range(1000):
+        deposits.add(("0xaa", vout))
+
+    sizes = [len(run) for run in deposits._runs]
+    assert sizes == sorted(set(sizes), reverse=True)
+    assert len(sizes) <= 8
+    assert all(("0xaa", vout) in deposits for vout in range(1000))
+    assert deposits.keys() == b"".join(
+        sorted(deposit_key("0xaa", vout) for vout in range(1000))
+    )
+    assert len(deposits._runs) == 1
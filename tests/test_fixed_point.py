@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from pydantic import ValidationError
+import pytest
+
+from app.config import MarketConfig
+from app.fixed_point import StepSize, from_units, to_units
+
+
+def test_units_round_trip():
+    assert to_units(Decimal("1.5")) == 15 * 10**17
+    assert from_units(15 * 10**17) == Decimal("1.5")
+    assert str(from_units(10**24)) == "1000000"
+    assert from_units(1) == Decimal("1e-18")
+
+    with pytest.raises(ValueError):
+        to_units(Decimal("1e-19"))
+
+
+def test_step_size():
+    tick = StepSize(Decimal("0.05"))
+
+    assert tick.to_steps(Decimal("1.25")) == 25
+    assert tick.to_steps(Decimal("1.26")) is None
+    assert str(tick.to_decimal(25)) == "1.25"
+    assert tick.to_units(4) == 500
+
+    with pytest.raises(ValueError):
+        tick.to_units(1)
+
+
+def test_market_config_decimals():
+    MarketConfig(tick_size=Decimal("1e-9"), lot_size=Decimal("1e-9"))
+    with pytest.raises(ValidationError):
+        MarketConfig(tick_size=Decimal("1e-10"), lot_size=Decimal("1e-9"))
+    with pytest.raises(ValidationError):
+        MarketConfig(lot_size=Decimal(0))
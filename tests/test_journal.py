@@ -0,0 +1,77 @@
+import os
+
+from secp256k1 import PrivateKey
+
+from app.journal import BatchJournal
+from app.zex import Zex
+
+
+def _journal(path, segment_size=1024):
+    return BatchJournal(path, sync_interval=0, segment_size=segment_size)
+
+
+def test_append_and_replay(tmp_path):
+    journal = _journal(tmp_path)
+    batches = [
+        (index, [os.urandom(100) for _ in range(index % 3)]) for index in range(1, 40)
+    ]
+    for index, txs in batches:
+        journal.append(index, txs)
+    journal.append(5, [b"again"])
+    assert len(journal.segments) > 1
+    journal.close()
+
+    journal = _journal(tmp_path)
+    assert journal.last_index == 39
+    assert list(journal.batches()) == batches
+    assert list(journal.batches(after=30)) == batches[30:]
+
+    journal.append(40, [b"tx"])
+    assert list(journal.batches(after=39)) == [(40, [b"tx"])]
+
+
+def test_torn_record_is_dropped(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(1, [b"first"])
+    journal.append(2, [b"second"])
+    journal.close()
+    path = tmp_path / os.listdir(tmp_path)[0]
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    journal = _journal(tmp_path)
+    assert journal.last_index == 1
+    journal.append(2, [b"second again"])
+    assert list(journal.batches()) == [(1, [b"first"]), (2, [b"second again"])]
+
+
+def test_discard_through(tmp_path):
+    journal = _journal(tmp_path, segment_size=100)
+    for index in range(1, 11):
+        journal.append(index, [os.urandom(80)])
+    journal.discard_through(6)
+    remaining = [index for index, _ in journal.batches()]
+    assert remaining[0] <= 7 and remaining[-1] == 10
+    journal.discard_through(10)
+    assert len(journal.segments) == 1
+    assert [index for index, _ in journal.batches(after=9)] == [10]
+
+
+def test_replay_journal(zex_instance: Zex, tmp_path):
+    publics = [
+        PrivateKey(os.urandom(32), raw=True).pubkey.serialize() for _ in range(3)
+    ]
+    last_tx_index = zex_instance.last_tx_index
+    journal = _journal(tmp_path)
+    for i, public in enumerate(publics):
+        journal.append(last_tx_index + 1 + i, [b"\x01r" + public])
+    # a gap, nothing after it is replayed
+    journal.append(last_tx_index + 5, [b"\x01r" + os.urandom(33)])
+
+    zex_instance.journal = journal
+    try:
+        assert zex_instance.replay_journal() == 3
+    finally:
+        zex_instance.journal = None
+    assert zex_instance.last_tx_index == last_tx_index + 3
+    assert all(public in zex_instance.public_to_id_lookup for public in publics)
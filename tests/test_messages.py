@@ -0,0 +1,166 @@
+from struct import pack
+import math
+import os
+import random
+import struct
+
+import numpy as np
+import pytest
+
+from app.codec import ORDER_HEADER, WITHDRAW_HEADER, order_struct, withdraw_struct
+from app.messages import (
+    MessageFormatError,
+    cancel_msg,
+    format_float,
+    order_msg,
+    register_msg,
+    withdraw_msg,
+)
+
+BUY, SELL = b"bs"
+
+
+# the messages as they were built with f-strings and numpy, which clients
+# sign, the builders must give the same bytes
+def reference_order_msg(tx: bytes) -> bytes:
+    version, side, base_token_len, quote_token_len = ORDER_HEADER.unpack_from(tx)
+    base_token, quote_token, amount, price, t, nonce, public = order_struct(
+        base_token_len, quote_token_len
+    ).unpack_from(tx, ORDER_HEADER.size)
+    msg = f"""v: {version}
+name: {"buy" if side == BUY else "sell"}
+base token: {base_token.decode("ascii")}
+quote token: {quote_token.decode("ascii")}
+amount: {np.format_float_positional(amount, trim="0")}
+price: {np.format_float_positional(price, trim="0")}
+t: {t}
+nonce: {nonce}
+public: {public.hex()}
+"""
+    return "".join(("\x19Ethereum Signed Message:\n", str(len(msg)), msg)).encode()
+
+
+def reference_withdraw_msg(tx: bytes) -> bytes:
+    version, _, token_len = WITHDRAW_HEADER.unpack_from(tx)
+    token_chain, token_name, amount, destination, t, nonce, public = withdraw_struct(
+        token_len
+    ).unpack_from(tx, WITHDRAW_HEADER.size)
+    msg = f"""v: {version}
+name: withdraw
+token chain: {token_chain.decode("ascii")}
+token name: {token_name.decode("ascii")}
+amount: {amount}
+to: 0x{destination.hex()}
+t: {t}
+nonce: {nonce}
+public: {public.hex()}
+"""
+    return ("\x19Ethereum Signed Message:\n" + str(len(msg)) + msg).encode()
+
+
+def reference_cancel_msg(tx: bytes) -> bytes:
+    msg = f"""v: {tx[0]}
+name: cancel
+slice: {tx[2:-97].hex()}
+public: {tx[-97:-64].hex()}
+"""
+    return "".join(("\x19Ethereum Signed Message:\n", str(len(msg)), msg)).encode()
+
+
+def _floats(rng: random.Random, count: int) -> list[float]:
+    values = [
+        0.0,
+        -0.0,
+        math.inf,
+        -math.inf,
+        math.nan,
+        5e-324,
+        1.7976931348623157e308,
+        1e15,
+        1e16,
+        1e-4,
+        1e-5,
+        0.1,
+        0.3,
+        float(2**53),
+        float(2**53 + 2),
+    ]
+    for _ in range(count):
+        values.append(struct.unpack(">d", rng.randbytes(8))[0])
+        values.append(rng.uniform(0, 1e6))
+        values.append(float(f"{rng.randint(0, 10**9)}e{rng.randint(-20, 20)}"))
+        values.append(round(rng.uniform(0, 100_000), rng.randint(0, 10)))
+    return values
+
+
+def _token(rng: random.Random) -> bytes:
+    return bytes(rng.choices(range(0x21, 0x7F), k=rng.randint(1, 12)))
+
+
+def _order(rng: random.Random, amount: float, price: float) -> bytes:
+    base_token, quote_token = _token(rng), _token(rng)
+    return (
+        ORDER_HEADER.pack(
+            rng.randint(0, 255),
+            rng.choice((BUY, SELL)),
+            len(base_token),
+            len(quote_token),
+        )
+        + base_token
+        + quote_token
+        + pack(">d d I I", amount, price, rng.getrandbits(32), rng.getrandbits(32))
+        + rng.randbytes(33)
+        + rng.randbytes(64)
+    )
+
+
+def _withdraw(rng: random.Random, amount: float) -> bytes:
+    token = _token(rng)
+    return (
+        WITHDRAW_HEADER.pack(rng.randint(0, 255), ord("w"), len(token))
+        + _token(rng).ljust(3, b"x")[:3]
+        + token
+        + pack(">d", amount)
+        + rng.randbytes(20)
+        + pack(">I I", rng.getrandbits(32), rng.getrandbits(32))
+        + rng.randbytes(33)
+        + rng.randbytes(64)
+    )
+
+
+def test_format_float():
+    for value in _floats(random.Random(1), 50_000):
+        assert format_float(value) == np.format_float_positional(value, trim="0")
+
+
+def test_messages_match_reference():
+    rng = random.Random(2)
+    floats = _floats(rng, 2_000)
+    for amount, price in zip(floats, reversed(floats), strict=True):
+        tx = _order(rng, amount, price)
+        assert order_msg(tx) == reference_order_msg(tx)
+        tx = _withdraw(rng, amount)
+        assert withdraw_msg(tx) == reference_withdraw_msg(tx)
+        tx = bytes([rng.randint(0, 255)]) + b"c" + tx
+        assert cancel_msg(tx) == reference_cancel_msg(tx)
+    assert register_msg() == b"\x19Ethereum Signed Message:\n15Welcome to ZEX."
+
+
+@pytest.mark.parametrize(
+    "build, tx",
+    [
+        (order_msg, b"\x01b"),
+        (order_msg, ORDER_HEADER.pack(1, BUY, 0, 3) + os.urandom(150)),
+        (order_msg, ORDER_HEADER.pack(1, BUY, 3, 3) + os.urandom(20)),
+        (order_msg, ORDER_HEADER.pack(1, BUY, 3, 3) + b"\xff" * 150),
+        (order_msg, ORDER_HEADER.pack(1, ord("x"), 3, 3) + b"a" * 150),
+        (withdraw_msg, b"\x01"),
+        (withdraw_msg, WITHDRAW_HEADER.pack(1, ord("w"), 0) + os.urandom(150)),
+        (withdraw_msg, WITHDRAW_HEADER.pack(1, ord("w"), 3) + os.urandom(20)),
+        (withdraw_msg, WITHDRAW_HEADER.pack(1, ord("w"), 3) + b"\xff" * 150),
+        (cancel_msg, os.urandom(98)),
+    ],
+)
+def test_malformed(build, tx):
+    with pytest.raises(MessageFormatError):
+        build(tx)
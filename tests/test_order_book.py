@@ -0,0 +1,143 @@
+from decimal import Decimal
+from struct import pack
+import random
+
+import pytest
+
+from app.fixed_point import StepSize
+from app.order_book import DepthSide, Order, OrderBookSide
+
+TICK = StepSize(Decimal("0.01"))
+LOT = StepSize(Decimal("0.001"))
+
+
+def make_order(tx: bytes, price: int, amount: int) -> Order:
+    return Order(tx, ord("b"), "BTC-USDT", price, amount, 0, b"")
+
+
+def order_tx(amount: float, price: float, nonce: int, public: bytes) -> bytes:
+    return (
+        pack(">B B B B", 1, ord("s"), 3, 4)
+        + b"BTCUSDT"
+        + pack(">d d I I", amount, price, 1700000000, nonce)
+        + public
+        + b"\x00" * 64
+    )
+
+
+def test_order_from_tx():
+    public = b"\x02" + b"\x11" * 32
+    tx = order_tx(0.1, 25000.5, 7, public)
+
+    order = Order.from_tx(tx, TICK, LOT)
+
+    assert order.side == ord("s")
+    assert order.pair == "BTC-USDT"
+    assert order.amount == order.remaining == 100
+    assert order.price == 2500050
+    assert order.nonce == 7
+    assert order.public == public
+    assert order.tx is tx
+
+
+def test_order_off_grid_decodes_to_zero():
+    order = Order.from_tx(order_tx(0.0001, 25000.005, 0, b"\x02" * 33), TICK, LOT)
+
+    assert order.price == 0
+    assert order.amount == 0
+
+
+def test_best_level_and_depth_order():
+    bids = OrderBookSide(is_bid=True)
+    asks = OrderBookSide(is_bid=False)
+    for price in (100, 102, 101):
+        bids.add(make_order(f"b{price}".encode(), price, 1))
+        asks.add(make_order(f"a{price}".encode(), price, 2))
+
+    assert bids.best_price() == 102
+    assert asks.best_price() == 100
+    assert bids.depth(2) == [[102, 1], [101, 1]]
+    assert asks.depth(5) == [[100, 2], [101, 2], [102, 2]]
+    assert bids.top_levels(2) == ((102, 1), (101, 1))
+    assert asks.top_levels(5) == ((100, 2), (101, 2), (102, 2))
+    assert len(bids) == 3
+
+
+def test_fifo_within_level():
+    asks = OrderBookSide(is_bid=False)
+    asks.add(make_order(b"first", 10, 1))
+    asks.add(make_order(b"second", 10, 3))
+
+    level = asks.best_level()
+    assert level.quantity == 4
+    assert [order.tx for order in level] == [b"first", b"second"]
+    asks.remove(level.head)
+    assert level.head.tx == b"second"
+    asks.remove(level.head)
+    assert not asks
+    assert asks.best_level() is None
+
+
+def test_remove_from_middle_of_level():
+    bids = OrderBookSide(is_bid=True)
+    orders = [make_order(tx, 5, 1) for tx in (b"a", b"b", b"c")]
+    for order in orders:
+        bids.add(order)
+
+    bids.remove(orders[1])
+
+    level = bids.levels[5]
+    assert [order.tx for order in level] == [b"a", b"c"]
+    assert level.tail is orders[2]
+    assert orders[1].level is None
+    assert len(bids) == 2
+
+
+def test_remove_drops_empty_level():
+    bids = OrderBookSide(is_bid=True)
+    x = make_order(b"x", 5, 1)
+    bids.add(x)
+    bids.add(make_order(b"y", 6, 1))
+
+    bids.remove(x)
+
+    assert 5 not in bids.levels
+    assert [level.price for level in bids.iter_levels()] == [6]
+    assert len(bids) == 1
+
+
+@pytest.mark.parametrize("is_bid", [True, False])
+@pytest.mark.parametrize("complete", [True, False])
+def test_depth_side_publishes_changes(is_bid, complete):
+    rng = random.Random(7)
+    side = OrderBookSide(is_bid=is_bid)
+    orders = []
+
+    def place() -> tuple[int, int]:
+        order = make_order(
+            rng.randbytes(8), rng.randrange(50, 150), rng.randrange(1, 5)
+        )
+        orders.append(order)
+        level = side.add(order)
+        return level.price, level.quantity
+
+    for _ in range(0 if complete else 300):
+        place()
+    published = DepthSide.read(side, 40)
+    assert published.complete == complete
+    for _ in range(10):
+        changes = {}
+        for _ in range(3):
+            if orders and rng.random() < 0.5:
+                order = orders.pop(rng.randrange(len(orders)))
+                level = order.level
+                level.quantity -= order.remaining
+                side.remove(order)
+                changes[level.price] = level.quantity
+            else:
+                price, quantity = place()
+                changes[price] = quantity
+        published = published.with_changes(changes, 40)
+        assert published.top(10) == list(side.top_levels(10))
+    if complete:
+        assert published.top(40) == list(side.top_levels(40))
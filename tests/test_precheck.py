@@ -0,0 +1,84 @@
+from struct import pack
+import os
+
+from secp256k1 import PrivateKey
+import pytest
+
+from app.codec import ORDER_HEADER
+from app.precheck import Rejections, precheck, stale_nonce
+
+from .test_zex import create_order
+
+key = PrivateKey(os.urandom(32), raw=True)
+
+
+def _order(base: str, quote: str, amount: float, price: float) -> bytes:
+    tx = create_order(f"{base}-{quote}", "buy", 1, 1, 0, key)
+    offset = ORDER_HEADER.size + len(base) + len(quote)
+    return tx[:offset] + pack(">d d", amount, price) + tx[offset + 16 :]
+
+
+def test_valid_transactions():
+    order = create_order("zDLA-zDLQ", "sell", 10, 2, 5, key)
+    assert precheck(order) is None
+    assert precheck(order, submitted=True) is None
+    cancel = order[:1] + b"c" + order[1:-64] + os.urandom(64)
+    assert precheck(cancel) is None
+    register = b"\x01r" + key.pubkey.serialize() + os.urandom(64)
+    assert precheck(register, submitted=True) is None
+
+
+@pytest.mark.parametrize(
+    "tx, reason",
+    [
+        (b"\x01", "length"),
+        (b"\x02b" + bytes(150), "version"),
+        (b"\x01x" + bytes(150), "operation"),
+        (b"\x01b\x00\x04" + bytes(150), "token"),
+        (b"\x01b\x04\x04zDLAzDLQ" + bytes(40), "length"),
+        (b"\x01b\x04\x04\xff\xffAAzDLQ" + bytes(150), "token"),
+        (b"\x01c" + bytes(50), "length"),
+        (b"\x01r" + bytes(96), "length"),
+        (b"\x01w\x04POLzUSD" + bytes(20), "length"),
+        (b"\x01dPOL\x00\x02" + bytes(300), "length"),
+    ],
+)
+def test_structure(tx, reason):
+    assert precheck(tx) == reason
+    assert precheck(tx, submitted=True) == reason
+
+
+@pytest.mark.parametrize(
+    "tx, reason",
+    [
+        (_order("zDLA", "zDLA", 1, 1), "pair"),
+        (_order("zDLA", "zDLQ", 0, 1), "amount"),
+        (_order("zDLA", "zDLQ", float("nan"), 1), "amount"),
+        (_order("zDLA", "zDLQ", 1, -2), "price"),
+        (_order("zDLA", "zDLQ", 1, float("inf")), "price"),
+    ],
+)
+def test_submitted_only(tx, reason):
+    # sequenced orders are applied, an invalid price still uses up the nonce
+    assert precheck(tx) is None
+    assert precheck(tx, submitted=True) == reason
+
+
+def test_stale_nonce():
+    public = key.pubkey.serialize()
+    order = create_order("zDLA-zDLQ", "buy", 1, 1, 3, key)
+    assert stale_nonce(order, {public: 4})
+    assert not stale_nonce(order, {public: 3})
+    assert not stale_nonce(order, {public: 1})
+    assert not stale_nonce(order, {})
+    assert not stale_nonce(b"\x01b\x04", {public: 4})
+
+
+def test_rejections():
+    rejections = Rejections()
+    rejections.add({"length": 2, "nonce": 1})
+    rejections.add({"length": 1})
+    counts = rejections.counts()
+    assert counts["length"] == 3
+    assert counts["nonce"] == 1
+    assert counts["price"] == 0
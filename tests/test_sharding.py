@@ -0,0 +1,129 @@
+from decimal import Decimal
+import asyncio
+import os
+
+from secp256k1 import PrivateKey
+import pytest
+
+from app.fixed_point import to_units
+from app.sharding import ShardedMatcher
+from app.zex import Zex
+
+from .test_zex import create_order
+
+
+@pytest.mark.asyncio
+async def test_sharded_matching(zex_instance: Zex):
+    seller, buyer = (
+        PrivateKey(os.urandom(32), raw=True),
+        PrivateKey(os.urandom(32), raw=True),
+    )
+    seller_pub, buyer_pub = seller.pubkey.serialize(), buyer.pubkey.serialize()
+    zex_instance.register_pub(seller_pub)
+    zex_instance.register_pub(buyer_pub)
+    state_manager = zex_instance.state_manager
+    for token in ("zSHA", "zSHB", "zSHQ"):
+        state_manager.ensure_token_initialized(token, seller_pub)
+        state_manager.ensure_token_initialized(token, buyer_pub)
+    assets = state_manager.assets
+    for base_token in ("zSHA", "zSHB"):
+        assets[base_token][seller_pub] = to_units(Decimal("5"))
+    assets["zSHQ"][buyer_pub] = to_units(Decimal("1000"))
+
+    shards = ShardedMatcher(zex_instance, 2)
+    shards.start()
+    zex_instance.shards = shards
+    try:
+        nonce = zex_instance.nonces[seller_pub]
+        zex_instance.process(
+            [
+                create_order("zSHA-zSHQ", "sell", 10, 2, nonce, seller),
+                create_order("zSHB-zSHQ", "sell", 20, 1, nonce + 1, seller),
+                # more than the seller has left, rejected before reaching a worker
+                create_order("zSHA-zSHQ", "sell", 10, 4, nonce + 2, seller),
+            ],
+            zex_instance.last_tx_index + 1,
+        )
+        nonce = zex_instance.nonces[buyer_pub]
+        zex_instance.process(
+            [
+                create_order("zSHA-zSHQ", "buy", 11, 3, nonce, buyer),
+                create_order("zSHB-zSHQ", "buy", 20, 1, nonce + 1, buyer),
+            ],
+            zex_instance.last_tx_index + 1,
+        )
+        await asyncio.sleep(0.1)
+    finally:
+        zex_instance.shards = None
+        shards.stop()
+
+    assert assets["zSHA"][seller_pub] == to_units(Decimal("3"))
+    assert assets["zSHB"][seller_pub] == to_units(Decimal("4"))
+    assert assets["zSHQ"][seller_pub] == to_units(Decimal("40"))
+    assert assets["zSHA"][buyer_pub] == to_units(Decimal("2"))
+    assert assets["zSHB"][buyer_pub] == to_units(Decimal("1"))
+    # the unfilled buy rests at 11 and locks its quote amount
+    assert assets["zSHQ"][buyer_pub] == to_units(Decimal("1000") - 20 - 20 - 11)
+
+    market = zex_instance.state_manager.markets["zSHA-zSHQ"]
+    assert market.buy_orders.depth(5) == [
+        [market.tick.to_steps(Decimal(11)), market.lot.to_steps(Decimal(1))]
+    ]
+    assert not market.sell_orders
+    assert zex_instance.get_book_ticker("zSHA-zSHQ")["b"] == "11"
+    assert not zex_instance.state_manager.markets["zSHB-zSHQ"].buy_orders
+    assert len(zex_instance.orders[buyer_pub]) == 1
+
+
+@pytest.mark.asyncio
+async def test_sharded_matches_serial(zex_instance: Zex, callbacks):
+    maker, trader = (
+        PrivateKey(os.urandom(32), raw=True),
+        PrivateKey(os.urandom(32), raw=True),
+    )
+    maker_pub, trader_pub = maker.pubkey.serialize(), trader.pubkey.serialize()
+    zex_instance.register_pub(maker_pub)
+    zex_instance.register_pub(trader_pub)
+    state_manager = zex_instance.state_manager
+    for token in ("zSHA", "zSHC", "zSHQ"):
+        state_manager.ensure_token_initialized(token, maker_pub)
+        state_manager.ensure_token_initialized(token, trader_pub)
+    assets = state_manager.assets
+    assets["zSHQ"][maker_pub] = to_units(Decimal("1000"))
+    assets["zSHC"][maker_pub] = to_units(Decimal("5"))
+    assets["zSHA"][trader_pub] = to_units(Decimal("2"))
+    nonce = zex_instance.nonces[maker_pub]
+    zex_instance.process(
+        [
+            create_order("zSHA-zSHQ", "buy", 10, 2, nonce, maker),
+            create_order("zSHC-zSHQ", "sell", 20, 1, nonce + 1, maker),
+        ],
+        zex_instance.last_tx_index + 1,
+    )
+    saved = zex_instance.to_protobuf()
+
+    # the buy only has the quote amount the sell in another market earns
+    nonce = zex_instance.nonces[trader_pub]
+    batch = [
+        create_order("zSHA-zSHQ", "sell", 10, 2, nonce, trader),
+        create_order("zSHC-zSHQ", "buy", 20, 1, nonce + 1, trader),
+    ]
+    zex_instance.process(batch, zex_instance.last_tx_index + 1)
+    serial = zex_instance.digest.value
+    assert assets["zSHC"][trader_pub] == to_units(Decimal("1"))
+
+    zex_instance = Zex.from_protobuf(saved, *callbacks, "test_state.bin", False)
+    shards = ShardedMatcher(zex_instance, 2)
+    shards.start()
+    zex_instance.shards = shards
+    try:
+        zex_instance.process(batch, zex_instance.last_tx_index + 1)
+        await asyncio.sleep(0.1)
+    finally:
+        zex_instance.shards = None
+        shards.stop()
+
+    assert zex_instance.state_manager.assets["zSHC"][trader_pub] == to_units(
+        Decimal("1")
+    )
+    assert zex_instance.digest.value == serial
@@ -0,0 +1,210 @@
+from decimal import Decimal
+from io import BytesIO
+
+from secp256k1 import PrivateKey
+import pytest
+
+from app.deposit_set import deposit_key
+from app.fixed_point import to_units
+from app.kline_manager import KlineManager
+from app.models.transaction import get_market_steps
+from app.proto import zex_pb2
+from app.snapshot import (
+    LazyDict,
+    decode_state,
+    encode_state,
+    open_state,
+    pack_balances,
+    pack_deposit_amount,
+    unpack_balances,
+    unpack_deposit_amount,
+)
+
+from .test_zex import create_order
+
+
+@pytest.fixture
+def private():
+    return PrivateKey(bytes.fromhex("11" * 32), raw=True)
+
+
+def test_balances_roundtrip():
+    amounts = [0, 1, -1, to_units(Decimal("123456789.123456789")), 2**127 - 1]
+    assert unpack_balances(pack_balances(amounts)) == amounts
+
+
+def test_deposit_amount_roundtrip():
+    for amount, decimal in (
+        (Decimal("100"), 6),
+        (Decimal("0.000001"), 6),
+        (Decimal("1.5"), 18),
+    ):
+        assert (
+            unpack_deposit_amount(pack_deposit_amount(amount, decimal), decimal)
+            == amount
+        )
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_encode_decode(compression):
+    state = zex_pb2.State(last_tx_index=42, users=[b"\x02" * 33], user_ids=[7])
+    assert decode_state(encode_state(state, compression)) == state
+
+
+def test_decode_mapped_file(tmp_path):
+    state = zex_pb2.State(last_tx_index=42, users=[b"\x02" * 33], user_ids=[7])
+    (tmp_path / "state.bin").write_bytes(encode_state(state))
+    with open(tmp_path / "state.bin", "rb") as f, open_state(f) as saved:
+        assert decode_state(saved) == state
+
+
+def test_lazy_dict():
+    loads = []
+    lazy = LazyDict(lambda saved: loads.append(saved) or saved.upper())
+    lazy.set_saved("a", "x")
+    lazy["b"] = "Y"
+    assert "a" in lazy and len(lazy) == 2 and loads == []
+    assert lazy.saved("a") == "x"
+    assert lazy["a"] == "X" and lazy["a"] == "X"
+    assert loads == ["x"] and lazy.saved("a") is None
+    assert dict(lazy) == {"a": "X", "b": "Y"}
+    lazy.set_saved("b", "z")
+    assert lazy.get("b") == "Z"
+    del lazy["a"]
+    assert "a" not in lazy
+
+
+def test_unsupported_version():
+    data = bytearray(encode_state(zex_pb2.State()))
+    data[4] = 99
+    with pytest.raises(ValueError):
+        decode_state(bytes(data))
+
+
+def test_migrate_legacy_state(private: PrivateKey):
+    public = private.pubkey.serialize()
+    pair = "BTC-USDT"
+    _, lot = get_market_steps(pair)
+    tx = create_order(pair, "sell", 95000, 0.002, 1, private)
+
+    legacy = zex_pb2.ZexState(last_tx_index=10)
+    legacy.nonces.add(public_key=public, nonce=2)
+    legacy.public_to_id_lookup.add(public_key=public, user_id=7)
+    legacy.id_to_public_lookup[7] = public
+    legacy.balances["BTC"].balances.add(public_key=public, amount="0.1")
+    legacy.balances["USDT"].balances.add(public_key=public, amount="12.5")
+
+    kline_manager = KlineManager(pair)
+    kline_manager.update_kline(95000.0, 0.001)
+    buffer = BytesIO()
+    kline_manager.kline.to_pickle(buffer)
+    pb_market = legacy.markets[pair]
+    pb_market.base_token, pb_market.quote_token = "BTC", "USDT"
+    pb_market.sell_orders.add(price="95000", tx=tx)
+    pb_market.final_id = 3
+    pb_market.kline = buffer.getvalue()
+    legacy.amounts.add(tx=tx, amount="0.001")
+    legacy.trades.add(public_key=public).trades.add(
+        t=1700000000, amount="0.001", pair=pair, order_type=0, order=tx
+    )
+    legacy.user_deposits.add(public_key=public).deposits.add(
+        tx_hash="0xabc",
+        chain="POL",
+        token_contract="0xdef",
+        amount="12.5",
+        decimal=6,
+        time=1700000000,
+        user_id=7,
+        vout=0,
+    )
+    legacy.deposits["POL"].deposits.add(tx_hash="0xabc", vout=0)
+    legacy.withdraw_nonce_on_chain["POL"] = 4
+    legacy.contract_decimal_on_chain["POL"].contract_decimal["0xdef"] = 6
+
+    state = decode_state(legacy.SerializeToString())
+
+    assert state.last_tx_index == 10
+    assert list(state.users) == [public]
+    assert list(state.user_ids) == [7]
+    assert list(state.accounts) == [0] and list(state.nonces) == [2]
+    assert unpack_balances(state.balances["BTC"].amounts) == [to_units(Decimal("0.1"))]
+    assert unpack_balances(state.balances["USDT"].amounts) == [
+        to_units(Decimal("12.5"))
+    ]
+
+    market = state.markets[pair]
+    assert list(market.sell_orders) == [tx]
+    assert list(market.sell_remaining) == [lot.to_steps(Decimal("0.001"))]
+    assert market.final_id == 3
+    migrated = KlineManager(pair)
+    migrated.load_protobuf(market.klines)
+    assert migrated.kline.equals(kline_manager.kline)
+
+    trades = state.trades[0]
+    assert list(trades.amounts) == [lot.to_steps(Decimal("0.001"))]
+    assert [state.pairs[i] for i in trades.pairs] == [pair]
+
+    deposit = state.user_deposits[0].deposits[0]
+    assert unpack_deposit_amount(deposit.amount, deposit.decimal) == Decimal("12.5")
+    chain = state.chains["POL"]
+    assert chain.deposit_keys == deposit_key("0xabc", 0)
+    assert chain.withdraw_nonce == 4
+    assert dict(chain.contract_decimals) == {"0xdef": 6}
+
+
+def test_migrate_off_grid_order(private: PrivateKey):
+    public = private.pubkey.serialize()
+    pair = "BTC-USDT"
+    sell = create_order(pair, "sell", 95000, 0.002, 1, private)
+    buy = create_order(pair, "buy", 94000, 0.002, 2, private)
+    legacy = zex_pb2.ZexState()
+    legacy.balances["BTC"].balances.add(public_key=public, amount="0.1")
+    pb_market = legacy.markets[pair]
+    pb_market.base_token, pb_market.quote_token = "BTC", "USDT"
+    pb_market.sell_orders.add(price="95000", tx=sell)
+    pb_market.buy_orders.add(price="94000", tx=buy)
+    buffer = BytesIO()
+    KlineManager(pair).kline.to_pickle(buffer)
+    pb_market.kline = buffer.getvalue()
+    legacy.amounts.add(tx=sell, amount="0.0010000005")
+    legacy.amounts.add(tx=buy, amount="0.001")
+
+    state = decode_state(legacy.SerializeToString())
+
+    # the sell order is cancelled and refunded, the buy order is kept
+    assert list(state.markets[pair].sell_orders) == []
+    assert list(state.markets[pair].buy_orders) == [buy]
+    assert unpack_balances(state.balances["BTC"].amounts) == [
+        to_units(Decimal("0.1010000005"))
+    ]
+    assert "USDT" not in state.balances
+
+
+def test_migrate_long_balance(private: PrivateKey):
+    public = private.pubkey.serialize()
+    legacy = zex_pb2.ZexState()
+    legacy.balances["USDT"].balances.add(
+        public_key=public, amount="12.3456789012345678901234"
+    )
+
+    state = decode_state(legacy.SerializeToString())
+
+    assert unpack_balances(state.balances["USDT"].amounts) == [
+        to_units(Decimal("12.345678901234567890"))
+    ]
+
+
+def test_migrate_off_grid_trade(private: PrivateKey):
+    public = private.pubkey.serialize()
+    pair = "BTC-USDT"
+    _, lot = get_market_steps(pair)
+    tx = create_order(pair, "sell", 95000, 0.002, 1, private)
+    legacy = zex_pb2.ZexState()
+    legacy.nonces.add(public_key=public, nonce=2)
+    legacy.trades.add(public_key=public).trades.add(
+        t=1700000000, amount="0.0010000005", pair=pair, order_type=0, order=tx
+    )
+
+    state = decode_state(legacy.SerializeToString())
+
+    assert list(state.trades[0].amounts) == [lot.to_steps(Decimal("0.001"))]
@@ -0,0 +1,144 @@
+from decimal import Decimal
+import os
+
+from secp256k1 import PrivateKey
+import pytest
+
+from app.fixed_point import to_units
+from app.models.transaction import Deposit, DepositTransaction
+from app.state_delta import delta_path
+from app.zex import Zex
+
+from .test_zex import create_order
+
+
+def _comparable(zex: Zex) -> dict:
+    """What a save keeps of the state, as plain values."""
+    state_manager = zex.state_manager
+    return {
+        "last_tx_index": zex.last_tx_index,
+        "nonces": zex.nonces,
+        "user_ids": zex.public_to_id_lookup,
+        "publics": zex.id_to_public_lookup,
+        "assets": state_manager.assets,
+        "user_deposits": state_manager.user_deposits,
+        "trades": {public: list(trades) for public, trades in zex.trades.items()},
+        "orders": {
+            public: [(tx, order.remaining) for tx, order in orders.items()]
+            for public, orders in zex.orders.items()
+            if orders
+        },
+        "markets": {
+            pair: (
+                [
+                    (o.tx, o.remaining, o.user_id)
+                    for o in market.buy_orders.iter_orders()
+                ],
+                [
+                    (o.tx, o.remaining, o.user_id)
+                    for o in market.sell_orders.iter_orders()
+                ],
+                market.buy_orders.top_levels(10),
+                market.sell_orders.top_levels(10),
+                (market.first_id, market.final_id, market.last_update_id),
+                market.kline_manager.kline.to_dict("list"),
+            )
+            for pair, market in state_manager.markets.items()
+        },
+        "chains": {
+            chain: (
+                chain_state.deposits,
+                [w.raw_tx for w in chain_state.withdraws],
+                {
+                    public: [w.raw_tx for w in chain_state.withdraws_of(public)]
+                    for public in chain_state.user_withdraws
+                },
+                chain_state.user_withdraw_nonces,
+                chain_state.withdraw_nonce,
+                chain_state.contract_decimals,
+            )
+            for chain, chain_state in state_manager.chain_states.items()
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_delta_snapshots(zex_instance: Zex, callbacks, tmp_path):
+    state_dest = zex_instance.state_dest
+    zex_instance.state_dest = tmp_path / "state.bin"
+    zex_instance._checkpoint_index = None
+    try:
+        assert zex_instance.save_state_in_background()
+        zex_instance.finish_state_save()
+        checkpoint_index = zex_instance.last_tx_index
+
+        seller, buyer = (
+            PrivateKey(os.urandom(32), raw=True),
+            PrivateKey(os.urandom(32), raw=True),
+        )
+        seller_pub, buyer_pub = seller.pubkey.serialize(), buyer.pubkey.serialize()
+        zex_instance.register_pub(seller_pub)
+        zex_instance.register_pub(buyer_pub)
+        state_manager = zex_instance.state_manager
+        for token in ("zDLA", "zDLQ"):
+            state_manager.ensure_token_initialized(token, seller_pub)
+            state_manager.ensure_token_initialized(token, buyer_pub)
+        state_manager.assets["zDLA"][seller_pub] = to_units(Decimal("5"))
+        state_manager.assets["zDLQ"][buyer_pub] = to_units(Decimal("1000"))
+        zex_instance.process(
+            [
+                create_order(
+                    "zDLA-zDLQ", "sell", 10, 2, zex_instance.nonces[seller_pub], seller
+                )
+            ],
+            zex_instance.last_tx_index + 1,
+        )
+        assert zex_instance.save_state_in_background()
+        zex_instance.finish_state_save()
+
+        zex_instance.deposit(
+            DepositTransaction(
+                version=1,
+                operation="d",
+                chain="POL",
+                deposits=[
+                    Deposit(
+                        tx_hash=os.urandom(32).hex(),
+                        chain="POL",
+                        token_contract="0xc2132D05D31c914a87C6611C10748AEb04B58e8F",
+                        amount=Decimal("100"),
+                        decimal=6,
+                        time=1234567890,
+                        user_id=zex_instance.public_to_id_lookup[buyer_pub],
+                        vout=0,
+                    ),
+                ],
+            )
+        )
+        zex_instance.process(
+            [
+                create_order(
+                    "zDLA-zDLQ", "buy", 10, 1, zex_instance.nonces[buyer_pub], buyer
+                )
+            ],
+            zex_instance.last_tx_index + 1,
+        )
+        assert zex_instance.save_state_in_background()
+        zex_instance.finish_state_save()
+    finally:
+        zex_instance.state_dest = state_dest
+        zex_instance._checkpoint_index = None
+
+    checkpoint = (tmp_path / "state.bin").read_bytes()
+    for number in (1, 2):
+        delta = tmp_path / delta_path("state.bin", checkpoint_index, number)
+        assert 0 < len(delta.read_bytes()) < len(checkpoint)
+
+    expected = _comparable(zex_instance)
+    with open(tmp_path / "state.bin", "rb") as f:
+        loaded = Zex.load_state(f, *callbacks, tmp_path / "state.bin", False)
+    # saved again before its history is read, the loaded history is kept as is
+    resaved = loaded.to_protobuf()
+    assert _comparable(loaded) == expected
+    reloaded = Zex.from_protobuf(resaved, *callbacks, tmp_path / "other.bin", False)
+    assert _comparable(reloaded) == expected
@@ -0,0 +1,94 @@
+from decimal import Decimal
+from struct import pack
+
+from app.models.transaction import (
+    BUY,
+    CANCEL,
+    DECODED_ORDER,
+    VALID_RECORD,
+    DecodedTx,
+    decode_record,
+    decode_tx,
+    get_market_steps,
+    tx_record,
+)
+from app.order_book import Order
+
+
+def order_tx(nonce: int, public: bytes) -> bytes:
+    return (
+        pack(">B B B B", 1, BUY, 5, 5)
+        + b"zWBTCzUSDT"
+        + pack(">d d I I", 0.5, 25000.25, 1700000000, nonce)
+        + public
+        + b"\x00" * 64
+    )
+
+
+def test_decode_order():
+    public = b"\x02" + b"\x11" * 32
+    tx = order_tx(3, public)
+
+    decoded = decode_tx(tx)
+
+    assert isinstance(decoded, DecodedTx)
+    assert decoded.name == BUY
+    assert decoded.pair == "zWBTC-zUSDT"
+    assert (decoded.base_token, decoded.quote_token) == ("zWBTC", "zUSDT")
+    order = decoded.payload
+    assert isinstance(order, Order)
+    tick, lot = get_market_steps("zWBTC-zUSDT")
+    assert order.price == tick.to_steps(Decimal("25000.25"))
+    assert order.amount == lot.to_steps(Decimal("0.5"))
+    assert order.nonce == 3
+    assert order.public == public
+
+
+def test_decode_cancel():
+    public = b"\x03" + b"\x22" * 32
+    order = order_tx(4, public)
+    tx = pack(">B", 1) + bytes([CANCEL]) + order[1:-97] + public + b"\x00" * 64
+
+    decoded = decode_tx(tx)
+
+    assert decoded.name == CANCEL
+    assert decoded.pair == "zWBTC-zUSDT"
+    assert decoded.tx is tx
+    assert decoded.payload is None
+
+
+def test_decode_invalid_version():
+    assert decode_tx(b"\x02" + order_tx(0, b"\x02" * 33)[1:]) is None
+
+
+def test_decode_record():
+    public = b"\x02" + b"\x11" * 32
+    tx = order_tx(3, public)
+    record = tx_record(tx)
+    assert record[:4] == (DECODED_ORDER, BUY, 14, 3)
+
+    decoded, expected = decode_record(tx, *record), decode_tx(tx)
+    assert decoded[:5] == expected[:5]
+    order, expected_order = decoded.payload, expected.payload
+    for field in ("side", "pair", "price", "amount", "remaining", "nonce", "public"):
+        assert getattr(order, field) == getattr(expected_order, field)
+
+
+def test_record_without_steps():
+    # too many steps for a record, decoded from the transaction instead
+    tx = order_tx(3, b"\x02" * 33)
+    offset = 4 + len("zWBTCzUSDT")
+    tx = tx[:offset] + pack(">d", 1e300) + tx[offset + 8 :]
+    assert tx_record(tx) == VALID_RECORD
+    assert (
+        decode_record(tx, *VALID_RECORD).payload.amount == decode_tx(tx).payload.amount
+    )
+
+
+def test_record_negative_steps():
+    # negative steps are left to the engine, which rejects the order
+    tx = order_tx(3, b"\x02" * 33)
+    offset = 4 + len("zWBTCzUSDT") + 8
+    tx = tx[:offset] + pack(">d", -1e300) + tx[offset + 8 :]
+    assert tx_record(tx) == VALID_RECORD
+    assert decode_record(tx, *VALID_RECORD).payload.price < 0
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from app.models.transaction import Deposit, WithdrawTransaction
+from app.transfers import UserTransfers
+from app.zex import StateManager
+
+PUBLIC = b"\x02" * 33
+
+
+def _deposit(time: int) -> Deposit:
+    return Deposit(
+        tx_hash=f"0x{time:064x}",
+        chain="POL",
+        token_contract="0xc2132D05D31c914a87C6611C10748AEb04B58e8F",
+        amount=Decimal("1"),
+        decimal=6,
+        time=time,
+        user_id=1,
+        vout=0,
+    )
+
+
+def _withdraw(time: int, nonce: int) -> WithdrawTransaction:
+    return WithdrawTransaction(
+        version=1,
+        operation="w",
+        chain="POL",
+        token_name="zUSDT",
+        amount=Decimal("1"),
+        destination="0x" + "00" * 20,
+        time=time,
+        nonce=nonce,
+        public=PUBLIC,
+        signature=b"",
+        raw_tx=None,
+    )
+
+
+def test_user_transfers_order():
+    transfers = UserTransfers()
+    for time, position in ((10, 0), (30, 1), (20, 2), (30, 3)):
+        transfers.add(time, None, position)
+    assert list(transfers.times) == [10, 20, 30, 30]
+    assert list(transfers.page(1, 2)) == [(None, 2), (None, 1)]
+    assert [position for _, position in transfers.page(3, None)] == [3]
+
+
+def test_state_manager_transfers():
+    state_manager = StateManager()
+    chain_state = state_manager.ensure_chain_initialized("POL")
+    state_manager.user_deposits[PUBLIC] = [_deposit(100), _deposit(300)]
+    chain_state.add_withdraw(_withdraw(200, 0))
+
+    times = [t.time for t in state_manager.user_transfers(PUBLIC)]
+    assert times == [100, 200, 300]
+
+    # indexed from now on, new transfers are inserted by time
+    state_manager.user_deposits[PUBLIC].append(_deposit(250))
+    state_manager.record_transfer(PUBLIC, 250, None, 2)
+    position = chain_state.add_withdraw(_withdraw(400, 1))
+    state_manager.record_transfer(PUBLIC, 400, "POL", position)
+
+    transfers = state_manager.user_transfers(PUBLIC)
+    assert [t.time for t in transfers] == [100, 200, 250, 300, 400]
+    assert isinstance(transfers[1], WithdrawTransaction)
+    assert [t.time for t in state_manager.user_transfers(PUBLIC, 1, 2)] == [200, 250]
+    assert chain_state.withdraws_of(PUBLIC) == chain_state.withdraws
@@ -0,0 +1,55 @@
+import multiprocessing as mp
+import os
+
+import pytest
+
+from app.verified_cache import WAYS, VerifiedCache, tx_digest
+
+
+@pytest.fixture
+def cache():
+    cache = VerifiedCache(64)
+    yield cache
+    cache.close()
+    cache.unlink()
+
+
+def _same_bucket(cache: VerifiedCache, count: int) -> list[bytes]:
+    digests = []
+    while len(digests) < count:
+        digest = tx_digest(os.urandom(100))
+        if cache._bucket(digest) == 0:
+            digests.append(digest)
+    return digests
+
+
+def test_remembers_digests(cache):
+    txs = [os.urandom(150) for _ in range(20)]
+    for tx in txs[:10]:
+        cache.add(tx_digest(tx))
+    assert all(tx_digest(tx) in cache for tx in txs[:10])
+    assert not any(tx_digest(tx) in cache for tx in txs[10:])
+
+
+def test_keeps_hit_digests(cache):
+    digests = _same_bucket(cache, 2 * WAYS)
+    for digest in digests[:WAYS]:
+        cache.add(digest)
+    assert digests[3] in cache
+
+    for digest in digests[WAYS:]:
+        cache.add(digest)
+    assert digests[3] in cache
+    assert sum(digest in cache for digest in digests) == WAYS
+
+
+def _add_in_child(cache: VerifiedCache, digest: bytes):
+    cache.add(digest)
+
+
+def test_shared_between_processes(cache):
+    digest = tx_digest(b"tx")
+    process = mp.Process(target=_add_in_child, args=(cache, digest))
+    process.start()
+    process.join()
+    assert digest in cache
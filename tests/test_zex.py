@@ -9,7 +9,10 @@ import numpy as np
 import pytest
 
 from app.connection_manager import ConnectionManager
+from app.fixed_point import to_units
 from app.models.transaction import Deposit, DepositTransaction, WithdrawTransaction
+from app.order_book import Order
+from app.snapshot import decode_state
 from app.zex import Market, Zex
 from app.zex_types import Chain, Token, UserPublic
 
@@ -19,37 +22,6 @@ def manager():
     return ConnectionManager()
 
 
-@pytest.fixture
-def zex_instance():
-    # Mock callbacks
-    def kline_callback(symbol, df):
-        pass
-
-    def depth_callback(symbol, data):
-        pass
-
-    def order_callback(*args):
-        pass
-
-    def deposit_callback(public, chain, token, amount):
-        pass
-
-    def withdraw_callback(public, chain, token, amount):
-        pass
-
-    zex = Zex(
-        kline_callback,
-        depth_callback,
-        order_callback,
-        deposit_callback,
-        withdraw_callback,
-        state_dest="test_state.bin",
-        light_node=False,
-        benchmark_mode=False,
-    )
-    return zex
-
-
 @pytest.fixture
 def market_instance(zex_instance):
     base_token = "BTC"
@@ -126,11 +98,11 @@ def create_order(
     t = int(time.time())
     tx += pack(">II", t, nonce) + pubkey
     msg = "v: 1\n"
-    msg += f'name: {"buy" if name == BUY else "sell"}\n'
+    msg += f"name: {'buy' if name == BUY else 'sell'}\n"
     msg += f"base token: {base_token}\n"
     msg += f"quote token: {quote_token}\n"
-    msg += f'amount: {np.format_float_positional(volume, trim="0")}\n'
-    msg += f'price: {np.format_float_positional(price, trim="0")}\n'
+    msg += f"amount: {np.format_float_positional(volume, trim='0')}\n"
+    msg += f"price: {np.format_float_positional(price, trim='0')}\n"
     msg += f"t: {t}\n"
     msg += f"nonce: {nonce}\n"
     msg += f"public: {pubkey.hex()}\n"
@@ -205,7 +177,9 @@ async def test_deposit(zex_instance: Zex, private1: PrivateKey, deposit_transact
     await asyncio.sleep(0.1)
 
     # Assertions
-    assert zex_instance.state_manager.assets["USDT"][pubkey1] == Decimal("100")
+    assert zex_instance.state_manager.assets["USDT"][pubkey1] == to_units(
+        Decimal("100")
+    )
     assert zex_instance.state_manager.chain_states["POL"].balances[
         "0xc2132D05D31c914a87C6611C10748AEb04B58e8F"
     ] == Decimal("6100")
@@ -217,7 +191,7 @@ async def test_withdraw(zex_instance: Zex, private1: PrivateKey, withdraw_transa
     pubkey1 = private1.pubkey.serialize()
     # Register a user and set initial balance
     zex_instance.register_pub(pubkey1)
-    zex_instance.state_manager.assets["USDT"][pubkey1] = Decimal("100")
+    zex_instance.state_manager.assets["USDT"][pubkey1] = to_units(Decimal("100"))
     zex_instance.state_manager.chain_states["POL"].balances[
         "0xc2132D05D31c914a87C6611C10748AEb04B58e8F"
     ] = Decimal("100")
@@ -229,7 +203,7 @@ async def test_withdraw(zex_instance: Zex, private1: PrivateKey, withdraw_transa
     await asyncio.sleep(0.1)
 
     # Assertions
-    assert zex_instance.state_manager.assets["USDT"][pubkey1] == Decimal("50")
+    assert zex_instance.state_manager.assets["USDT"][pubkey1] == to_units(Decimal("50"))
     assert zex_instance.state_manager.chain_states["POL"].balances[
         "0xc2132D05D31c914a87C6611C10748AEb04B58e8F"
     ] == Decimal("50")
@@ -248,7 +222,9 @@ async def test_cancel(
     pubkey2 = private2.pubkey.serialize()
     # Register a user and place an order
     zex_instance.register_pub(pubkey2)
-    market_instance.place(buy_btc_transaction)
+    market_instance.place(
+        Order.from_tx(buy_btc_transaction, market_instance.tick, market_instance.lot)
+    )
 
     # Cancel the order
     success = market_instance.cancel(buy_btc_transaction)
@@ -273,19 +249,26 @@ async def test_match_instantly(
     # Register users and set initial balances
     zex_instance.register_pub(pubkey1)
     zex_instance.register_pub(pubkey2)
-    zex_instance.state_manager.assets["BTC"][pubkey1] = Decimal("0.01")
-    zex_instance.state_manager.assets["USDT"][pubkey2] = Decimal("10000")
+    zex_instance.state_manager.assets["BTC"][pubkey1] = to_units(Decimal("0.01"))
+    zex_instance.state_manager.assets["USDT"][pubkey2] = to_units(Decimal("10000"))
 
     # Place a sell order
-    market_instance.place(sell_btc_transaction)
+    market_instance.place(
+        Order.from_tx(sell_btc_transaction, market_instance.tick, market_instance.lot)
+    )
 
     # Place a buy order that matches instantly
-    matched = market_instance.match_instantly(buy_btc_transaction, 1234567890)
+    matched = market_instance.match_instantly(
+        Order.from_tx(buy_btc_transaction, market_instance.tick, market_instance.lot),
+        1234567890,
+    )
 
     # Assertions
     assert matched
-    assert zex_instance.state_manager.assets["BTC"][pubkey1] == Decimal("0")
-    assert zex_instance.state_manager.assets["USDT"][pubkey2] == Decimal("9000")
+    assert zex_instance.state_manager.assets["BTC"][pubkey1] == to_units(Decimal("0"))
+    assert zex_instance.state_manager.assets["USDT"][pubkey2] == to_units(
+        Decimal("9000")
+    )
 
 
 @pytest.mark.asyncio
@@ -298,13 +281,70 @@ async def test_place(
     pubkey2 = private2.pubkey.serialize()
     # Register a user and set initial balance
     zex_instance.register_pub(pubkey2)
-    zex_instance.state_manager.assets["USDT"][pubkey2] = Decimal("10000")
+    zex_instance.state_manager.assets["USDT"][pubkey2] = to_units(Decimal("10000"))
 
     # Place a buy order
-    success = market_instance.place(buy_btc_transaction)
+    success = market_instance.place(
+        Order.from_tx(buy_btc_transaction, market_instance.tick, market_instance.lot)
+    )
 
     # Assertions
     assert success
     assert buy_btc_transaction in zex_instance.orders[pubkey2]
     assert len(market_instance.buy_orders) == 1
-    assert zex_instance.state_manager.assets["USDT"][pubkey2] == Decimal("9000")
+    assert zex_instance.state_manager.assets["USDT"][pubkey2] == to_units(
+        Decimal("9000")
+    )
+
+
+def test_save_state_in_background(zex_instance: Zex, tmp_path):
+    state_dest = zex_instance.state_dest
+    zex_instance.state_dest = tmp_path / "state.bin"
+    try:
+        assert zex_instance.save_state_in_background()
+        zex_instance.finish_state_save()
+    finally:
+        zex_instance.state_dest = state_dest
+
+    saved = (tmp_path / "state.bin").read_bytes()
+    assert decode_state(saved) == zex_instance.to_protobuf()
+    assert not (tmp_path / "state.bin.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_catching_up_publishes_nothing(
+    zex_instance: Zex, private1: PrivateKey, private2: PrivateKey, monkeypatch
+):
+    seller, buyer = private1.pubkey.serialize(), private2.pubkey.serialize()
+    zex_instance.register_pub(seller)
+    zex_instance.register_pub(buyer)
+    state_manager = zex_instance.state_manager
+    for token in ("zCUA", "zCUQ"):
+        state_manager.ensure_token_initialized(token, seller)
+        state_manager.ensure_token_initialized(token, buyer)
+    state_manager.assets["zCUA"][seller] = to_units(Decimal("5"))
+    state_manager.assets["zCUQ"][buyer] = to_units(Decimal("1000"))
+
+    published = []
+
+    async def record(*args):
+        published.append(args)
+
+    for callback in ("order_callback", "kline_callback", "depth_callback"):
+        monkeypatch.setattr(zex_instance, callback, record)
+    zex_instance.catching_up = True
+    sell = create_order(
+        "zCUA-zCUQ", "sell", 10, 2, zex_instance.nonces[seller], private1
+    )
+    buy = create_order("zCUA-zCUQ", "buy", 10, 1, zex_instance.nonces[buyer], private2)
+    zex_instance.process([sell, buy], zex_instance.last_tx_index + 1)
+    await asyncio.sleep(0.1)
+
+    assert published == []
+    assert state_manager.assets["zCUA"][buyer] == to_units(Decimal("1"))
+    assert {seller, buyer} <= zex_instance.changes.users
+    # depth updates are dropped, the published depth is still kept
+    market = state_manager.markets["zCUA-zCUQ"]
+    assert market._order_book_updates == {"bids": {}, "asks": {}}
+    depth = zex_instance.get_order_book("zCUA-zCUQ", 5)
+    assert depth["bids"] == [] and depth["asks"] == [[Decimal(10), Decimal(1)]]